@@ -0,0 +1,184 @@
+# afip_qr.py
+# QR de AFIP (RG 4892): la URL https://www.afip.gob.ar/fe/qr/?p=<base64> trae un JSON con
+# CUIT emisor, tipo, punto de venta, número, fecha, importe total y CAE.
+# Si está, la cabecera y el total salen de acá sin regex ni OCR.
+# Búsqueda, de lo más barato a lo más caro: links / texto de la página, imágenes embebidas,
+# render a baja resolución. Para decodificar imágenes hace falta pyzbar u OpenCV (opcionales).
+import base64
+import functools
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from extraction_core import _optional, image_pages
+from patterns import RE_QR_URL, RE_NON_DIGIT
+
+RENDER_DPI = 150      # fallback: render de la página para buscar el QR
+MIN_IMAGE_PX = 60     # imágenes más chicas no pueden ser un QR legible
+MAX_ASPECT = 1.3      # el QR es cuadrado; escaneos de página entera también se prueban
+MAX_PAGES = 2         # última y primera página; no se recorre un lote entero buscando QR
+
+# Código de comprobante AFIP -> letra
+TIPO_LETRA = {
+    1: "A", 2: "A", 3: "A", 4: "A", 5: "A", 201: "A", 202: "A", 203: "A",
+    6: "B", 7: "B", 8: "B", 9: "B", 10: "B", 206: "B", 207: "B", 208: "B",
+    11: "C", 12: "C", 13: "C", 15: "C", 211: "C", 212: "C", 213: "C",
+    51: "M", 52: "M", 53: "M", 54: "M",
+}
+
+
+def parse_afip_qr_url(text: str) -> Optional[Dict[str, Any]]:
+    """Decodifica el JSON del parámetro p de una URL de QR AFIP; None si no es válida."""
+    m = RE_QR_URL.search(text or "")
+    if m:
+        p = m.group(1)
+    else:
+        try:
+            p = parse_qs(urlparse(text).query).get("p", [None])[0]
+        except Exception:
+            p = None
+    if not p: return None
+    p = p.replace('%3D', '=').replace('%2B', '+').replace('%2F', '/')
+    try:
+        raw = base64.urlsafe_b64decode(p.replace('+', '-').replace('/', '_') + '=' * (-len(p) % 4))
+        data = json.loads(raw.decode('utf-8'))
+    except Exception:
+        return None
+    if not isinstance(data, dict) or "cuit" not in data or "nroCmp" not in data:
+        return None
+    return data
+
+
+def _fmt_cuit(n) -> str:
+    d = RE_NON_DIGIT.sub('', str(n))
+    return f"{d[:2]}-{d[2:10]}-{d[10:]}" if len(d) == 11 else d
+
+
+def qr_to_fields(data: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON del QR -> campos del OUT interno (mismos nombres que extract_header_common / names_and_cuits)."""
+    out: Dict[str, Any] = {}
+    try: tipo = int(data.get("tipoCmp"))
+    except Exception: tipo = None
+    out["tipo"] = TIPO_LETRA.get(tipo)
+    out["tipo_cmp"] = tipo
+    try:
+        out["numero"] = f"{int(data.get('ptoVta')):04d}-{int(data.get('nroCmp')):08d}"
+    except Exception:
+        out["numero"] = None
+    out["fecha"] = data.get("fecha")
+    out["cuit_proveedor"] = _fmt_cuit(data.get("cuit"))
+    cae = data.get("codAut")
+    out["cae"] = str(cae) if cae is not None else None
+    try: out["total"] = round(float(data.get("importe")), 2)
+    except Exception: out["total"] = None
+    out["moneda"] = data.get("moneda")
+    if str(data.get("tipoDocRec")) == "80" and data.get("nroDocRec"):
+        out["cuit_cliente"] = _fmt_cuit(data.get("nroDocRec"))
+    return out
+
+
+@functools.lru_cache(maxsize=1)
+def _decoder() -> Optional[Callable[[Any], List[str]]]:
+    """Decodificador de QR disponible (pyzbar u OpenCV) sobre imágenes PIL."""
+    try:
+        from pyzbar.pyzbar import decode, ZBarSymbol
+        def _zbar(img) -> List[str]:
+            return [d.data.decode('utf-8', 'ignore') for d in decode(img, symbols=[ZBarSymbol.QRCODE])]
+        return _zbar
+    except Exception:
+        pass
+    cv2 = _optional("cv2"); np = _optional("numpy")
+    if cv2 is not None and np is not None:
+        detector = cv2.QRCodeDetector()
+        def _cv(img) -> List[str]:
+            txt, _, _ = detector.detectAndDecode(np.asarray(img.convert("L")))
+            return [txt] if txt else []
+        return _cv
+    return None
+
+
+def _pix_to_pil(fitz, pix):
+    from PIL import Image
+    if pix.n - pix.alpha != 1:
+        pix = fitz.Pixmap(fitz.csGRAY, pix)
+    elif pix.alpha:
+        pix = fitz.Pixmap(pix, 0)
+    return Image.frombytes("L", (pix.width, pix.height), pix.samples)
+
+
+def _scan_page(fitz, doc, page, decode) -> Optional[Dict[str, Any]]:
+    """decode=None -> sólo links y texto (lo barato)."""
+    # 1) links y texto de la página
+    for link in page.get_links():
+        data = parse_afip_qr_url(link.get("uri") or "")
+        if data: return data
+    data = parse_afip_qr_url(page.get_text("text") or "")
+    if data: return data
+    if decode is None: return None
+    # 2) imágenes embebidas (tamaño nativo, sin re-render)
+    images = page.get_images(full=True)
+    for info in images:
+        xref, w, h = info[0], info[2], info[3]
+        if min(w, h) < MIN_IMAGE_PX: continue
+        square = max(w, h) / max(1, min(w, h)) <= MAX_ASPECT
+        if not (square or len(images) == 1): continue
+        try:
+            for txt in decode(_pix_to_pil(fitz, fitz.Pixmap(doc, xref))):
+                data = parse_afip_qr_url(txt)
+                if data: return data
+        except Exception:
+            continue
+    # 3) render a baja resolución (QR dibujado con vectores)
+    try:
+        for txt in decode(_pix_to_pil(fitz, page.get_pixmap(dpi=RENDER_DPI, colorspace=fitz.csGRAY))):
+            data = parse_afip_qr_url(txt)
+            if data: return data
+    except Exception:
+        pass
+    return None
+
+
+def find_afip_qr(pdf_path: str, decode_images: bool = True,
+                 span: Optional[Tuple[int, int]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Busca el QR AFIP empezando por la última página (donde suele ir el pie con el CAE).
+    decode_images=False se limita a links / texto (para PDFs con texto, donde no vale la pena renderizar).
+    span = (primera, fin) busca en la última y la primera hoja de ese tramo (una factura de un
+    PDF con varias, invoice_split) en lugar de las del archivo.
+    Devuelve {"data": <json del QR>, "page": índice 0-based, "pages": total de páginas} o None.
+    """
+    fitz = _optional("fitz")
+    if fitz is None: return None
+    decode = _decoder() if decode_images else None
+    try:
+        with fitz.open(pdf_path) as doc:
+            n = doc.page_count
+            first, end = span or (0, n)
+            for p in dict.fromkeys([end - 1, first][:MAX_PAGES]):
+                if not 0 <= p < n: continue
+                data = _scan_page(fitz, doc, doc[p], decode)
+                if data:
+                    return {"data": data, "page": p, "pages": n}
+    except Exception:
+        return None
+    return None
+
+
+def find_afip_qr_image(image_path: str, span: Optional[Tuple[int, int]] = None) -> Optional[Dict[str, Any]]:
+    """find_afip_qr para un JPEG / PNG / TIFF: última y primera página (del tramo span), a su resolución."""
+    decode = _decoder()
+    if decode is None: return None
+    try:
+        from PIL import Image
+        with Image.open(image_path) as img:
+            n = getattr(img, "n_frames", 1)
+        first, end = span or (0, n)
+        for p in dict.fromkeys([end - 1, first][:MAX_PAGES]):
+            for img in image_pages(image_path, [p]):
+                for txt in decode(img):
+                    data = parse_afip_qr_url(txt)
+                    if data:
+                        return {"data": data, "page": p, "pages": n}
+    except Exception:
+        return None
+    return None
@@ -0,0 +1,114 @@
+# benchmarks/_synth.py
+# Datos sintéticos compartidos por los benchmarks (no requieren PDFs reales).
+import os
+import random
+import sys
+from typing import Any, Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+PERC_KEYS = ["percepcion_iva", "percepcion_iibb_bs_as", "percepcion_iibb_caba", "percepcion_iibb_neuquen"]
+RET_KEYS = ["retencion_iva", "retencion_ganancias"]
+DESCRIPTIONS = ["CUBIERTA 205/55 R16 91V P7", "CUBIERTA 175/65 R14 82T P400", "CAMARA 900-20 TR78",
+                "CUBIERTA 295/80 R22.5 152M FR01", "PROTECTOR 20\" ", "VALVULA TR413 CROMADA"]
+
+
+def minimal_payload(rnd: random.Random) -> Dict[str, Any]:
+    sub = round(rnd.uniform(1000, 900000), 2)
+    iva = {"21": round(sub * 0.21, 2)}
+    if rnd.random() < 0.4:
+        iva["10.5"] = round(rnd.uniform(10, 5000), 2)
+    if rnd.random() < 0.1:
+        iva["otros"] = round(rnd.uniform(10, 500), 2)
+    percs = {k: round(rnd.uniform(10, 9000), 2) for k in rnd.sample(PERC_KEYS, rnd.randint(0, 3))}
+    rets = {k: round(rnd.uniform(10, 900), 2) for k in rnd.sample(RET_KEYS, rnd.randint(0, 1))}
+    total = round(sub + sum(iva.values()) + sum(percs.values()), 2)
+    return {
+        "numero": f"{rnd.randint(1, 99):04d}-{rnd.randint(1, 99999999):08d}",
+        "fecha": f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+        "cuit": "30677018816",
+        "subtotal": sub,
+        "total": total,
+        "iva": iva,
+        "percepciones": percs,
+        "retenciones": rets,
+    }
+
+
+def _amount(v: float) -> str:
+    ent, dec = f"{v:.2f}".split(".")
+    groups = []
+    while ent:
+        groups.insert(0, ent[-3:]); ent = ent[:-3]
+    return ".".join(groups) + "," + dec
+
+
+def invoice_lines(rnd: random.Random, vendor: str = "PIRELLI", items: int = 40) -> List[str]:
+    """Líneas con la forma que devuelve read_pdf_text para una factura típica."""
+    cuit_prov = "33-50223253-9" if vendor == "PIRELLI" else "30-67701881-6"
+    name = "PIRELLI NEUMATICOS S.A.I.C." if vendor == "PIRELLI" else "GUERRINI NEUMATICOS S.A."
+    numero = f"{rnd.randint(1, 99):04d}-{rnd.randint(1, 99999999):08d}"
+    lines = [
+        name, "ORIGINAL", "A", "FACTURA A", f"Nro: {numero}",
+        f"Fecha de Emisión: {rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}/2025",
+        f"C.U.I.T.: {cuit_prov}", "Ingresos Brutos: C.M. 913-502151-6",
+        "Inicio de Actividades: 01/01/1990", "IVA RESPONSABLE INSCRIPTO",
+        "ALVAREZ NEUMATICOS SRL", "C.U.I.T.: 30-71234567-1", "Condición de venta: Cta Cte",
+    ]
+    sub = 0.0
+    for k in range(items):
+        qty = rnd.randint(1, 8); pu = round(rnd.uniform(10000, 250000), 2)
+        imp = round(qty * pu, 2); sub += imp
+        lines.append(f"{100000 + k} CUBIERTA 205/55 R16 91V P7 {qty},00 {_amount(pu)} {_amount(imp)}")
+    sub = round(sub, 2); iva = round(sub * 0.21, 2); perc = round(sub * 0.03, 2)
+    total = round(sub + iva + perc, 2)
+    if vendor == "GUERRINI":
+        lines += ["SUBTOTAL:", "IVA 21.00 %:", "PERCEP. IIBB:", "TOTAL:",
+                  _amount(sub), _amount(iva), _amount(perc), _amount(total)]
+    else:
+        lines += ["Subtotal", _amount(sub), "IVA 21%", _amount(iva),
+                  "Percepción IIBB Buenos Aires", _amount(perc),
+                  "Importe Total", _amount(total)]
+    lines += [f"CAE N°: {rnd.randint(10**13, 10**14 - 1)}",
+              f"Fecha de Vto. de CAE: {rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}/2025"]
+    return lines
+
+
+def invoice_words(rnd: random.Random, items: int = 40, rows_per_page: int = 45) -> Tuple[List[Tuple], float]:
+    """
+    Palabras con coordenadas (como TextSource.words) de una factura con `items` renglones:
+    código, descripción, cantidad, precio unitario e importe alineados a derecha.
+    Devuelve (palabras, subtotal).
+    """
+    words: List[Tuple] = []
+    cw = 4.8  # ancho aproximado de un carácter (pt)
+
+    def put(p, x0, y, text):
+        words.append((p, x0, y, x0 + cw * len(text), y + 9.0, text))
+
+    def put_right(p, x1, y, text):
+        put(p, x1 - cw * len(text), y, text)
+
+    sub = 0.0
+    for k in range(items):
+        p, r = divmod(k, rows_per_page)
+        y = 180.0 + r * 12.0 + rnd.uniform(-0.8, 0.8)
+        if r == 0:
+            for x, h in ((30, "Código"), (90, "Descripción"), (340, "Cant."), (410, "P.Unit."), (500, "Importe")):
+                put(p, x, 160.0, h)
+        qty = rnd.randint(1, 8); pu = round(rnd.uniform(10000, 250000), 2)
+        imp = round(qty * pu, 2); sub += imp
+        put(p, 30, y, str(100000 + k))
+        x = 90.0
+        for t in rnd.choice(DESCRIPTIONS).split():
+            put(p, x, y, t); x += cw * (len(t) + 1)
+        put_right(p, 380, y, f"{qty},00")
+        put_right(p, 460, y, _amount(pu))
+        put_right(p, 545, y, _amount(imp))
+    sub = round(sub, 2)
+    last = (items - 1) // rows_per_page
+    put(last, 380, 760.0, "SUBTOTAL"); put_right(last, 545, 760.0, _amount(sub))
+    put(last, 380, 772.0, "TOTAL"); put_right(last, 545, 772.0, _amount(round(sub * 1.24, 2)))
+    return words, sub
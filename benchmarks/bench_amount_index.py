@@ -0,0 +1,93 @@
+# benchmarks/bench_amount_index.py
+# Resolución de importes en la cola de la factura: escaneo hacia adelante por etiqueta
+# (first_amount_forward, como hacían _fallback_labels y los handlers) contra AmountIndex.
+# Colas con muchas etiquetas y los importes lejos: el peor caso del escaneo.
+#
+#   python benchmarks/bench_amount_index.py [N_DOCS]
+import random
+import sys
+import time
+from typing import Any, Dict, List
+
+import _synth  # noqa: F401  (sys.path)
+import extractor_v6 as ex
+from extractor_utils import amount_index, first_amount_forward
+
+TAIL = 150
+LABELS = ["SUBTOTAL IVA PERC TOTAL", "Percepción IIBB ARBA", "IVA 21% s/ neto", "Observaciones TOTAL bultos",
+          "Ingresos Brutos CM 913-502151-6", "Importe TOTAL en letras", "Perc. IVA RG 2126", "texto libre"]
+
+
+def legacy_fallback(lines: List[str], out: Dict[str, Any]) -> None:
+    """_fallback_labels antes de AmountIndex (copia textual)."""
+    start = max(0, len(lines) - 150)
+    tail = lines[start:]
+    sub = iva = perc = tot = None
+    iva_items = []; perc_items = []
+    for i, line in enumerate(tail):
+        up = line.upper()
+        if sub is None and 'SUBTOTAL' in up:
+            v = first_amount_forward(tail, i)
+            if v is not None: sub = v
+        if 'IVA' in up:
+            v = first_amount_forward(tail, i)
+            if v is not None:
+                iva = (iva or 0.0) + v
+                iva_items.append({"alicuota": None, "monto": v})
+        if any(k in up for k in ['PERC', 'PERCEP', 'IIBB', 'INGRESOS BRUTOS', 'ARBA', 'AGIP']):
+            v = first_amount_forward(tail, i)
+            if v is not None:
+                perc = (perc or 0.0) + v
+                perc_items.append({"desc": line, "monto": v})
+        if 'TOTAL' in up:
+            v = first_amount_forward(tail, i)
+            if v is not None: tot = v
+    out["subtotal"] = sub
+    out["iva"] = iva
+    out["iva_detalle"] = iva_items
+    out["percepciones_total"] = perc
+    out["percepciones_detalle"] = perc_items
+    out["total"] = tot
+    if out["total"] is None and (sub is not None):
+        out["total"] = round((sub or 0.0) + (iva or 0.0) + (perc or 0.0), 2)
+
+
+def synthetic_doc(rnd: random.Random, n: int) -> List[str]:
+    lines = []
+    for k in range(n):
+        if k % rnd.randint(8, 16) == 0:
+            lines.append(f"{rnd.randint(1, 999)}.{rnd.randint(0, 999):03d},{rnd.randint(0, 99):02d}")
+        else:
+            lines.append(rnd.choice(LABELS))
+    return lines
+
+
+def timed(fn, docs) -> float:
+    t0 = time.perf_counter()
+    for d in docs: fn(d)
+    return (time.perf_counter() - t0) / len(docs) * 1e3
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    rnd = random.Random(5)
+    docs = [synthetic_doc(rnd, rnd.randint(TAIL, 3 * TAIL)) for _ in range(n)]
+
+    # Mismo resultado: primitiva (todas las líneas, varias ventanas) y fallback completo
+    for d in docs:
+        idx = amount_index(d, 0)
+        for i in range(len(d)):
+            for span in (6, 12):
+                assert first_amount_forward(d, i, span) == idx.forward(i, span)
+        a: Dict[str, Any] = {}; b: Dict[str, Any] = {}
+        legacy_fallback(d, a); ex._fallback_labels(d, b)
+        assert a == b, (a, b)
+
+    old = timed(lambda d: legacy_fallback(d, {}), docs)
+    new = timed(lambda d: ex._fallback_labels(d, {}), docs)
+    print(f"docs: {n}  cola: {TAIL} líneas  mismos resultados")
+    print(f"fallback  escaneo: {old:.3f} ms/doc   AmountIndex: {new:.3f} ms/doc   x{old / new:.1f}")
+
+
+if __name__ == "__main__":
+    main()
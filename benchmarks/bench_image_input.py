@@ -0,0 +1,70 @@
+# benchmarks/bench_image_input.py
+# Imágenes directo a OCR contra el camino anterior (el cliente envuelve la imagen en un PDF y el
+# servidor la vuelve a rasterizar con convert_from_path a 300 dpi). TIFF sintético de N hojas A4
+# a 300 dpi. Reporta ms por hoja hasta tener la imagen lista para Tesseract en cada camino
+# (sin el OCR, que es igual en los dos) y si el tamaño que llega a Tesseract es el original.
+#
+#   python benchmarks/bench_image_input.py [HOJAS]
+import os
+import random
+import sys
+import tempfile
+import time
+
+import _synth  # noqa: F401  (agrega la raíz del repo al path)
+from extraction_core import _optional, image_pages, sniff_format
+
+A4_300 = (2480, 3508)
+
+
+def synth_tiff(path: str, pages: int) -> None:
+    from PIL import Image, ImageDraw
+    rnd = random.Random(3); frames = []
+    for p in range(pages):
+        im = Image.new("L", A4_300, 255); d = ImageDraw.Draw(im)
+        for y in range(200, 3300, 48):  # renglones de "texto"
+            x = 150
+            while x < 2300:
+                w = rnd.randint(40, 220); d.rectangle([x, y, x + w, y + 22], fill=0); x += w + 30
+        frames.append(im)
+    frames[0].save(path, save_all=True, append_images=frames[1:], compression="tiff_lzw", dpi=(300, 300))
+
+
+def main() -> None:
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    tmp = tempfile.mkdtemp()
+    tif = os.path.join(tmp, "scan.tif")
+    synth_tiff(tif, pages)
+    print(f"TIFF {pages} hojas, {os.path.getsize(tif) / 1e6:.1f} MB, formato detectado: {sniff_format(tif)}")
+
+    t0 = time.perf_counter()
+    sizes = [img.size for img in image_pages(tif)]
+    direct = (time.perf_counter() - t0) * 1000 / pages
+    print(f"directo (página por página):   {direct:7.1f} ms/hoja, tamaño original: {set(sizes) == {A4_300}}")
+
+    from PIL import Image
+    wrapped = os.path.join(tmp, "scan.pdf")
+    t0 = time.perf_counter()
+    with Image.open(tif) as im:  # lo que hacía el cliente
+        frames = [f.copy() for f in _frames(im)]
+    frames[0].save(wrapped, save_all=True, append_images=frames[1:], resolution=300)
+    wrap = (time.perf_counter() - t0) * 1000 / pages
+    print(f"envolver en PDF (cliente):     {wrap:7.1f} ms/hoja, {os.path.getsize(wrapped) / 1e6:.1f} MB")
+    convert_from_path = _optional("convert_from_path")
+    if convert_from_path is None:
+        print("re-rasterizar a 300 dpi:       (pdf2image / poppler no disponibles aquí)")
+        return
+    t0 = time.perf_counter()
+    sizes = [im.size for im in convert_from_path(wrapped, dpi=300)]
+    raster = (time.perf_counter() - t0) * 1000 / pages
+    print(f"re-rasterizar a 300 dpi:       {raster:7.1f} ms/hoja, tamaño original: {set(sizes) == {A4_300}}")
+    print(f"ahorro por hoja: {wrap + raster - direct:.1f} ms ({(wrap + raster) / direct:.1f}x)")
+
+
+def _frames(im):
+    for i in range(getattr(im, "n_frames", 1)):
+        im.seek(i); yield im
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# benchmarks/bench_invoice_split.py
+# PDF con varias facturas (invoice_split): un "resumen del mes" sintético de ~200 hojas con
+# facturas de una a cuatro hojas, un tercio con su DUPLICADO a continuación. Reporta:
+#   - tramos encontrados contra los reales y copias descartadas
+#   - ms del corte y de la extracción en serie, y repartida en el pool de procesos
+#     (jobs.segments_job, un grupo contiguo por worker, como hace el servidor con ?split=true)
+#   - el mismo corte sobre un lote escaneado (TIFF de ~8 hojas con el QR AFIP de la última
+#     factura en su pie): hojas que pasan por OCR y tramos con el atajo del QR de _load_lines
+#     contra read_invoices, que lee el escaneo entero. Sin el binario de Tesseract sólo arma el
+#     TIFF; el QR se dibuja si está qrcode y se lee si está pyzbar u OpenCV.
+#
+#   python benchmarks/bench_invoice_split.py [HOJAS] [WORKERS]
+import base64
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from _synth import invoice_lines, ROOT
+from extraction_core import LineIndex, _optional
+from invoice_split import split_invoices
+
+LINES_PER_PAGE = 45
+SCAN_PAGES = 8         # hojas del lote escaneado (cada una es un OCR de hoja entera)
+A4_300 = (2480, 3508)
+
+
+def bundle(rnd: random.Random, pages: int):
+    """(LineIndex del PDF entero, números de las facturas en orden, copias agregadas)."""
+    lines = []; starts = []; numeros = []; copies = 0
+    while len(starts) < pages:
+        inv = invoice_lines(rnd, rnd.choice(("PIRELLI", "GUERRINI")), items=rnd.randint(5, 150))
+        numeros.append(inv[4].split()[-1])
+        versions = [inv]
+        if rnd.random() < 1 / 3:
+            versions.append([l.replace("ORIGINAL", "DUPLICADO") for l in inv]); copies += 1
+        for v in versions:
+            for p in range(0, len(v), LINES_PER_PAGE):
+                starts.append(len(lines)); lines.extend(v[p:p + LINES_PER_PAGE])
+    return LineIndex(lines, page_starts=starts), numeros, copies
+
+
+def qr_url(numero: str) -> str:
+    """URL de QR AFIP (Factura A) con el número dado."""
+    pto, nro = numero.split("-")
+    data = {"ver": 1, "fecha": "2025-02-28", "cuit": 33502232539, "ptoVta": int(pto), "tipoCmp": 1,
+            "nroCmp": int(nro), "importe": 1000.0, "moneda": "PES", "codAut": 78659750317708}
+    return "https://www.afip.gob.ar/fe/qr/?p=" + base64.b64encode(json.dumps(data).encode()).decode()
+
+
+def scanned_bundle(path: str, rnd: random.Random, pages: int):
+    """TIFF A4 a 300 dpi con las hojas de bundle() dibujadas. (hojas, números de las facturas, QR dibujado)."""
+    from PIL import Image, ImageDraw, ImageFont
+    try:
+        font = ImageFont.load_default(size=40)
+    except TypeError:  # Pillow < 10.1
+        font = ImageFont.load_default()
+    lines, numeros, _ = bundle(rnd, pages)
+    frames = []
+    for p in range(lines.pages):
+        im = Image.new("L", A4_300, 255); d = ImageDraw.Draw(im)
+        for k, line in enumerate(lines.page_lines(p)):
+            d.text((150, 150 + 60 * k), line, fill=0, font=font)
+        frames.append(im)
+    qrcode = _optional("qrcode")
+    if qrcode is not None:  # el QR de la última factura, al pie de la última hoja
+        qr = qrcode.make(qr_url(numeros[-1])).get_image().convert("L").resize((500, 500))
+        frames[-1].paste(qr, (1900, 2900))
+    frames[0].save(path, save_all=True, append_images=frames[1:], compression="tiff_lzw", dpi=(300, 300))
+    return lines.pages, numeros, qrcode is not None
+
+
+def scanned(cfg: str) -> None:
+    from extractor_v6 import _load_lines, read_invoices
+    if _optional("PIL") is None:
+        print("lote escaneado: (Pillow no disponible aquí)")
+        return
+    tif = os.path.join(tempfile.mkdtemp(), "bundle.tif")
+    pages, numeros, drawn = scanned_bundle(tif, random.Random(9), SCAN_PAGES)
+    print(f"lote escaneado: {pages} hojas, {len(numeros)} facturas, QR {'dibujado' if drawn else '(sin qrcode)'}")
+    pytesseract = _optional("pytesseract")
+    try:
+        tesseract = pytesseract is not None and bool(pytesseract.get_tesseract_version())
+    except Exception:
+        tesseract = False
+    if not tesseract:
+        print("  OCR: (binario de Tesseract no disponible aquí)")
+        return
+    t0 = time.perf_counter()
+    shortcut = _load_lines(tif, True)
+    short_s = time.perf_counter() - t0
+    print(f"  atajo del QR (_load_lines): {shortcut.pages} hojas por OCR, {short_s:.1f} s -> "
+          f"{len(split_invoices(shortcut))} tramos")
+    t0 = time.perf_counter()
+    segments = read_invoices(tif, cfg_path=cfg)
+    full_s = time.perf_counter() - t0
+    ocr_pages = sum(seg.pages for seg in segments)
+    print(f"  read_invoices: {full_s:.1f} s -> {len(segments)} tramos de {len(numeros)} "
+          f"({'ok' if len(segments) == len(numeros) else 'DISTINTO'}), {ocr_pages} hojas sin copias, "
+          f"QR en {sum(1 for seg in segments if seg.qr)} tramo(s)")
+
+
+def main() -> None:
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+    os.environ.setdefault("EXTRACTOR_DATA_DIR", tempfile.mkdtemp())
+    os.environ.setdefault("EXTRACTOR_DEDUP", "0")
+    os.environ.setdefault("EXTRACTOR_LAYOUT_CACHE", "0")  # misma cuenta en serie y en el pool
+    import jobs  # después de fijar el entorno (settings lee las variables al importar)
+    from worker_pool import WorkerPool
+
+    rnd = random.Random(8)
+    lines, numeros, copies = bundle(rnd, pages)
+    t0 = time.perf_counter()
+    segments = split_invoices(lines)
+    split_ms = (time.perf_counter() - t0) * 1000
+    found = [seg[4].split()[-1] for seg in segments]
+    print(f"{lines.pages} hojas, {len(numeros)} facturas + {copies} duplicados -> {len(segments)} tramos "
+          f"({'ok' if found == numeros else 'DISTINTO'}), corte {split_ms:.1f} ms")
+
+    # cada corrida con tramos recién cortados: extract_from_pdf deja el índice de importes en el LineIndex
+    jobs.segments_job("bundle.pdf", None, False, split_invoices(lines)[:5])  # calienta proveedores y regex
+    fresh = split_invoices(lines)
+    t0 = time.perf_counter()
+    serial = jobs.segments_job("bundle.pdf", None, False, fresh)
+    serial_s = time.perf_counter() - t0
+    print(f"en serie: {serial_s * 1000:.0f} ms ({serial_s * 1000 / len(segments):.2f} ms/factura)")
+
+    pool = WorkerPool(workers, initializer=jobs.init_worker)
+    pool.warm()
+    size = -(-len(segments) // workers)
+    chunks = lambda segs: [segs[i:i + size] for i in range(0, len(segs), size)]
+    run = lambda chunk: pool.run(jobs.segments_job, "bundle.pdf", None, False, chunk)
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        list(ex.map(run, chunks(split_invoices(lines))))  # primera vuelta: imports y cachés de cada worker
+        fresh = chunks(split_invoices(lines))
+        t0 = time.perf_counter()
+        parallel = [r for part in ex.map(run, fresh) for r in part]
+        par_s = time.perf_counter() - t0
+    pool.shutdown()
+    same = [{k: v for k, v in r.items() if k != "_meta"} for r in serial] == \
+           [{k: v for k, v in r.items() if k != "_meta"} for r in parallel]
+    print(f"pool de {workers}: {par_s * 1000:.0f} ms ({serial_s / par_s:.1f}x), mismos resultados: {same}")
+    if workers == 1:
+        print("(un solo CPU: el reparto sólo suma el costo de pasar los tramos al worker)")
+    scanned(os.path.join(ROOT, "vendors.yaml"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# benchmarks/bench_items_table.py
+# Detalle de ítems vectorizado (items_table.extract_items) sobre facturas sintéticas de
+# 100 a 5000 renglones: ms totales y por renglón (tiene que escalar ~lineal), más el parseo
+# de números en bloque contra parse_number_smart palabra por palabra (mismos valores).
+#
+#   python benchmarks/bench_items_table.py [REPS]
+import random
+import sys
+import time
+
+from _synth import invoice_words
+from extraction_core import _optional
+from extractor_utils import NUM_PURE, parse_number_smart
+from items_table import check_items, extract_items, parse_numbers
+
+SIZES = (100, 500, 1000, 5000)
+
+
+def best_of(fn, reps: int) -> float:
+    best = float("inf")
+    for _ in range(reps):
+        t0 = time.perf_counter(); fn(); best = min(best, time.perf_counter() - t0)
+    return best * 1e3
+
+
+def main() -> None:
+    np = _optional("numpy")
+    if np is None:
+        sys.exit("items_table necesita NumPy")
+    reps = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    rnd = random.Random(8)
+    print(f"{'renglones':>9} {'palabras':>9} {'ms':>9} {'us/renglón':>11} {'parseo loop':>12} {'parseo np':>10}")
+    for n in SIZES:
+        words, sub = invoice_words(rnd, n)
+        items = extract_items(words)
+        chk = check_items(items, sub)
+        assert chk["count"] == n and chk["cuadra"], chk
+        ms = best_of(lambda: extract_items(words), reps)
+
+        texts = [w[5] for w in words]
+        arr = np.array(texts, dtype=str)
+        loop_vals = [parse_number_smart(t) if NUM_PURE.match(t) else None for t in texts]
+        vals, _, is_amt = parse_numbers(np, arr)
+        assert all(v == vals[i] for i, v in enumerate(loop_vals) if v is not None and is_amt[i])
+        loop = best_of(lambda: [parse_number_smart(t) if NUM_PURE.match(t) else None for t in texts], reps)
+        vec = best_of(lambda: parse_numbers(np, np.array(texts, dtype=str)), reps)
+        print(f"{n:>9} {len(words):>9} {ms:>9.2f} {ms / n * 1e3:>11.1f} {loop:>10.2f}ms {vec:>8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# benchmarks/bench_layout_cache.py
+# Caché de disposición por formato (layout_cache): ms por factura sin y con caché sobre las
+# mismas líneas, tasa de aciertos y que el resultado sea el mismo que con la pasada completa.
+# Los documentos largos (muchos ítems) son los que más ganan: cabecera y handler dejan de
+# recorrer todo el texto.
+#
+#   python benchmarks/bench_layout_cache.py [N_DOCS]
+import os
+import random
+import sys
+import tempfile
+import time
+
+from _synth import invoice_lines, ROOT
+from extraction_core import LineIndex
+from extractor_v6 import extract_from_pdf
+from layout_cache import LayoutCache
+
+
+def closes(r) -> bool:
+    return abs(r["total"] - r["subtotal"] - sum(r["iva"].values()) - sum(r["percepciones"].values())) <= 0.05
+
+
+def run(docs, cfg, layouts=None):
+    t0 = time.perf_counter()
+    results = [extract_from_pdf("bench.pdf", cfg_path=cfg, lines=LineIndex(raw), layouts=layouts)
+               for raw in docs]
+    return results, (time.perf_counter() - t0) * 1000 / len(docs)
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    rnd = random.Random(5)
+    cfg = os.path.join(ROOT, "vendors.yaml")
+    docs = [invoice_lines(rnd, ("PIRELLI", "GUERRINI")[i % 2], items=rnd.randint(20, 400)) for i in range(n)]
+    run(docs[:10], cfg)  # calienta el índice de proveedores
+    base, base_ms = run(docs, cfg)
+    with tempfile.TemporaryDirectory() as tmp:
+        layouts = LayoutCache(os.path.join(tmp, "layouts.sqlite3"))
+        cached, cached_ms = run(docs, cfg, layouts)
+        stats = layouts.stats()
+        layouts.close()
+    diff = [(a, b) for a, b in zip(base, cached)
+            if {k: v for k, v in a.items() if k != "_meta"} != {k: v for k, v in b.items() if k != "_meta"}]
+    print(f"{n} facturas  sin caché {base_ms:.2f} ms/doc  con caché {cached_ms:.2f} ms/doc  "
+          f"({base_ms / cached_ms:.1f}x)")
+    print(f"entradas {stats['entries']}  aciertos {stats['hits']}/{stats['lookups']}  "
+          f"fallbacks {stats['fallbacks']}  hit_rate {stats['hit_rate']:.1%}")
+    # Sólo puede cambiar donde la pasada completa no cerraba (p. ej. un "IVA" de la cabecera
+    # dentro de la ventana del handler en facturas cortas) y con la caché sí cierra
+    print(f"resultados distintos {len(diff)}: la pasada completa cerraba en {sum(closes(a) for a, _ in diff)}, "
+          f"con caché cierran {sum(closes(b) for _, b in diff)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# benchmarks/bench_ocr_batch.py
+# OCR por lotes (ocr_batch) contra el camino de siempre (una llamada a Tesseract por hoja entera).
+# N escaneos sintéticos de una hoja A4 a 300 dpi con texto de factura dibujado. Reporta hojas por
+# segundo en cada camino, la cantidad de llamadas a Tesseract y si los renglones de cabecera y
+# totales que se leen son los mismos. Sin el binario de Tesseract sólo mide el recorte + armado
+# de las hojas compuestas (el costo que agrega el lote).
+#
+#   python benchmarks/bench_ocr_batch.py [FACTURAS]
+import os
+import random
+import sys
+import tempfile
+import time
+
+import _synth
+from extraction_core import DEFAULT_OCR_SOURCE, _optional
+import ocr_batch
+
+A4_300 = (2480, 3508)
+
+
+def synth_scans(tmp: str, n: int) -> list:
+    from PIL import Image, ImageDraw, ImageFont
+    try:
+        font = ImageFont.load_default(size=40)
+    except TypeError:  # Pillow < 10.1
+        font = ImageFont.load_default()
+    rnd = random.Random(5); paths = []
+    for i in range(n):
+        im = Image.new("L", A4_300, 255); d = ImageDraw.Draw(im)
+        for k, line in enumerate(_synth.invoice_lines(rnd, rnd.choice(("PIRELLI", "GUERRINI")), items=25)):
+            d.text((150, 150 + 60 * k), line, fill=0, font=font)
+        path = os.path.join(tmp, f"scan{i:03d}.png"); im.save(path); paths.append(path)
+    return paths
+
+
+def tesseract_ok() -> bool:
+    pytesseract = _optional("pytesseract")
+    try:
+        return pytesseract is not None and bool(pytesseract.get_tesseract_version())
+    except Exception:
+        return False
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 24
+    paths = synth_scans(tempfile.mkdtemp(), n)
+
+    t0 = time.perf_counter()
+    regs = [r for doc, p in enumerate(paths) for r in ocr_batch.regions(doc, ocr_batch._pages(p, None))]
+    sheets = ocr_batch.tile(regs)
+    prep = (time.perf_counter() - t0) * 1000 / n
+    print(f"{n} escaneos -> {len(regs)} recortes en {len(sheets)} hojas compuestas; "
+          f"recorte + armado: {prep:.1f} ms/hoja")
+    if not tesseract_ok():
+        print("OCR: (binario de Tesseract no disponible aquí)")
+        return
+
+    t0 = time.perf_counter()
+    full = [DEFAULT_OCR_SOURCE.image_file_lines(p) for p in paths]
+    single = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    batched = ocr_batch.batch_lines(paths)
+    batch = time.perf_counter() - t0
+    print(f"por hoja:  {n / single:6.2f} hojas/s ({n} llamadas)")
+    print(f"por lotes: {n / batch:6.2f} hojas/s ({len(sheets)} llamadas), {single / batch:.1f}x")
+    same = sum(1 for f, b in zip(full, batched) if b is not None and set(b) <= set(f))
+    print(f"renglones del lote presentes en el OCR completo: {same}/{n} facturas")
+
+
+if __name__ == "__main__":
+    main()
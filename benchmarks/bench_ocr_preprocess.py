@@ -0,0 +1,102 @@
+# benchmarks/bench_ocr_preprocess.py
+# Preprocesado antes de Tesseract (ocr_preprocess): páginas sintéticas renderizadas con PIL
+# y degradadas como un escaneo real (inclinación, ruido, papel amarillento, borde negro del
+# escáner y algunas a 600 dpi). Reporta:
+#   - ms por página del preprocesado y ángulo estimado contra el real
+#   - si hay Tesseract: ms de OCR por página y % de facturas que cierran en _validate_and_repair
+#     (sin warnings), sin y con preprocesado
+#
+#   python benchmarks/bench_ocr_preprocess.py [N_PAGES]
+import os
+import random
+import shutil
+import sys
+import time
+
+from PIL import Image, ImageDraw, ImageFont
+
+from _synth import invoice_lines, ROOT
+import extractor_v6
+from extraction_core import DEFAULT_OCR_SOURCE, LineIndex
+from extractor_v6 import extract_from_pdf
+from ocr_preprocess import OcrPreprocess
+
+A4_300 = (2480, 3508)
+
+
+def render_page(rnd: random.Random, vendor: str):
+    """(imagen degradada, ángulo aplicado en grados)."""
+    scale = 2 if rnd.random() < 0.25 else 1  # una de cada cuatro escaneada a 600 dpi
+    font = ImageFont.load_default(size=40 * scale)
+    img = Image.new("L", (A4_300[0] * scale, A4_300[1] * scale), 255)
+    draw = ImageDraw.Draw(img)
+    y = 120 * scale
+    for line in invoice_lines(rnd, vendor, items=rnd.randint(10, 30)):
+        draw.text((150 * scale, y), line, fill=rnd.randint(0, 60), font=font)
+        y += 56 * scale
+    angle = round(rnd.uniform(-3.0, 3.0), 2)
+    img = img.rotate(angle, resample=Image.BICUBIC, fillcolor=255)
+    # papel amarillento + ruido + borde del escáner
+    img = Image.blend(img, Image.effect_noise(img.size, 25), 0.12)
+    rgb = Image.merge("RGB", (img, img, img.point(lambda v: int(v * 0.88))))
+    border = ImageDraw.Draw(rgb)
+    border.rectangle((0, 0, rgb.width, 40 * scale), fill=(10, 10, 10))
+    border.rectangle((0, 0, 30 * scale, rgb.height), fill=(10, 10, 10))
+    return rgb, angle
+
+
+def tesseract_available() -> bool:
+    if shutil.which("tesseract") is None: return False
+    try:
+        import pytesseract
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+
+def reconciles(lines: LineIndex, vendor: str, cfg: str) -> bool:
+    """Corre cabecera / handler / validación sobre las líneas y devuelve si cerró sin warnings."""
+    seen = []
+    validate = extractor_v6._validate_and_repair
+    def spy(out, tol=0.05):
+        validate(out, tol); seen.append(not out["warnings"])
+    extractor_v6._validate_and_repair = spy
+    try:
+        extract_from_pdf("bench.pdf", vendor_hint=vendor, cfg_path=cfg, lines=lines)
+    finally:
+        extractor_v6._validate_and_repair = validate
+    return bool(seen and seen[0])
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    rnd = random.Random(11)
+    cfg = os.path.join(ROOT, "vendors.yaml")
+    pages = [(v,) + render_page(rnd, v) for v in (("PIRELLI", "GUERRINI")[i % 2] for i in range(n))]
+    pre = OcrPreprocess()
+
+    t0 = time.perf_counter()
+    prepared = [pre(img) for _, img, _ in pages]
+    pre_ms = (time.perf_counter() - t0) * 1000 / n
+    err = [abs(pre.analyze(img)["angle"] + angle) for _, img, angle in pages]
+    print(f"preprocesado: {pre_ms:.0f} ms/página  "
+          f"error de ángulo: medio {sum(err) / n:.2f}°, máx {max(err):.2f}°")
+
+    if not tesseract_available():
+        print("Tesseract no disponible: sin tiempos de OCR ni tasa de cierre")
+        return
+    for label, imgs in (("sin preprocesado", [img for _, img, _ in pages]), ("con preprocesado", prepared)):
+        ok = 0; t0 = time.perf_counter(); ocr_s = 0.0
+        for (vendor, _, _), img in zip(pages, imgs):
+            lines = LineIndex(source="ocr", conf=[], page_starts=[0])
+            t1 = time.perf_counter()
+            DEFAULT_OCR_SOURCE.image_lines(img, lines)
+            ocr_s += time.perf_counter() - t1
+            ok += reconciles(lines, vendor, cfg)
+        print(f"{label:18s} OCR {ocr_s * 1000 / n:.0f} ms/página  cierran {100.0 * ok / n:.0f}%  "
+              f"(total {time.perf_counter() - t0:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
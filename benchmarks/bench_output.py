@@ -0,0 +1,121 @@
+# benchmarks/bench_output.py
+# Tiempo de serialización por formato (json / kv / ini) y verificación de que
+# KV e INI producen exactamente los mismos bytes que la implementación anterior.
+#
+#   python benchmarks/bench_output.py [N]
+import json
+import random
+import re
+import sys
+import time
+from typing import Any, Dict, List
+
+from _synth import minimal_payload
+import output_writers
+
+
+# --- Implementación previa (server.py) como referencia de bytes ---
+def _num(v) -> str:
+    try:
+        return str(float(v)).replace(",", ".")
+    except Exception:
+        return "0"
+
+
+def _clean(s: str) -> str:
+    return re.sub(r"[\r\n=]+", " ", str(s)).strip()
+
+
+def legacy_kv(minimal: Dict[str, Any]) -> str:
+    lines: List[str] = []
+    lines.append("status=ok")
+    lines.append("version=1")
+    lines.append(f"numero={minimal.get('numero','')}")
+    lines.append(f"fecha={minimal.get('fecha','')}")
+    lines.append(f"cuit={minimal.get('cuit','')}")
+    lines.append(f"subtotal={_num(minimal.get('subtotal', 0))}")
+    lines.append(f"total={_num(minimal.get('total', 0))}")
+    iva = minimal.get("iva") or {}
+    iva_items = [(str(k), float(v)) for k, v in iva.items() if v and float(v) != 0.0]
+    lines.append(f"iva_count={len(iva_items)}")
+    order = ["27", "21", "10.5", "5", "2.5"]
+    def rank(k: str) -> int:
+        return order.index(k) if k in order else 999
+    iva_items.sort(key=lambda x: (rank(x[0]), x[0]))
+    for i, (rate, monto) in enumerate(iva_items, start=1):
+        lines.append(f"iva_{i}_tasa={_clean(rate)}")
+        lines.append(f"iva_{i}_monto={_num(monto)}")
+    for sect in ("percepciones", "retenciones"):
+        d = minimal.get(sect) or {}
+        items = [(k, float(v)) for k, v in d.items() if v and float(v) != 0.0]
+        items.sort(key=lambda x: x[0])
+        lines.append(f"{sect}_count={len(items)}")
+        for i, (name, monto) in enumerate(items, start=1):
+            lines.append(f"{sect}_{i}_clave={name}")
+            lines.append(f"{sect}_{i}_monto={_num(monto)}")
+    return "\n".join(lines)
+
+
+def legacy_ini(minimal: Dict[str, Any]) -> str:
+    out: List[str] = []
+    out += ["[meta]", "status=ok", "version=1", ""]
+    out += ["[factura]"]
+    out += [f"numero={minimal.get('numero','')}",
+            f"fecha={minimal.get('fecha','')}",
+            f"cuit={minimal.get('cuit','')}",
+            f"total={_num(minimal.get('total', 0))}", ""]
+    out += ["[iva]"]
+    iva = minimal.get("iva") or {}
+    order = ["27", "21", "10.5", "5", "2.5"]
+    for r in order:
+        if r in iva and float(iva[r]) != 0.0:
+            out.append(f"{r}={_num(iva[r])}")
+    for k, v in iva.items():
+        if k not in order and float(v) != 0.0:
+            out.append(f"{_clean(k)}={_num(v)}")
+    out.append("")
+    for sect in ("percepciones", "retenciones"):
+        out += [f"[{sect}]"]
+        for k, v in sorted((minimal.get(sect) or {}).items(), key=lambda x: x[0]):
+            if v and float(v) != 0.0:
+                out.append(f"{k}={_num(v)}")
+        out.append("")
+    return "\n".join(out)
+
+
+def legacy_json(minimal: Dict[str, Any]) -> bytes:
+    return json.dumps(minimal, ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def _bench(fn, payloads) -> float:
+    t0 = time.perf_counter()
+    for p in payloads:
+        fn(p)
+    return (time.perf_counter() - t0) / len(payloads) * 1e6
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rnd = random.Random(7)
+    payloads = [minimal_payload(rnd) for _ in range(n)]
+
+    for p in payloads:
+        assert output_writers.to_kv(p) == legacy_kv(p), p
+        assert output_writers.to_ini(p) == legacy_ini(p), p
+    print(f"bytes idénticos KV/INI en {n} payloads")
+
+    rows = [
+        ("kv", legacy_kv, output_writers.to_kv),
+        ("ini", legacy_ini, output_writers.to_ini),
+        ("json", legacy_json, output_writers.to_json_bytes),
+    ]
+    print(f"{'formato':8} {'antes us':>10} {'ahora us':>10} {'x':>6}")
+    for name, old, new in rows:
+        a = _bench(old, payloads); b = _bench(new, payloads)
+        print(f"{name:8} {a:10.2f} {b:10.2f} {a / b:6.2f}")
+    print(f"json backend: {'orjson' if output_writers.orjson else 'json'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# benchmarks/bench_overload.py
+# Modo degradado bajo carga mixta: un pico de pedidos /extract (30% escaneados) que supera lo que
+# los workers pueden hacer de OCR, y después carga normal. Con el modo activo los escaneos salen
+# con la capa de texto y el OCR se completa de fondo (deferred_ocr, carril bulk).
+# Planificador, gobernador y OCR diferido son los del servidor; los trabajos se simulan con su
+# tiempo de servicio (sleep). Reporta latencia de los PDFs con texto, con el modo apagado y prendido,
+# y cuánto tarda en completarse el OCR diferido.
+#
+#   python benchmarks/bench_overload.py [SLOTS]
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import _synth  # noqa: F401  (agrega la raíz del repo al path)
+from deferred_ocr import DeferredOcr, DeferredStore
+from overload import LoadGovernor
+from scheduler import BULK, INTERACTIVE, FairScheduler
+
+TEXT_MS = 5.0
+OCR_MS = 400.0
+SCAN_SHARE = 0.30
+PHASES = [(6.0, 40.0), (6.0, 8.0)]  # (segundos, pedidos/s): pico y carga normal
+
+
+def pct(values, q):
+    s = sorted(values)
+    return s[min(len(s) - 1, int(q * len(s)))] if s else 0.0
+
+
+def scenario(slots, degrade, tmp):
+    sched = FairScheduler(slots)
+    gov = LoadGovernor(lambda: sched.waiting, queue_high=2 * slots, queue_low=1, hold_s=1.0) if degrade else None
+
+    def deferred_run(pdf, vendor, items, tenant):
+        with sched.slot(tenant, BULK, True):
+            time.sleep(OCR_MS / 1000)
+        return {}
+
+    store = DeferredStore(os.path.join(tmp, f"deferred-{degrade}.sqlite3"))
+    deferred = DeferredOcr(store, os.path.join(tmp, "spool"), deferred_run)
+    deferred.start()
+    dummy = os.path.join(tmp, "scan.pdf")
+    with open(dummy, "wb") as f: f.write(b"%PDF-1.4\n%%EOF\n")
+
+    lat = {"text": [], "scan": []}; degraded_n = [0]
+
+    def request(scan, tenant):
+        t0 = time.perf_counter()
+        degraded = scan and gov is not None and gov.degraded()
+        with sched.slot(tenant, INTERACTIVE, scan and not degraded):
+            time.sleep((OCR_MS if scan and not degraded else TEXT_MS) / 1000)
+        if degraded:
+            deferred.submit(dummy, None, False, tenant); degraded_n[0] += 1
+        lat["scan" if scan else "text"].append((time.perf_counter() - t0) * 1000)
+
+    rnd = random.Random(11)
+    t_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=400) as ex:
+        for secs, rate in PHASES:
+            end = time.perf_counter() + secs
+            while time.perf_counter() < end:
+                ex.submit(request, rnd.random() < SCAN_SHARE, "caja-%d" % rnd.randint(1, 5))
+                time.sleep(rnd.expovariate(rate))
+    served = time.perf_counter() - t_start
+    while store.counts().get("pending") or store.counts().get("running"):
+        time.sleep(0.1)
+    drained = time.perf_counter() - t_start
+    deferred.stop(); store.close()
+    return lat, degraded_n[0], served, drained, gov
+
+
+def main() -> None:
+    slots = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    tmp = tempfile.mkdtemp()
+    print(f"{slots} slots; pico {PHASES[0][1]:.0f}/s x {PHASES[0][0]:.0f} s, luego {PHASES[1][1]:.0f}/s "
+          f"x {PHASES[1][0]:.0f} s; {SCAN_SHARE:.0%} escaneados (OCR {OCR_MS:.0f} ms, texto {TEXT_MS:.0f} ms)")
+    for degrade in (False, True):
+        lat, n, served, drained, gov = scenario(slots, degrade, tmp)
+        t = lat["text"]; s = lat["scan"]
+        print(f"modo degradado {'sí' if degrade else 'no'}: texto p50 {pct(t, .5):7.1f} ms  p95 {pct(t, .95):7.1f} ms"
+              f" | escaneos p95 {pct(s, .95):7.1f} ms | atendido en {served:.1f} s")
+        if degrade:
+            print(f"  {n} escaneos con OCR diferido, {gov.entered} entradas al modo degradado "
+                  f"(al final {'degradado' if gov.state()['degraded'] else 'normal'}), "
+                  f"OCR completo a los {drained:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
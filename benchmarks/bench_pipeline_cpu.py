@@ -0,0 +1,89 @@
+# benchmarks/bench_pipeline_cpu.py
+# CPU por documento de las etapas posteriores a la lectura del PDF
+# (cabecera, CUITs, handler / fallback, normalización) sobre facturas sintéticas.
+# --save guarda CPU por documento y un hash del payload de cada factura (JSON); --baseline compara
+# contra uno guardado (por ejemplo en el commit anterior a un cambio): imprime antes / después y
+# sale con código 1 si algún payload cambió.
+#
+#   python benchmarks/bench_pipeline_cpu.py [N_DOCS] [--profile] [--save base.json] [--baseline base.json]
+import argparse
+import cProfile
+import hashlib
+import json
+import pstats
+import random
+import sys
+import time
+
+from _synth import invoice_lines
+import extractor_v6 as ex
+from extractor_utils import extract_header_common, extract_names_and_cuits
+from vendors_registry import REGISTRY
+
+
+def run_doc(lines, vendor):
+    header = extract_header_common(lines)
+    extract_names_and_cuits(lines, vendor)
+    out = {"numero": header["numero"], "fecha": header["fecha"], "cuit_proveedor": "30-67701881-6"}
+    handler = REGISTRY.get(vendor) if vendor else None
+    if handler:
+        handler(lines, out)
+    else:
+        ex._fallback_labels(lines, out)
+    ex._validate_and_repair(out)
+    return ex._build_minimal_payload(out)
+
+
+def digest(payload) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="CPU por documento del pipeline sin lectura de PDF.")
+    ap.add_argument("n", nargs="?", type=int, default=1000, help="facturas sintéticas")
+    ap.add_argument("--profile", action="store_true", help="cProfile de una pasada más")
+    ap.add_argument("--save", help="guarda CPU y hashes de los payloads en este JSON")
+    ap.add_argument("--baseline", help="JSON de --save contra el que comparar")
+    args = ap.parse_args()
+    n = args.n
+    rnd = random.Random(11)
+    docs = []
+    for i in range(n):
+        vendor = ("PIRELLI", "GUERRINI", None)[i % 3]
+        docs.append((invoice_lines(rnd, vendor or "PIRELLI", items=rnd.randint(10, 120)), vendor))
+    for d in docs[:10]: run_doc(*d)  # warm-up
+
+    best = float("inf")
+    for _ in range(3):  # mejor de tres: menos ruido de la máquina
+        t0 = time.process_time()
+        for d in docs: run_doc(*d)
+        best = min(best, time.process_time() - t0)
+    cpu = best / n * 1e3
+    hashes = [digest(run_doc(*d)) for d in docs]
+    print(f"docs: {n}  CPU por documento: {cpu:.3f} ms")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"n": n, "cpu_ms": cpu, "payloads": hashes}, f)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            base = json.load(f)
+        if base["n"] != n:
+            sys.exit(f"la baseline es de {base['n']} documentos, no de {n}")
+        print(f"antes: {base['cpu_ms']:.3f} ms  después: {cpu:.3f} ms  ({cpu / base['cpu_ms'] - 1:+.0%})")
+        diff = [i for i, (a, b) in enumerate(zip(base["payloads"], hashes)) if a != b]
+        if diff:
+            print(f"payloads distintos: {len(diff)}/{n} (primero: documento {diff[0]})")
+            sys.exit(1)
+        print(f"payloads idénticos: {n}/{n}")
+
+    if args.profile:
+        prof = cProfile.Profile()
+        prof.enable()
+        for d in docs: run_doc(*d)
+        prof.disable()
+        pstats.Stats(prof).sort_stats("tottime").print_stats(12)
+
+
+if __name__ == "__main__":
+    main()
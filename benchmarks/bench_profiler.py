@@ -0,0 +1,45 @@
+# benchmarks/bench_profiler.py
+# Costo del diagnóstico sobre la parte de CPU del pipeline (extract_from_pdf con líneas ya leídas):
+#   - sin nada / con tiempos por etapa (trace) / con cProfile en cada extracción (slow_capture, profile_rate=1)
+#   - con el muestreador de pilas corriendo (lo que cuesta un /admin/profile mientras dura)
+#
+#   python benchmarks/bench_profiler.py [FACTURAS]
+import os
+import random
+import sys
+import tempfile
+import time
+
+from _synth import invoice_lines
+from extraction_core import LineIndex
+from extractor_v6 import extract_from_pdf
+from profiler import SlowLog, StackSampler, slow_capture
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    rnd = random.Random(1)
+    docs = [invoice_lines(rnd, rnd.choice(("PIRELLI", "GUERRINI")), items=rnd.randint(5, 150)) for _ in range(n)]
+    log = SlowLog(os.path.join(tempfile.mkdtemp(), "slow.sqlite3"))
+
+    def run(mode: str) -> float:
+        t0 = time.perf_counter()
+        for d in docs:
+            if mode in ("nada", "muestreo"):
+                extract_from_pdf("x.pdf", lines=LineIndex(d))
+            else:
+                with slow_capture(log, "x.pdf", float("inf"), 1.0 if mode == "cProfile" else 0.0) as trace:
+                    extract_from_pdf("x.pdf", lines=LineIndex(d), trace=trace)
+        return (time.perf_counter() - t0) * 1000 / n
+
+    run("nada")  # calienta proveedores y regex
+    for mode in ("nada", "trace", "cProfile", "muestreo"):
+        sampler = StackSampler().start() if mode == "muestreo" else None
+        ms = min(run(mode) for _ in range(3))
+        extra = f", {sampler.samples} muestras" if sampler else ""
+        if sampler: sampler.stop()
+        print(f"{mode:<9} {ms:6.2f} ms/factura{extra}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# benchmarks/bench_regex_guard.py
+# Fuzz de las reglas de normalización contra texto de OCR adversarial.
+# 1) Equivalencia: RuleSet (cadenas de búsquedas) == re.search en orden, sobre líneas aleatorias.
+# 2) Crecimiento: líneas con muchos "RET" / "IIBB" sin provincia. El regex original crece
+#    ~cúbico con el largo; la versión protegida es lineal y además recorta a MAX_LINE.
+# 3) Cota: peor tiempo de RuleSet.first sobre el corpus adversarial (líneas de hasta 200k chars).
+#
+#   python benchmarks/bench_regex_guard.py [N_FUZZ]
+import random
+import re
+import sys
+import time
+
+import _synth  # noqa: F401  (sys.path)
+from extractor_v6 import NORMALIZATION_RULES, _NORMALIZATION_COMPILED as RULES
+from patterns import MATCH_BUDGET_S, MAX_LINE, SLOW_MATCHES, ChainPattern
+
+TOKENS = ["RET", "RET.", "RETENCION", "RETENCIÓN", "PERCEP.", "PERCEPCION", "IVA", "IIBB", "IB", "BA",
+          "BUENOS", "AIRES", "ARBA", "P.B.A", "RIO", "RÍO", "NEGRO", "NEUQUEN", "NEUQUÉN", "CABA", "AGIP",
+          "SIRTAC", "GANANCIAS", "RG", "3337", "2126", "DN", "B70/07", "LOC.", "CONV.", "CONVENIO",
+          "SANTA", "FE", "CRUZ", "TUCUMAN", "ENTRE", "RIOS", "LA", "PAMPA", "RIOJA", "SELLOS", "ITC",
+          "IMPUESTO", "AL", "COMBUSTIBLE", "CORDOBA", "CHUBUT", "MENDOZA", "xx", "123,45", "-", "/"]
+LEGACY = [(re.compile(p, re.I), key) for p, key in NORMALIZATION_RULES]
+
+
+def legacy_first(text: str):
+    for pattern, key in LEGACY:
+        if pattern.search(text): return key
+    return None
+
+
+def fuzz(n: int) -> None:
+    rnd = random.Random(37)
+    for _ in range(n):
+        line = " ".join(rnd.choice(TOKENS) for _ in range(rnd.randint(1, 12)))
+        if rnd.random() < 0.3: line = line.replace(" ", rnd.choice(["", "  ", ".", "-"]), rnd.randint(1, 3))
+        assert RULES.first(line) == legacy_first(line), line
+        for (chain, _), (legacy, _) in zip(RULES, LEGACY):
+            assert chain.search(line) == bool(legacy.search(line)), (chain.pattern, line)
+    print(f"fuzz: {n} líneas x {len(LEGACY)} reglas, mismo resultado")
+
+
+def adversarial(k: int) -> str:
+    return "RET " * k + "IIBB " * k + "x"
+
+
+def growth() -> None:
+    rule = next(p for p, key in NORMALIZATION_RULES if key == "retencion_iibb_pcia_bs_as")
+    legacy = re.compile(rule, re.I); chain = ChainPattern(rule, re.I)
+    print(f"{'chars':>8} {'re.search ms':>13} {'cadena ms':>10}")
+    for k in (25, 50, 100, 200, 400):
+        line = adversarial(k)
+        t0 = time.perf_counter(); legacy.search(line); old = (time.perf_counter() - t0) * 1e3
+        t0 = time.perf_counter(); chain.search(line); new = (time.perf_counter() - t0) * 1e3
+        print(f"{len(line):>8} {old:>13.2f} {new:>10.3f}")
+        if old > 2000: break
+
+
+def bound() -> None:
+    rnd = random.Random(5)
+    corpus = [adversarial(k) for k in (100, 1000, 20000)]
+    corpus += ["IIBB " * 40000, "RETENCION " * 20000 + "IVA", "9" * 200000,
+               " ".join(rnd.choice(TOKENS) for _ in range(30000))]
+    SLOW_MATCHES.clear()
+    worst = 0.0
+    for line in corpus:
+        for _ in range(3):
+            t0 = time.perf_counter(); RULES.first(line); worst = max(worst, time.perf_counter() - t0)
+    print(f"cota: MAX_LINE={MAX_LINE}, peor RuleSet.first sobre {len(corpus)} líneas de hasta "
+          f"{max(map(len, corpus))} chars: {worst * 1e3:.3f} ms (presupuesto {MATCH_BUDGET_S * 1e3:.1f} ms, "
+          f"lentas contadas: {SLOW_MATCHES.get(RULES.name, 0)})")
+
+
+def main() -> None:
+    fuzz(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
+    growth()
+    bound()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# benchmarks/bench_results_store.py
+# Almacén de resultados (results_store) con N facturas sintéticas (default 1.000.000) de 2.000
+# CUITs y un año de fechas. Reporta el tiempo de carga y, para las consultas típicas de
+# conciliación, ms por página de 100 (primera y página 50 por cursor) con el plan de SQLite;
+# y la exportación CSV de un mes completo (filas/s y pico de memoria de Python).
+#
+#   python benchmarks/bench_results_store.py [FACTURAS]
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from _synth import minimal_payload
+import output_writers
+from extractor_v6 import FIXED_TAX_FIELDS
+from results_store import _COLUMNS, ResultsStore, _where
+
+CUITS = [f"30{n:08d}{n % 10}" for n in range(2000)]
+VENDORS = ("PIRELLI", "GUERRINI", "FALLBACK")
+
+
+def load(store: ResultsStore, n: int) -> None:
+    rnd = random.Random(9); rows = []; now = time.time()
+    for i in range(n):
+        p = minimal_payload(rnd); p["cuit"] = rnd.choice(CUITS)
+        rows.append(store._row(p, rnd.choice("AB"), str(rnd.randint(10 ** 13, 10 ** 14 - 1)),
+                               rnd.choice(VENDORS), f"f{i}.pdf", "text", True, now))
+        if len(rows) == 50_000:
+            store.record_many(rows); rows = []
+    store.record_many(rows)
+
+
+def timed(store: ResultsStore, label: str, **filters) -> None:
+    where, args = _where(**{k: filters.get(k) for k in ("cuit", "desde", "hasta", "numero", "vendor", "tipo")})
+    sql = f"SELECT {_COLUMNS} FROM results" + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY fecha, id"
+    plan = "; ".join(r[-1] for r in store._db.execute("EXPLAIN QUERY PLAN " + sql, args))
+    t0 = time.perf_counter(); items, cursor = store.query(**filters); first = (time.perf_counter() - t0) * 1000
+    pages = 1; t0 = time.perf_counter()
+    while cursor and pages < 50:
+        items, cursor = store.query(cursor=cursor, **filters); pages += 1
+    later = (time.perf_counter() - t0) * 1000 / max(1, pages - 1)
+    print(f"{label:<28} 1ra {first:6.2f} ms, siguientes {later:6.2f} ms/página  [{plan}]")
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    store = ResultsStore(os.path.join(tempfile.mkdtemp(), "results.sqlite3"))
+    t0 = time.perf_counter(); load(store, n)
+    secs = time.perf_counter() - t0
+    print(f"{n} facturas cargadas en {secs:.1f} s ({n / secs:.0f}/s), "
+          f"{os.path.getsize(store.path) / 1e6:.0f} MB")
+
+    cuit = CUITS[7]
+    timed(store, "CUIT + mes", cuit=cuit, desde="2025-03-01", hasta="2025-03-31")
+    timed(store, "CUIT (todo)", cuit=cuit)
+    timed(store, "rango de fechas (1 semana)", desde="2025-06-01", hasta="2025-06-07")
+    timed(store, "proveedor + mes", vendor="PIRELLI", desde="2025-03-01", hasta="2025-03-31")
+    some = store.query(cuit=cuit, limit=1)[0][0]["numero"]
+    timed(store, "número", numero=some)
+
+    def export() -> tuple:
+        size = rows = 0
+        for chunk in output_writers.iter_csv(store.iter_query(desde="2025-03-01", hasta="2025-03-31"),
+                                             FIXED_TAX_FIELDS):
+            size += len(chunk); rows += chunk.count(b"\n")
+        return size, rows - 1
+
+    t0 = time.perf_counter(); size, rows = export(); secs = time.perf_counter() - t0
+    tracemalloc.start(); export()  # segunda pasada sólo para el pico (tracemalloc la hace más lenta)
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    print(f"export CSV de un mes: {rows} filas, {size / 1e3:.0f} KB en {secs * 1000:.0f} ms "
+          f"({rows / secs:.0f} filas/s), pico de memoria {peak:.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# benchmarks/bench_scheduler.py
+# Prueba de carga del planificador (scheduler.FairScheduler): un ERP manda un lote de 10.000
+# facturas (32 en vuelo, 10% escaneadas con OCR) mientras dos cajas hacen /extract sueltos.
+# Los trabajos se simulan con su tiempo de servicio (sleep): lo que se mide es la cola, no el
+# extractor. Reporta latencia p50 / p95 de las cajas:
+#   - sin lote (referencia)
+#   - con el lote y una sola cola FIFO (como antes del planificador)
+#   - con el lote y el planificador (carril interactivo + reparto justo + tope de OCR)
+# y el ritmo del lote en cada caso.
+#
+#   python benchmarks/bench_scheduler.py [FACTURAS_LOTE] [SLOTS]
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import _synth  # noqa: F401  (agrega la raíz del repo al path)
+from scheduler import BULK, INTERACTIVE, FairScheduler
+
+TEXT_MS = 3.0       # PDF con texto
+OCR_MS = 20.0       # PDF escaneado
+OCR_SHARE = 0.10
+BULK_IN_FLIGHT = 32
+CAJA_MS = 5.0       # un /extract de caja
+CAJA_EVERY_MS = 25.0
+
+
+def pct(values, q):
+    s = sorted(values)
+    return s[min(len(s) - 1, int(q * len(s)))] if s else 0.0
+
+
+def run_job(sched, tenant, lane, ocr, ms):
+    with sched.slot(tenant, lane, ocr):
+        time.sleep(ms / 1000)
+
+
+def cajas(sched, fifo, stop, lat, rnd):
+    """Dos cajas alternadas hasta que `stop` se setea; latencia = cola + servicio."""
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        i = 0
+        while not stop.is_set():
+            tenant = "caja-%d" % (i % 2); i += 1
+            def one(tenant=tenant):
+                t0 = time.perf_counter()
+                run_job(sched, "todos" if fifo else tenant, BULK if fifo else INTERACTIVE, False, CAJA_MS)
+                lat.append((time.perf_counter() - t0) * 1000)
+            ex.submit(one)
+            time.sleep(rnd.expovariate(1000 / CAJA_EVERY_MS))
+
+
+def lote(sched, fifo, n, rnd):
+    jobs = [(rnd.random() < OCR_SHARE) for _ in range(n)]
+    it = iter(jobs); lock = threading.Lock()
+
+    def feeder():
+        while True:
+            with lock:
+                ocr = next(it, None)
+            if ocr is None: return
+            run_job(sched, "todos" if fifo else "erp", BULK, ocr, OCR_MS if ocr else TEXT_MS)
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=feeder) for _ in range(BULK_IN_FLIGHT)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    return time.perf_counter() - t0
+
+
+def scenario(name, sched, fifo, n, with_batch):
+    rnd = random.Random(4)
+    lat = []; stop = threading.Event()
+    driver = threading.Thread(target=cajas, args=(sched, fifo, stop, lat, rnd))
+    driver.start()
+    if with_batch:
+        secs = lote(sched, fifo, n, random.Random(5))
+    else:
+        time.sleep(3); secs = 0.0
+    stop.set(); driver.join()
+    rate = f", lote {n / secs:.0f} facturas/s ({secs:.1f} s)" if secs else ""
+    print(f"{name:<28} cajas p50 {pct(lat, .5):6.1f} ms  p95 {pct(lat, .95):6.1f} ms  (n={len(lat)}){rate}")
+    return pct(lat, .95)
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    slots = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    print(f"{slots} slots, lote de {n} facturas ({OCR_SHARE:.0%} OCR), {BULK_IN_FLIGHT} en vuelo")
+    base = scenario("sin lote", FairScheduler(slots), False, n, False)
+    fifo = scenario("lote + FIFO", FairScheduler(slots, interactive_reserved=0), True, n, True)
+    sched = FairScheduler(slots, ocr_slots=max(1, slots // 2))
+    fair = scenario("lote + planificador", sched, False, n, True)
+    print(f"p95 de cajas con lote / sin lote: FIFO {fifo / base:.1f}x, planificador {fair / base:.1f}x")
+    erp = sched.snapshot()["tenants"]["erp"]
+    print(f"métricas erp: atendidas {erp['done']}, espera p95 {erp['wait_p95_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# benchmarks/bench_text_cache.py
+# Re-proceso desde la caché de texto: tamaño por factura y ms por factura para
+# leer de la caché + cabecera / handler / normalización (extract_from_pdf(lines=...)).
+# Sirve para estimar cuánto tarda re-correr reglas sobre el archivo histórico.
+#
+#   python benchmarks/bench_text_cache.py [N_DOCS]
+import os
+import random
+import sys
+import tempfile
+import time
+
+from _synth import invoice_lines, ROOT
+from extraction_core import LineIndex, backend_version
+from extractor_v6 import extract_from_pdf
+from text_cache import TextCache
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    rnd = random.Random(3)
+    backend = backend_version() + "+qr2"
+    cfg = os.path.join(ROOT, "vendors.yaml")
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = TextCache(os.path.join(tmp, "text_cache.sqlite3"))
+        for i in range(n):
+            raw = invoice_lines(rnd, ("PIRELLI", "GUERRINI")[i % 2], items=rnd.randint(10, 120))
+            ocr = i % 4 == 0  # una de cada cuatro como si viniera de OCR (con confianza por línea)
+            lines = LineIndex(raw, source="ocr" if ocr else "text",
+                              conf=[round(rnd.uniform(60, 96), 1) for _ in raw] if ocr else None)
+            cache.put(f"{i:064x}", backend, lines)
+        for _ in range(2):  # la primera vuelta calienta el índice de proveedores
+            t0 = time.perf_counter()
+            count = 0
+            for digest, lines in cache.entries(backend):
+                extract_from_pdf(digest, cfg_path=cfg, lines=lines)
+                count += 1
+            elapsed = time.perf_counter() - t0
+        cache.close()
+        size = os.path.getsize(cache.path)  # después de close: el WAL ya se volcó
+    print(f"docs: {count}  caché: {size / count / 1024:.1f} KB/doc")
+    print(f"re-proceso desde caché: {elapsed / count * 1e3:.2f} ms/doc")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# benchmarks/bench_totals_solver.py
+# Reparación de totales (totals_solver) sobre facturas sintéticas que no cierran como salen de
+# los handlers: GUERRINI con un importe de más en el bloque (bonificación, neto no gravado) que
+# corre los "primeros cuatro números", PIRELLI con una línea de IVA de más, dos alícuotas y
+# varias percepciones. Cuenta reparadas bien / mal / sin reparar y ms por factura.
+# Ambiguas: IVA 10,5% más una percepción igual al 21% del neto cierra también como IVA 21% más
+# una percepción del 10,5%; ninguna se tiene que reparar.
+# Peor caso: MAX_CANDIDATES importes en el bloque, muchos compatibles con alguna alícuota,
+# varios candidatos a total y casi nunca una asignación que cierre: ms y pasos por factura.
+#
+#   python benchmarks/bench_totals_solver.py [FACTURAS]
+import random
+import sys
+import time
+from typing import List, Tuple
+
+import _synth
+import totals_solver
+from extractor_v6 import IVA_RATES_CANON, REGISTRY, _repair_totals
+
+A = _synth._amount
+Truth = Tuple[float, float, float, float]  # subtotal, IVA, percepciones, total
+FIELDS = ("subtotal", "iva", "percepciones_total", "total")
+
+
+def guerrini(rnd: random.Random) -> Tuple[List[str], Truth]:
+    sub = round(rnd.uniform(1e4, 5e6), 2); iva = round(sub * 0.21, 2); perc = round(sub * 0.03, 2)
+    total = round(sub + iva + perc, 2)
+    extra = A(round(rnd.uniform(100, sub / 10), 2))
+    labels = ["SUBTOTAL:", "BONIFICACION:", "IVA 21.00 %:", "PERCEP. IIBB:", "TOTAL:"]
+    return ["items ..."] * 20 + labels + [A(sub), extra, A(iva), A(perc), A(total), "CAE N°: 71565354379101"], \
+        (sub, iva, perc, total)
+
+
+def pirelli(rnd: random.Random) -> Tuple[List[str], Truth]:
+    b1 = round(rnd.uniform(1e4, 3e6), 2); b2 = round(rnd.uniform(1e3, 1e6), 2) if rnd.random() < 0.5 else 0.0
+    sub = round(b1 + b2, 2); i1 = round(b1 * 0.21, 2); i2 = round(b2 * 0.105, 2)
+    percs = [round(sub * rnd.choice((0.01, 0.015, 0.03)), 2) for _ in range(rnd.randint(0, 3))]
+    total = round(sub + i1 + i2 + sum(percs), 2)
+    lines = ["items ..."] * 20 + ["Subtotal", A(sub), "IVA 21%", A(i1)]
+    if b2: lines += ["IVA 10,5%", A(i2)]
+    for k, p in enumerate(percs):
+        lines += [("Percepción IIBB Buenos Aires", "Percepción IIBB CABA", "Perc. IVA RG 2408")[k], A(p)]
+    lines += ["Importe Total", A(total)]
+    j = lines.index("Subtotal") + rnd.randint(0, 3)  # una línea con "IVA" que no es un importe de IVA
+    lines[j:j] = ["Cond. IVA: RESPONSABLE INSCRIPTO", f"Bultos {rnd.randint(1, 40)},00"]
+    return lines, (sub, round(i1 + i2, 2), round(sum(percs), 2), total)
+
+
+def ambiguous(rnd: random.Random) -> List[str]:
+    sub = round(rnd.uniform(1e4, 5e6), 2); i = round(sub * 0.105, 2); p = round(sub * 0.21, 2)
+    return ["items ..."] * 20 + [f"SUBTOTAL {A(sub)}", f"IVA 10,5% {A(i)}", f"PERC IIBB {A(p)}",
+                                 f"TOTAL {A(round(sub + i + p, 2))}"]
+
+
+def worst_case(rnd: random.Random) -> List[str]:
+    """
+    MAX_CANDIDATES importes: dos tercios subtotales con su IVA a distintas alícuotas, un tercio
+    importes grandes que podrían ser el total (casi nunca cierra: se recorre todo).
+    """
+    big = totals_solver.MAX_CANDIDATES // 3
+    lines = ["SUBTOTAL"]
+    while len(lines) <= totals_solver.MAX_CANDIDATES - big:
+        s = round(rnd.uniform(1e4, 1e5), 2)
+        lines += [A(s), A(round(s * rnd.choice(IVA_RATES_CANON) / 100, 2))]
+    return lines + [A(round(rnd.uniform(2e5, 5e5), 2)) for _ in range(big)]
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rnd = random.Random(11)
+    for name, make in (("GUERRINI", guerrini), ("PIRELLI", pirelli)):
+        handler = REGISTRY[name]; ok = wrong = none = closed = 0; secs = 0.0
+        for _ in range(n):
+            lines, truth = make(rnd)
+            out = {"debug": {}}; handler(lines, out); meta = {}
+            t0 = time.perf_counter(); _repair_totals(lines, out, meta); secs += time.perf_counter() - t0
+            right = all(abs((out[f] or 0.0) - v) < 0.01 for f, v in zip(FIELDS, truth))
+            if "repaired" in meta: ok += right; wrong += not right
+            elif right: closed += 1
+            else: none += 1
+        print(f"{name:<9} {n} facturas: cerraban {closed}, reparadas bien {ok}, mal {wrong}, "
+              f"sin reparar {none}; {secs / n * 1000:.3f} ms/factura")
+
+    handler = REGISTRY["GUERRINI"]; fixed = 0
+    for _ in range(n):
+        lines = ambiguous(rnd); out = {"debug": {}}; handler(lines, out); meta = {}
+        before = {f: out.get(f) for f in FIELDS}
+        _repair_totals(lines, out, meta)
+        fixed += "repaired" in meta or before != {f: out.get(f) for f in FIELDS}
+    print(f"ambiguas   {n} facturas: reparadas {fixed} (tienen que ser 0)")
+
+    docs = [worst_case(rnd) for _ in range(200)]
+    t0 = time.perf_counter(); steps = 0
+    for d in docs:
+        trace = {}
+        totals_solver.solve(d, {}, IVA_RATES_CANON, trace=trace)
+        steps = max(steps, trace["pasos"])
+    secs = (time.perf_counter() - t0) / len(docs)
+    print(f"peor caso ({totals_solver.MAX_CANDIDATES} candidatos): {secs * 1000:.2f} ms/factura, "
+          f"hasta {steps} pasos (tope {totals_solver.MAX_STEPS})")
+
+
+
+if __name__ == "__main__":
+    main()
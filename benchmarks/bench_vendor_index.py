@@ -0,0 +1,87 @@
+# benchmarks/bench_vendor_index.py
+# Detección de proveedor: índice (str.find con pocos proveedores, Aho-Corasick + CUIT con muchos)
+# contra detect_vendor_basic + detect_vendor_by_cuit, con los 2 proveedores reales (el caso de
+# todos los días) y con N sintéticos. Verifica que str.find y el autómata den los mismos puntajes.
+#
+#   python benchmarks/bench_vendor_index.py [N_VENDORS]
+import random
+import sys
+import time
+
+from _synth import invoice_lines
+from extractor_utils import detect_vendor_basic, detect_vendor_by_cuit, cuit_is_valid
+import vendor_index
+from vendor_index import VendorIndex
+
+WORDS = ["NEUMATICOS", "LUBRICANTES", "DISTRIBUIDORA", "AUTOPARTES", "SERVICIOS", "LLANTAS",
+         "REPUESTOS", "COMERCIAL", "INDUSTRIAL", "DEL", "SUR", "NORTE", "ANDINA", "PAMPA"]
+
+
+def _cuit(rnd: random.Random) -> str:
+    while True:
+        d = f"{rnd.choice(['20', '27', '30', '33'])}{rnd.randint(10**7, 10**8 - 1)}"
+        for v in range(10):
+            if cuit_is_valid(d + str(v)):
+                return f"{d[:2]}-{d[2:]}-{v}"
+
+
+def synthetic_config(n: int, rnd: random.Random):
+    names = {"PIRELLI": ["PIRELLI NEUMÁTICOS", "PIRELLI NEUMATICOS"],
+             "GUERRINI": ["GUERRINI NEUMÁTICOS", "GUERRINI NEUMATICOS"]}
+    cuits = {"33-50223253-9": "PIRELLI", "30-67701881-6": "GUERRINI"}
+    for i in range(n - 2):
+        vid = f"PROV{i:04d}"
+        base = f"{rnd.choice(WORDS)} {rnd.choice(WORDS)} {vid}"
+        names[vid] = [f"{base} S.A.", f"{base} SA"]
+        cuits[_cuit(rnd)] = vid
+    return names, cuits
+
+
+def _time(fn, docs, reps: int = 3) -> float:
+    best = float("inf")
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        for d in docs: fn(d)
+        best = min(best, (time.perf_counter() - t0) / len(docs))
+    return best * 1e3
+
+
+def run(n: int, rnd: random.Random) -> None:
+    names, cuits = synthetic_config(n, rnd)
+    t0 = time.perf_counter()
+    index = VendorIndex(names, cuits)
+    build_ms = (time.perf_counter() - t0) * 1e3
+
+    # Peor caso para el loop anidado: la factura es de un proveedor desconocido
+    # o de uno que está al final de la lista.
+    docs = [invoice_lines(rnd, "PIRELLI") for _ in range(50)]
+    unknown = [[l.replace("PIRELLI", "ACME") for l in d] for d in docs]
+    unknown = [[l.replace("33-50223253-9", "30-11111111-8") for l in d] for d in unknown]
+
+    def legacy(lines):
+        return detect_vendor_basic(lines, names) or detect_vendor_by_cuit("30-11111111-8", cuits)
+
+    print(f"proveedores: {n}  estados AC: {len(index.automaton.goto)}  build: {build_ms:.1f} ms  "
+          f"({'str.find' if len(index._patterns) <= vendor_index.FIND_MAX else 'autómata'})")
+    print(f"{'caso':12} {'loop ms':>10} {'índice ms':>10}")
+    for label, ds in (("conocido", docs), ("desconocido", unknown)):
+        print(f"{label:12} {_time(legacy, ds):10.3f} {_time(index.detect, ds):10.3f}")
+    assert all(index.detect(d) == "PIRELLI" for d in docs)
+    assert index.match_cuit("30677018816") == "GUERRINI"
+    fast = [index.scores(d) for d in docs + unknown]
+    keep = vendor_index.FIND_MAX; vendor_index.FIND_MAX = -1  # todo por el autómata y RE_CUIT
+    try:
+        assert fast == [index.scores(d) for d in docs + unknown]
+    finally:
+        vendor_index.FIND_MAX = keep
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    rnd = random.Random(3)
+    for size in (2, n):
+        run(size, rnd)
+
+
+if __name__ == "__main__":
+    main()
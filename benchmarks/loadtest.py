@@ -0,0 +1,327 @@
+# benchmarks/loadtest.py
+# Prueba de carga local: levanta server:app (uvicorn) con N workers y le manda pedidos /extract
+# como los del cliente VB6 -mezcla configurable de PDFs con texto y escaneados (sintéticos, con
+# PyMuPDF / PIL), proveedor y ?format=json|kv|ini- con llegadas de lazo abierto (Poisson a `rate`
+# pedidos/s: el próximo pedido no espera al anterior, como en producción).
+# Por corrida (workers x rate): throughput, latencia p50 / p95 / p99 (desde la llegada programada,
+# así la cola del propio cliente también cuenta), tasa de error y RSS del servidor + workers en el
+# tiempo. Saturación por cantidad de workers: el mayor rate que se sostiene (throughput >= 95% de
+# lo enviado, errores <= 1%, p95 <= --slo-ms); dividido por workers da pedidos/s por núcleo.
+# --save guarda el resultado (JSON); --baseline compara contra uno guardado y sale con código 1 si
+# algo empeoró más de --tolerance.
+# Por default la caché de texto, el índice de duplicados y el modo degradado van apagados (la
+# misma factura repetida saldría de la caché); se cambian con --env EXTRACTOR_TEXT_CACHE=1, etc.
+#
+#   python benchmarks/loadtest.py --workers 1,2,4 --rates 2,4,8,16 --duration 30 --save base.json
+#   python benchmarks/loadtest.py --workers 2 --rates 8 --baseline base.json
+#   python benchmarks/loadtest.py --url http://127.0.0.1:8000 --pid 1234 --rates 4   (servidor ya levantado)
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from _synth import ROOT, invoice_lines
+from extraction_core import _optional
+from scheduler import parse_weights
+
+SAT_THROUGHPUT = 0.95   # fracción de lo enviado por segundo que tiene que salir para considerarlo sostenido
+SAT_ERRORS = 0.01
+RSS_EVERY_S = 1.0
+START_TIMEOUT_S = 60.0
+
+
+# ---- documentos sintéticos ----
+def text_pdf(path: str, lines: List[str]) -> None:
+    fitz = _optional("fitz")
+    doc = fitz.open(); page = None; y = 0
+    for line in lines:
+        if page is None or y > 800:
+            page = doc.new_page(); y = 50
+        page.insert_text((50, y), line, fontsize=9); y += 12
+    doc.save(path); doc.close()
+
+
+def scanned_pdf(path: str, lines: List[str], dpi: int = 200) -> None:
+    from PIL import Image, ImageDraw, ImageFont
+    try:
+        font = ImageFont.load_default(size=dpi // 8)
+    except TypeError:  # Pillow < 10.1
+        font = ImageFont.load_default()
+    w, h = int(8.27 * dpi), int(11.69 * dpi); step = dpi // 6
+    pages = []; d = None; y = h
+    for line in lines:
+        if y > h - dpi:
+            pages.append(Image.new("L", (w, h), 255)); d = ImageDraw.Draw(pages[-1]); y = dpi // 2
+        d.text((dpi // 2, y), line, fill=0, font=font); y += step
+    pages[0].save(path, save_all=True, append_images=pages[1:], resolution=dpi)
+
+
+def make_docs(tmp: str, per_kind: int, kinds: Dict[str, float], vendors: Dict[str, float],
+              seed: int = 7) -> Dict[str, List[Tuple[str, str, bytes]]]:
+    """{"text" | "scan": [(archivo, proveedor, bytes)]}."""
+    rnd = random.Random(seed); out: Dict[str, List[Tuple[str, str, bytes]]] = {}
+    for kind in kinds:
+        out[kind] = []
+        for i in range(per_kind):
+            vendor = pick(rnd, vendors)
+            path = os.path.join(tmp, f"{kind}{i:03d}.pdf")
+            lines = invoice_lines(rnd, vendor, items=rnd.randint(5, 60))
+            (text_pdf if kind == "text" else scanned_pdf)(path, lines)
+            with open(path, "rb") as f:
+                out[kind].append((os.path.basename(path), vendor, f.read()))
+    return out
+
+
+def pick(rnd: random.Random, weights: Dict[str, float]) -> str:
+    return rnd.choices(list(weights), weights=list(weights.values()))[0]
+
+
+# ---- servidor ----
+def start_server(workers: int, port: int, env: Dict[str, str]) -> subprocess.Popen:
+    e = dict(os.environ, EXTRACTOR_WORKERS=str(workers), **env)
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1",
+                             "--port", str(port), "--log-level", "warning"], cwd=ROOT, env=e)
+    end = time.time() + START_TIMEOUT_S
+    while time.time() < end:
+        if proc.poll() is not None:
+            raise RuntimeError(f"el servidor terminó al arrancar (código {proc.returncode})")
+        try:
+            c = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            c.request("GET", "/health")
+            if c.getresponse().status == 200:
+                return proc
+        except OSError:
+            time.sleep(0.3)
+    proc.kill()
+    raise RuntimeError("el servidor no respondió /health")
+
+
+def tree_rss_mb(pid: int) -> Optional[float]:
+    """RSS del proceso y sus descendientes (workers), por /proc (Linux)."""
+    parents: Dict[int, List[int]] = {}; rss: Dict[int, int] = {}
+    try:
+        names = os.listdir("/proc")
+    except OSError:
+        return None
+    for name in names:
+        if not name.isdigit(): continue
+        try:
+            with open(f"/proc/{name}/status") as f:
+                status = dict(line.split(":", 1) for line in f if ":" in line)
+        except OSError:
+            continue
+        p = int(name)
+        parents.setdefault(int(status.get("PPid", "0")), []).append(p)
+        rss[p] = int(status.get("VmRSS", "0 kB").split()[0])
+    if pid not in rss:
+        return None
+    total = 0; todo = [pid]
+    while todo:
+        p = todo.pop(); total += rss.get(p, 0); todo.extend(parents.get(p, ()))
+    return round(total / 1024, 1)
+
+
+# ---- carga ----
+def multipart(fields: Dict[str, str], name: str, content: bytes) -> Tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    body = b"".join(f'--{boundary}\r\nContent-Disposition: form-data; name="{k}"\r\n\r\n{v}\r\n'.encode()
+                    for k, v in fields.items())
+    body += (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{name}"\r\n'
+             f"Content-Type: application/pdf\r\n\r\n").encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def pct(values: List[float], q: float) -> Optional[float]:
+    s = sorted(values)
+    return round(s[min(len(s) - 1, int(q * len(s)))], 1) if s else None
+
+
+def run_load(url: str, pid: Optional[int], docs: Dict[str, List[Tuple[str, str, bytes]]],
+             kinds: Dict[str, float], formats: Dict[str, float], rate: float, duration: float,
+             timeout: float, max_inflight: int, seed: int = 11) -> Dict[str, Any]:
+    u = urllib.parse.urlsplit(url)
+    local = threading.local()
+    lat: List[float] = []; errors = [0]; done_at = [0.0]; lock = threading.Lock()
+
+    def send(at: float, kind: str, doc: Tuple[str, str, bytes], fmt: str) -> None:
+        name, vendor, content = doc
+        body, ctype = multipart({"vendor": vendor}, name, content)
+        ok = False
+        try:
+            if getattr(local, "conn", None) is None:
+                local.conn = http.client.HTTPConnection(u.hostname, u.port or 80, timeout=timeout)
+            local.conn.request("POST", f"/extract?format={fmt}", body=body, headers={"Content-Type": ctype})
+            resp = local.conn.getresponse(); resp.read()
+            ok = resp.status == 200
+        except (OSError, http.client.HTTPException):
+            local.conn = None
+        now = time.perf_counter()
+        with lock:
+            if ok: lat.append((now - at) * 1000)
+            else: errors[0] += 1
+            done_at[0] = max(done_at[0], now)
+
+    rss: List[Tuple[float, float]] = []; stop = threading.Event()
+    t0 = time.perf_counter()
+
+    def sample_rss() -> None:
+        while not stop.is_set():
+            mb = tree_rss_mb(pid) if pid else None
+            if mb is not None: rss.append((round(time.perf_counter() - t0, 1), mb))
+            stop.wait(RSS_EVERY_S)
+
+    sampler = threading.Thread(target=sample_rss, daemon=True); sampler.start()
+    rnd = random.Random(seed); sent = 0
+    with ThreadPoolExecutor(max_workers=max_inflight) as ex:
+        at = t0
+        while True:
+            at += rnd.expovariate(rate)
+            if at - t0 > duration: break
+            time.sleep(max(0.0, at - time.perf_counter()))
+            kind = pick(rnd, kinds)
+            ex.submit(send, at, kind, rnd.choice(docs[kind]), pick(rnd, formats)); sent += 1
+    stop.set(); sampler.join()
+    elapsed = max(duration, done_at[0] - t0)
+    return {
+        "rate": rate, "sent": sent, "ok": len(lat), "offered": round(sent / duration, 2),
+        "throughput": round(len(lat) / elapsed, 2),
+        "p50_ms": pct(lat, 0.50), "p95_ms": pct(lat, 0.95), "p99_ms": pct(lat, 0.99),
+        "error_rate": round(errors[0] / sent, 4) if sent else 0.0,
+        "rss_max_mb": max((mb for _, mb in rss), default=None), "rss_mb": rss,
+    }
+
+
+def sustained(run: Dict[str, Any], slo_ms: float) -> bool:
+    return (run["throughput"] >= SAT_THROUGHPUT * run["offered"] and run["error_rate"] <= SAT_ERRORS
+            and run["p95_ms"] is not None and run["p95_ms"] <= slo_ms)
+
+
+# ---- reporte / baseline ----
+def report(runs: List[Dict[str, Any]], slo_ms: float) -> None:
+    print(f"{'workers':>7} {'rate':>6} {'thr/s':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'err%':>6} {'RSS MB':>8}")
+    for r in runs:
+        fmt = lambda v: f"{v:8.0f}" if v is not None else f"{'-':>8}"
+        print(f"{r['workers']:>7} {r['rate']:6.1f} {r['throughput']:7.2f} {fmt(r['p50_ms'])} {fmt(r['p95_ms'])} "
+              f"{fmt(r['p99_ms'])} {r['error_rate'] * 100:6.1f} {fmt(r['rss_max_mb'])}")
+    by_workers: Dict[Any, List[Dict[str, Any]]] = {}
+    for r in runs:
+        by_workers.setdefault(r["workers"], []).append(r)
+    for w, rs in by_workers.items():
+        ok = [r["rate"] for r in rs if sustained(r, slo_ms)]
+        if not ok:
+            print(f"workers={w}: ningún rate sostenido con p95 <= {slo_ms:.0f} ms")
+        elif isinstance(w, int) and w > 0:
+            print(f"workers={w}: saturación ~{max(ok):.1f} pedidos/s ({max(ok) / w:.2f} por worker)")
+        else:
+            print(f"workers={w}: saturación ~{max(ok):.1f} pedidos/s")
+
+
+def compare(runs: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> int:
+    """Diferencias contra la baseline por (workers, rate); devuelve la cantidad de regresiones."""
+    base = {(r["workers"], r["rate"]): r for r in baseline["runs"]}
+    bad = 0
+    for r in runs:
+        b = base.get((r["workers"], r["rate"]))
+        if b is None:
+            print(f"workers={r['workers']} rate={r['rate']}: sin baseline"); continue
+        notes = []
+        if r["throughput"] < b["throughput"] * (1 - tolerance):
+            notes.append(f"throughput {b['throughput']} -> {r['throughput']}")
+        for k in ("p50_ms", "p95_ms", "p99_ms", "rss_max_mb"):
+            if r[k] is not None and b[k] is not None and r[k] > b[k] * (1 + tolerance):
+                notes.append(f"{k} {b[k]} -> {r[k]}")
+        if r["error_rate"] > b["error_rate"] + SAT_ERRORS:
+            notes.append(f"error_rate {b['error_rate']} -> {r['error_rate']}")
+        bad += bool(notes)
+        print(f"workers={r['workers']} rate={r['rate']}: " + ("PEOR: " + "; ".join(notes) if notes else "ok"))
+    return bad
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Prueba de carga local de /extract con reporte de SLO.")
+    ap.add_argument("--workers", default="2", help="cantidades de workers a probar, p. ej. 1,2,4")
+    ap.add_argument("--rates", default="2,4,8", help="pedidos/s de lazo abierto, p. ej. 2,4,8,16")
+    ap.add_argument("--duration", type=float, default=30.0, help="segundos por corrida")
+    ap.add_argument("--mix", default="text=0.7,scan=0.3", help="PDFs con texto / escaneados")
+    ap.add_argument("--vendors", default="PIRELLI=1,GUERRINI=1", help="proveedor (hint) de cada pedido")
+    ap.add_argument("--formats", default="kv=0.6,json=0.3,ini=0.1", help="?format= de cada pedido")
+    ap.add_argument("--docs", type=int, default=20, help="PDFs distintos por tipo")
+    ap.add_argument("--slo-ms", type=float, default=5000.0, help="p95 máximo para contar un rate como sostenido")
+    ap.add_argument("--timeout", type=float, default=120.0, help="timeout del cliente por pedido (s)")
+    ap.add_argument("--max-inflight", type=int, default=256, help="pedidos abiertos a la vez del cliente")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--url", help="servidor ya levantado (no se arranca uno; --workers sólo etiqueta)")
+    ap.add_argument("--pid", type=int, help="con --url: pid del servidor para medir RSS")
+    ap.add_argument("--env", action="append", default=[], help="KEY=VALOR extra para el servidor (repetible)")
+    ap.add_argument("--save", help="guardar resultados (JSON) para usar de baseline")
+    ap.add_argument("--baseline", help="comparar contra resultados guardados")
+    ap.add_argument("--tolerance", type=float, default=0.10, help="empeoramiento tolerado contra la baseline")
+    args = ap.parse_args(argv)
+
+    kinds = {k: v for k, v in parse_weights(args.mix).items() if k in ("text", "scan")}
+    if not kinds: ap.error("--mix: se espera text=...,scan=...")
+    if "text" in kinds and _optional("fitz") is None:
+        print("PyMuPDF no disponible: sólo PDFs escaneados")
+        kinds.pop("text")
+        if not kinds: return 1
+    formats = {k: v for k, v in parse_weights(args.formats).items() if k in ("json", "kv", "ini")}
+    if not formats: ap.error("--formats: se espera json=...,kv=...,ini=...")
+    vendors = parse_weights(args.vendors)
+    workers = [int(w) for w in args.workers.split(",") if w.strip()]
+    rates = [float(r) for r in args.rates.split(",") if r.strip()]
+
+    tmp = tempfile.mkdtemp(prefix="loadtest-")
+    docs = make_docs(tmp, args.docs, kinds, vendors)
+    env = {"EXTRACTOR_DATA_DIR": os.path.join(tmp, "data"), "EXTRACTOR_TEXT_CACHE": "0",
+           "EXTRACTOR_DEDUP": "0", "EXTRACTOR_DEGRADE": "0"}
+    env.update(kv.split("=", 1) for kv in args.env if "=" in kv)
+
+    runs: List[Dict[str, Any]] = []
+    for w in workers:
+        proc = None
+        if args.url:
+            url, pid = args.url, args.pid
+        else:
+            proc = start_server(w, args.port, env)
+            url, pid = f"http://127.0.0.1:{args.port}", proc.pid
+        try:
+            for rate in rates:
+                r = run_load(url, pid, docs, kinds, formats, rate, args.duration, args.timeout, args.max_inflight)
+                r["workers"] = w; runs.append(r)
+                print(f"workers={w} rate={rate}: {r['throughput']} /s, p95 {r['p95_ms']} ms, "
+                      f"errores {r['error_rate'] * 100:.1f}%", flush=True)
+        finally:
+            if proc is not None:
+                proc.terminate()
+                try: proc.wait(10)
+                except subprocess.TimeoutExpired: proc.kill()
+
+    print()
+    report(runs, args.slo_ms)
+    config = {k: getattr(args, k) for k in ("mix", "vendors", "formats", "docs", "duration", "slo_ms")}
+    config["cpus"] = os.cpu_count()
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"config": config, "runs": runs}, f, indent=1)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config", {}).get("mix") != args.mix:
+            print(f"ojo: la baseline usó otra mezcla ({baseline['config'].get('mix')})")
+        print()
+        return 1 if compare(runs, baseline, args.tolerance) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+# benchmarks/soak_memory.py
+# Prueba de resistencia de memoria: FACTURAS facturas por un WorkerPool como el del servidor (con
+# memory_guard y el reciclado de settings: EXTRACTOR_WORKER_MAX_REQUESTS / _MAX_RSS_MB). Cada
+# trabajo es un grupo de facturas sintéticas por extract_from_pdf (líneas ya leídas) y, cada
+# SCAN_EVERY facturas, una hoja A4 a 300 dpi por el preprocesado de OCR (las imágenes grandes son
+# las que fragmentan el heap). Muestra el RSS del worker más grande a lo largo de la corrida y
+# compara el primer cuarto contra el último: con el reciclado la memoria queda plana.
+#
+#   python benchmarks/soak_memory.py [FACTURAS] [WORKERS]
+#   EXTRACTOR_WORKER_MAX_REQUESTS=0 EXTRACTOR_WORKER_MAX_RSS_MB=0 python benchmarks/soak_memory.py   (sin reciclar)
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import _synth
+import memory_guard
+import settings
+from worker_pool import WorkerPool
+
+PER_JOB = 100       # facturas por trabajo (menos idas y vueltas al worker)
+SCAN_EVERY = 200    # una hoja escaneada cada tantas facturas
+REPORT_EVERY = 20   # trabajos entre muestras de RSS
+A4_300 = (2480, 3508)
+
+
+def init() -> None:
+    memory_guard.configure(settings.FITZ_STORE_MB, settings.OCR_PAGES_IN_FLIGHT)
+
+
+def soak_job(seed: int, count: int) -> int:
+    from PIL import Image, ImageDraw
+    from extraction_core import LineIndex
+    from extractor_v6 import extract_from_pdf
+    from ocr_preprocess import OcrPreprocess
+    rnd = random.Random(seed); ok = 0
+    for i in range(count):
+        lines = _synth.invoice_lines(rnd, rnd.choice(("PIRELLI", "GUERRINI")), items=rnd.randint(5, 150))
+        ok += extract_from_pdf("soak.pdf", lines=LineIndex(lines))["total"] > 0
+        if (seed * count + i) % SCAN_EVERY == 0:
+            page = Image.new("L", A4_300, 255); d = ImageDraw.Draw(page)
+            for k, line in enumerate(lines[:60]):
+                d.text((150, 150 + 50 * k), line, fill=0)
+            OcrPreprocess()(page.rotate(rnd.uniform(-2, 2), expand=True, fillcolor=255))
+    return ok
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    pool = WorkerPool(workers, initializer=init, max_requests=settings.WORKER_MAX_REQUESTS,
+                      max_rss_mb=settings.WORKER_MAX_RSS_MB)
+    pool.warm()
+    jobs = -(-n // PER_JOB)
+    print(f"{n} facturas, {workers} workers, reciclado: {settings.WORKER_MAX_REQUESTS} trabajos / "
+          f"{settings.WORKER_MAX_RSS_MB:.0f} MB (0 = nunca)")
+    print(f"{'facturas':>9} {'RSS worker máx':>16} {'reciclados':>10} {'pico/trabajo p95':>17}")
+    samples = []; done = [0]; lock = threading.Lock(); t0 = time.perf_counter()
+
+    def one(j: int) -> None:
+        pool.run(soak_job, j, min(PER_JOB, n - j * PER_JOB))
+        with lock:
+            done[0] += 1
+            if done[0] % REPORT_EVERY and done[0] != jobs: return
+            mem = pool.memory()
+            rss = [w["rss_mb"] for w in mem["workers"] if w["rss_mb"] is not None]
+            if not rss: return
+            peak = mem["peak_mb"].get("soak_job", {}).get("p95")
+            samples.append(max(rss))
+            print(f"{min(n, done[0] * PER_JOB):>9} {max(rss):>16.1f} {mem['recycled']:>10} "
+                  f"{peak if peak is not None else '-':>17}", flush=True)
+
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        list(ex.map(one, range(jobs)))
+    pool.shutdown()
+    secs = time.perf_counter() - t0
+    q = max(1, len(samples) // 4)
+    first, last = sum(samples[:q]) / q, sum(samples[-q:]) / q
+    print(f"{n / secs:.0f} facturas/s; RSS primer cuarto {first:.1f} MB, último cuarto {last:.1f} MB "
+          f"({(last - first) / first * 100:+.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
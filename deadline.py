@@ -0,0 +1,33 @@
+# deadline.py
+# Plazo por request, propagado a todas las etapas (lectura de texto, OCR página a página,
+# handler, ítems). Cancelación cooperativa: cada etapa pregunta expired() entre unidades de
+# trabajo y corta devolviendo lo que tiene; extract_from_pdf marca el resultado como parcial.
+# cancel() (cliente desconectado) hace que expired() dé True aunque quede tiempo.
+import threading
+import time
+from typing import Optional
+
+
+class Deadline:
+    __slots__ = ("at", "_cancel")
+
+    def __init__(self, seconds: Optional[float] = None, cancel: Optional[threading.Event] = None):
+        self.at = time.monotonic() + seconds if seconds is not None else None
+        self._cancel = cancel
+
+    def remaining(self) -> Optional[float]:
+        """Segundos que quedan; None = sin plazo."""
+        if self.at is None: return None
+        return max(0.0, self.at - time.monotonic())
+
+    def expired(self) -> bool:
+        if self._cancel is not None and self._cancel.is_set(): return True
+        return self.at is not None and time.monotonic() >= self.at
+
+    def cancel(self) -> None:
+        if self._cancel is None: self._cancel = threading.Event()
+        self._cancel.set()
+
+
+def expired(deadline: Optional[Deadline]) -> bool:
+    return deadline is not None and deadline.expired()
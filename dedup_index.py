@@ -0,0 +1,107 @@
+# dedup_index.py
+# Índice local (SQLite) de facturas ya procesadas, para detectar reenvíos del mismo comprobante
+# aunque el PDF sea otro (reimpresión, otro timestamp -> otro hash de bytes).
+# Clave normalizada: (CUIT emisor, tipo, número, CAE). Búsqueda O(1) por PRIMARY KEY.
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from extractor_utils import cuit_digits
+from patterns import RE_NON_DIGIT, RE_NUM_FACT
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS invoices (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    key         TEXT NOT NULL UNIQUE,
+    cuit        TEXT NOT NULL,
+    tipo        TEXT NOT NULL,
+    numero      TEXT NOT NULL,
+    cae         TEXT NOT NULL,
+    result      TEXT NOT NULL,
+    validated   INTEGER NOT NULL,
+    file        TEXT,
+    first_seen  REAL NOT NULL,
+    last_seen   REAL NOT NULL,
+    seen_count  INTEGER NOT NULL DEFAULT 1
+)
+"""
+
+
+def _norm_numero(numero: Optional[str]) -> str:
+    """'0072-00012345' / '72-12345' -> '00072-00012345' (punto de venta a 5 dígitos)."""
+    if not numero: return ""
+    m = RE_NUM_FACT.search(numero)
+    s = m.group(0) if m else numero
+    if '-' in s:
+        pv, nro = s.split('-', 1)
+        pv = RE_NON_DIGIT.sub('', pv); nro = RE_NON_DIGIT.sub('', nro)
+        if pv and nro: return f"{int(pv):05d}-{int(nro):08d}"
+    return RE_NON_DIGIT.sub('', s)
+
+
+def invoice_key(cuit: Optional[str], tipo: Optional[str], numero: Optional[str], cae: Optional[str]) -> Optional[str]:
+    """Clave normalizada; None si faltan CUIT o número (no alcanza para identificar el comprobante)."""
+    c = cuit_digits(cuit); n = _norm_numero(numero)
+    if not c or not n: return None
+    t = (tipo or "").strip().upper()
+    return f"{c}|{t}|{n}|{cuit_digits(cae)}"
+
+
+class DuplicateIndex:
+    def __init__(self, path: str):
+        d = os.path.dirname(path)
+        if d: os.makedirs(d, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(_SCHEMA)
+        self._db.commit()
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, result, validated, file, first_seen FROM invoices WHERE key = ?", (key,)
+            ).fetchone()
+        if not row: return None
+        return {"id": row[0], "result": json.loads(row[1]), "validated": bool(row[2]),
+                "file": row[3], "first_seen": row[4]}
+
+    def touch(self, entry_id: int) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE invoices SET last_seen = ?, seen_count = seen_count + 1 WHERE id = ?",
+                (time.time(), entry_id))
+
+    def record(self, key: str, result: Dict[str, Any], validated: bool, file: Optional[str] = None) -> int:
+        """Alta o actualización (un resultado validado nunca se pisa con uno sin validar)."""
+        c, t, n, cae = key.split("|")
+        now = time.time()
+        payload = json.dumps(result, ensure_ascii=False)
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO invoices (key, cuit, tipo, numero, cae, result, validated, file, first_seen, last_seen) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET "
+                "  result = CASE WHEN invoices.validated THEN invoices.result ELSE excluded.result END, "
+                "  validated = MAX(invoices.validated, excluded.validated), "
+                "  last_seen = excluded.last_seen, seen_count = invoices.seen_count + 1",
+                (key, c, t, n, cae, payload, int(validated), file, now, now))
+            return self._db.execute("SELECT id FROM invoices WHERE key = ?", (key,)).fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def duplicate_ref(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Puntero al resultado anterior, tal como se informa en la respuesta."""
+    return {
+        "id": entry["id"],
+        "archivo": entry.get("file") or "",
+        "recibido": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(entry["first_seen"])),
+    }
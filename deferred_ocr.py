@@ -0,0 +1,188 @@
+# deferred_ocr.py
+# OCR diferido del modo degradado (overload.py): el PDF escaneado se copia a una carpeta de
+# espera, se anota en SQLite y un hilo de fondo lo extrae completo cuando hay lugar (carril bulk
+# del planificador). El resultado se consulta con GET /extract/deferred/{id} o, si el cliente
+# dejó X-Callback-Url (y el prefijo está permitido), se le envía por POST en JSON.
+# Lo pendiente sobrevive a un reinicio: lo que estaba "running" vuelve a "pending".
+# Lo terminado (done / error) se borra pasadas keep_s (una vez por PRUNE_EVERY_S, con el hilo ocioso).
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import urllib.request
+import uuid
+from typing import Any, Callable, Dict, Optional, Sequence
+
+log = logging.getLogger("deferred_ocr")
+
+CALLBACK_TIMEOUT_S = 10
+IDLE_WAIT_S = 5
+PRUNE_EVERY_S = 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS deferred (
+    id        TEXT PRIMARY KEY,
+    status    TEXT NOT NULL,          -- pending | running | done | error
+    pdf       TEXT NOT NULL,
+    vendor    TEXT,
+    items     INTEGER NOT NULL,
+    tenant    TEXT,
+    callback  TEXT,
+    result    TEXT,
+    created   REAL NOT NULL,
+    finished  REAL
+)
+"""
+
+# run(pdf, vendor, items, tenant) -> payload minimal (extracción completa, con OCR)
+Runner = Callable[[str, Optional[str], bool, str], Dict[str, Any]]
+
+
+class DeferredStore:
+    def __init__(self, path: str):
+        d = os.path.dirname(path)
+        if d: os.makedirs(d, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(_SCHEMA)
+        self._db.execute("CREATE INDEX IF NOT EXISTS deferred_status ON deferred (status, created)")
+        self._db.commit()
+
+    def add(self, job_id: str, pdf: str, vendor: Optional[str], items: bool, tenant: str,
+            callback: Optional[str]) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO deferred (id, status, pdf, vendor, items, tenant, callback, created) "
+                "VALUES (?, 'pending', ?, ?, ?, ?, ?, ?)",
+                (job_id, pdf, vendor, int(items), tenant, callback, time.time()))
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """El pendiente más viejo, ya marcado "running"; None si no hay."""
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT id, pdf, vendor, items, tenant, callback FROM deferred "
+                "WHERE status = 'pending' ORDER BY created LIMIT 1").fetchone()
+            if not row: return None
+            self._db.execute("UPDATE deferred SET status = 'running' WHERE id = ?", (row[0],))
+        return {"id": row[0], "pdf": row[1], "vendor": row[2], "items": bool(row[3]),
+                "tenant": row[4], "callback": row[5]}
+
+    def finish(self, job_id: str, status: str, result: Dict[str, Any]) -> None:
+        with self._lock, self._db:
+            self._db.execute("UPDATE deferred SET status = ?, result = ?, finished = ? WHERE id = ?",
+                             (status, json.dumps(result, ensure_ascii=False), time.time(), job_id))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute("SELECT status, result, created, finished FROM deferred WHERE id = ?",
+                                   (job_id,)).fetchone()
+        if not row: return None
+        return {"id": job_id, "status": row[0], "result": json.loads(row[1]) if row[1] else None,
+                "created": row[2], "finished": row[3]}
+
+    def requeue_running(self) -> int:
+        """Al arrancar: lo que quedó a medias en el proceso anterior vuelve a la cola."""
+        with self._lock, self._db:
+            return self._db.execute("UPDATE deferred SET status = 'pending' WHERE status = 'running'").rowcount
+
+    def prune(self, older_than: float) -> int:
+        """Borra los terminados (done / error) antes de `older_than` (epoch); cuántos borró."""
+        with self._lock, self._db:
+            return self._db.execute("DELETE FROM deferred WHERE status IN ('done', 'error') AND finished < ?",
+                                    (older_than,)).rowcount
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._db.execute("SELECT status, COUNT(*) FROM deferred GROUP BY status").fetchall())
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def post_json(url: str, payload: Dict[str, Any]) -> None:
+    req = urllib.request.Request(url, data=json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+                                 headers={"Content-Type": "application/json"}, method="POST")
+    with urllib.request.urlopen(req, timeout=CALLBACK_TIMEOUT_S) as resp:
+        resp.read()
+
+
+class DeferredOcr:
+    def __init__(self, store: DeferredStore, spool_dir: str, run: Runner,
+                 callback_prefixes: Sequence[str] = (), keep_s: float = 72 * 3600):
+        """
+        callback_prefixes: URLs permitidas para X-Callback-Url (vacío = sin callbacks, sólo consulta).
+        keep_s: cuánto se puede consultar un resultado terminado (0 = para siempre).
+        """
+        os.makedirs(spool_dir, exist_ok=True)
+        self.store = store
+        self.spool_dir = spool_dir
+        self.run = run
+        self.callback_prefixes = tuple(p for p in callback_prefixes if p)
+        self.keep_s = keep_s
+        self._pruned = 0.0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def callback_ok(self, url: Optional[str]) -> bool:
+        return bool(url) and url.startswith(("http://", "https://")) and url.startswith(self.callback_prefixes)
+
+    def submit(self, pdf_path: str, vendor: Optional[str], items: bool, tenant: str,
+               callback: Optional[str] = None) -> str:
+        """Copia el PDF a la carpeta de espera y lo encola; devuelve el id para consultar."""
+        job_id = uuid.uuid4().hex[:16]
+        spooled = os.path.join(self.spool_dir, job_id + ".pdf")
+        shutil.copyfile(pdf_path, spooled)
+        self.store.add(job_id, spooled, vendor, items, tenant, callback if self.callback_ok(callback) else None)
+        self._wake.set()
+        return job_id
+
+    def start(self) -> None:
+        if self._thread is not None: return
+        self.store.requeue_running()
+        self._thread = threading.Thread(target=self._loop, name="deferred-ocr", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set(); self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def step(self) -> bool:
+        """Procesa un pendiente; False si no había ninguno."""
+        job = self.store.claim()
+        if job is None: return False
+        try:
+            result, status = self.run(job["pdf"], job["vendor"], job["items"], job["tenant"] or ""), "done"
+        except Exception as e:  # el hilo de fondo no se cae por una factura
+            log.exception("OCR diferido %s", job["id"])
+            result, status = {"error": str(e)}, "error"
+        self.store.finish(job["id"], status, result)
+        try: os.remove(job["pdf"])
+        except OSError: pass
+        if job["callback"]:
+            try:
+                post_json(job["callback"], {"id": job["id"], "status": status, "result": result})
+            except Exception as e:  # el resultado sigue disponible por consulta
+                log.warning("callback %s de %s: %s", job["callback"], job["id"], e)
+        return True
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Borra los resultados terminados hace más de keep_s."""
+        now = time.time() if now is None else now
+        self._pruned = now
+        return self.store.prune(now - self.keep_s) if self.keep_s > 0 else 0
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            if not self.step():
+                if time.time() - self._pruned >= PRUNE_EVERY_S:
+                    self.prune()
+                self._wake.wait(IDLE_WAIT_S); self._wake.clear()
@@ -0,0 +1,63 @@
+# embedded.py
+# Datos estructurados dentro del PDF: adjuntos (factura electrónica XML/JSON, ZUGFeRD / Factur-X)
+# y metadata XMP. Si un parser registrado (vendors_registry.EMBEDDED_PARSERS) los reconoce,
+# el OUT sale directo de ahí: no se lee texto, ni OCR, ni handler de proveedor.
+from typing import Any, Dict, List, Optional, Tuple
+
+from extraction_core import _optional
+from vendors_registry import EMBEDDED_PARSERS
+
+import handlers_embedded  # noqa: F401
+
+ATTACHMENT_EXTS = (".xml", ".json")
+MAX_ATTACHMENT_BYTES = 5 * 1024 * 1024
+
+_XMP_FILENAME_TAGS = ("DocumentFileName",)  # Factur-X / ZUGFeRD: fx:DocumentFileName
+
+
+def _xmp_preferred(xmp: str) -> Optional[str]:
+    """Nombre del adjunto que el XMP declara como factura (Factur-X)."""
+    for tag in _XMP_FILENAME_TAGS:
+        i = xmp.find(tag + ">")
+        if i >= 0:
+            j = xmp.find("<", i)
+            if j > i: return xmp[i + len(tag) + 1:j].strip()
+    return None
+
+
+def _candidates(pdf_path: str) -> List[Tuple[str, bytes]]:
+    fitz = _optional("fitz")
+    if fitz is None: return []
+    out: List[Tuple[str, bytes]] = []
+    try:
+        with fitz.open(pdf_path) as doc:
+            xmp = doc.get_xml_metadata() or ""
+            names = list(doc.embfile_names())
+            if not names and not xmp: return []
+            preferred = _xmp_preferred(xmp) if xmp else None
+            names.sort(key=lambda n: n != preferred)
+            for n in names:
+                info = doc.embfile_info(n)
+                fname = (info.get("filename") or n).lower()
+                if n != preferred and not fname.endswith(ATTACHMENT_EXTS): continue
+                if (info.get("size") or 0) > MAX_ATTACHMENT_BYTES: continue
+                out.append((n, doc.embfile_get(n)))
+            if xmp:
+                out.append(("xmp", xmp.encode("utf-8")))
+    except Exception:
+        return out
+    return out
+
+
+def read_embedded(pdf_path: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """(schema_id, OUT) del primer adjunto / XMP que algún parser reconoce, o None."""
+    if not EMBEDDED_PARSERS: return None
+    for name, data in _candidates(pdf_path):
+        for schema_id, parser in EMBEDDED_PARSERS.items():
+            try:
+                rec = parser(name, data)
+            except Exception:
+                rec = None
+            if rec and rec.get("total") is not None:
+                return schema_id, rec
+    return None
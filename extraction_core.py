@@ -0,0 +1,386 @@
+# extraction_core.py
+# Núcleo de lectura compartido por v5 y v6:
+# - TextSource: texto embebido del PDF (PyMuPDF)
+# - OcrSource: OCR de las páginas renderizadas (pdf2image + Tesseract) o de imágenes sueltas
+#   (JPEG / PNG / TIFF multipágina, a su resolución, sin pasar por un PDF)
+# - LineIndex: las líneas normalizadas + de dónde salieron (texto / OCR), confianza y páginas
+# Las librerías pesadas (fitz, pytesseract) se importan recién cuando se usan.
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from deadline import Deadline, expired
+from patterns import RE_WS
+
+MIN_TEXT_CHARS = 30  # por debajo de esto el texto embebido se considera vacío -> OCR
+IMAGE_FORMATS = ("jpeg", "png", "tiff")
+SNIFF_BYTES = 1024
+_MAGIC = ((b"\xff\xd8\xff", "jpeg"), (b"\x89PNG\r\n\x1a\n", "png"),
+          (b"II*\x00", "tiff"), (b"MM\x00*", "tiff"))
+
+_MODULES: Dict[str, Any] = {}
+
+
+def _optional(name: str):
+    """Importa una dependencia opcional una sola vez; None si no está instalada."""
+    if name not in _MODULES:
+        try:
+            if name == "convert_from_path":
+                from pdf2image import convert_from_path as mod
+            elif name == "pdfinfo_from_path":
+                from pdf2image import pdfinfo_from_path as mod
+            else:
+                mod = __import__(name)
+        except Exception:
+            mod = None
+        _MODULES[name] = mod
+    return _MODULES[name]
+
+
+def sniff_bytes(head: bytes) -> Optional[str]:
+    """Formato por los primeros bytes (no por la extensión): "pdf", "jpeg", "png", "tiff" o None."""
+    for magic, fmt in _MAGIC:
+        if head.startswith(magic): return fmt
+    # Acrobat acepta basura antes de %PDF- dentro del primer KB
+    return "pdf" if b"%PDF-" in head[:SNIFF_BYTES] else None
+
+
+def sniff_format(path: str) -> Optional[str]:
+    try:
+        with open(path, "rb") as f:
+            return sniff_bytes(f.read(SNIFF_BYTES))
+    except OSError:
+        return None
+
+
+def is_image(path: str) -> bool:
+    return sniff_format(path) in IMAGE_FORMATS
+
+
+def image_pages(path: str, pages: Optional[Sequence[int]] = None) -> Iterator[Any]:
+    """
+    Páginas de un JPEG / PNG / TIFF como imágenes PIL, una por vez (un TIFF de 200 hojas no se
+    carga entero), derechas según la orientación EXIF (fotos de celular).
+    """
+    PIL = _optional("PIL")
+    if PIL is None: return
+    from PIL import Image, ImageOps
+    with Image.open(path) as img:
+        n = getattr(img, "n_frames", 1)
+        for p in (range(n) if pages is None else [p for p in pages if 0 <= p < n]):
+            img.seek(p)
+            yield ImageOps.exif_transpose(img)  # copia: el cuadro siguiente no la pisa
+
+
+def norm_line(s: str) -> str:
+    s = s.replace('\xa0', ' ')
+    s = RE_WS.sub(' ', s)
+    return s.strip()
+
+
+class LineIndex(list):
+    """
+    Lista de líneas normalizadas (se usa igual que List[str]) con metadatos:
+      source      -> "text" | "ocr"
+      conf        -> confianza media de Tesseract por línea (sólo OCR), o None
+      page_starts -> índice de la primera línea de cada página
+      qr          -> campos del QR AFIP (qr_to_fields) si se leyó, o {}
+      partial     -> True si la lectura se cortó por el plazo del request (faltan páginas)
+      page_offset -> página del PDF (0-based) donde empieza, si es un tramo (page_range); None = el PDF entero
+    """
+
+    def __init__(self, lines: Sequence[str] = (), source: str = "text",
+                 conf: Optional[List[float]] = None, page_starts: Optional[List[int]] = None,
+                 qr: Optional[Dict[str, Any]] = None):
+        super().__init__(lines)
+        self.source = source
+        self.conf = conf
+        self.page_starts = page_starts if page_starts is not None else ([0] if lines else [])
+        self.qr = qr or {}
+        self.partial = False
+        self.page_offset: Optional[int] = None
+
+    @property
+    def pages(self) -> int:
+        return len(self.page_starts)
+
+    def page_lines(self, page: int) -> List[str]:
+        start = self.page_starts[page]
+        end = self.page_starts[page + 1] if page + 1 < len(self.page_starts) else len(self)
+        return self[start:end]
+
+    def page_range(self, first: int, end: int) -> "LineIndex":
+        """Páginas [first, end) como un LineIndex propio (una factura dentro de un PDF con varias)."""
+        a = self.page_starts[first]
+        b = self.page_starts[end] if end < len(self.page_starts) else len(self)
+        out = LineIndex(self[a:b], source=self.source,
+                        conf=self.conf[a:b] if self.conf is not None else None,
+                        page_starts=[p - a for p in self.page_starts[first:end]])
+        out.page_offset = (self.page_offset or 0) + first
+        return out
+
+    def chars(self) -> int:
+        return sum(len(l) for l in self)
+
+
+# Palabra con coordenadas: (página 0-based, x0, y0, x1, y1, texto)
+Word = Tuple[int, float, float, float, float, str]
+
+
+class TextSource(ABC):
+    name = "base"
+    version = "0"
+
+    @abstractmethod
+    def lines(self, pdf_path: str, deadline: Optional[Deadline] = None) -> LineIndex:
+        ...
+
+    def words(self, pdf_path: str) -> List[Word]:
+        """Palabras con posición (para tablas de ítems); [] si la fuente no las tiene."""
+        return []
+
+
+class OcrSource(ABC):
+    name = "base"
+    version = "0"
+
+    @abstractmethod
+    def lines(self, pdf_path: str, dpi: int = 300, pages: Optional[Sequence[int]] = None,
+              deadline: Optional[Deadline] = None, preprocess: Optional[Callable] = None) -> LineIndex:
+        """preprocess: imagen PIL -> imagen PIL antes del OCR (ver ocr_preprocess.OcrPreprocess)."""
+
+    @abstractmethod
+    def image_file_lines(self, image_path: str, pages: Optional[Sequence[int]] = None,
+                         deadline: Optional[Deadline] = None, preprocess: Optional[Callable] = None) -> LineIndex:
+        """Como lines() pero de un JPEG / PNG / TIFF, a su resolución (ver image_pages)."""
+
+
+class PyMuPDFTextSource(TextSource):
+    name = "pymupdf"
+    version = "1"
+
+    def lines(self, pdf_path: str, deadline: Optional[Deadline] = None) -> LineIndex:
+        fitz = _optional("fitz")
+        if fitz is None: return LineIndex(source="text")
+        lines: List[str] = []; page_starts: List[int] = []
+        partial = False
+        try:
+            with fitz.open(pdf_path) as doc:
+                for page in doc:
+                    if expired(deadline):
+                        partial = True; break
+                    page_starts.append(len(lines))
+                    txt = page.get_text("text")
+                    if not txt: continue
+                    for raw in txt.splitlines():
+                        l = norm_line(raw)
+                        if l: lines.append(l)
+        except Exception:
+            return LineIndex(source="text")
+        out = LineIndex(lines, source="text", page_starts=page_starts)
+        out.partial = partial
+        return out
+
+    def words(self, pdf_path: str) -> List[Word]:
+        fitz = _optional("fitz")
+        if fitz is None: return []
+        out: List[Word] = []
+        try:
+            with fitz.open(pdf_path) as doc:
+                for p, page in enumerate(doc):
+                    out.extend((p, w[0], w[1], w[2], w[3], w[4]) for w in page.get_text("words"))
+        except Exception:
+            return []
+        return out
+
+
+class TesseractOcrSource(OcrSource):
+    name = "tesseract"
+    version = "1"
+    lang = "spa+eng"
+    pages_in_flight = 4  # páginas renderizadas en memoria a la vez (A4 a 300 dpi ~ 25 MB cada una)
+
+    def _render(self, pdf_path: str, dpi: int, pages: Optional[Sequence[int]], timeout: Optional[float] = None):
+        convert_from_path = _optional("convert_from_path")
+        kw = _timeout_kw(timeout)
+        if pages is None:
+            return convert_from_path(pdf_path, dpi=dpi, **kw)
+        images = []
+        for first, last in _runs(pages):  # 0-based; pdf2image numera desde 1
+            images.extend(convert_from_path(pdf_path, dpi=dpi, first_page=first + 1, last_page=last + 1, **kw))
+        return images
+
+    @staticmethod
+    def _page_count(pdf_path: str) -> int:
+        fitz = _optional("fitz")
+        if fitz is not None:
+            with fitz.open(pdf_path) as doc:
+                return doc.page_count
+        return int(_optional("pdfinfo_from_path")(pdf_path)["Pages"])
+
+    def image_lines(self, img, out: LineIndex, timeout: Optional[float] = None) -> None:
+        """OCR de una imagen PIL; agrega líneas (y su confianza) a out. timeout corta Tesseract (RuntimeError)."""
+        pytesseract = _optional("pytesseract")
+        kw = _timeout_kw(timeout)
+        try:
+            data = pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT, lang=self.lang, **kw)
+            n = len(data['text']); current_line_no = None; buf = []; confs = []
+            line_nums = data.get('line_num', [1]*n)
+            for i in range(n):
+                c = float(data['conf'][i])
+                if c < 0: continue
+                t = data['text'][i].strip()
+                if not t: continue
+                ln = line_nums[i]
+                if current_line_no is None: current_line_no = ln
+                if ln != current_line_no:
+                    self._flush(out, buf, confs)
+                    buf = [t]; confs = [c]; current_line_no = ln
+                else:
+                    buf.append(t); confs.append(c)
+            self._flush(out, buf, confs)
+        except Exception as e:
+            if _is_timeout(e): raise
+            txt = pytesseract.image_to_string(img, lang=self.lang, **kw)
+            for line in txt.splitlines():
+                line = norm_line(line)
+                if line:
+                    out.append(line); out.conf.append(-1.0)
+
+    @staticmethod
+    def _flush(out: LineIndex, buf: List[str], confs: List[float]) -> None:
+        if not buf: return
+        line = norm_line(' '.join(buf))
+        if line:
+            out.append(line); out.conf.append(round(sum(confs) / len(confs), 1))
+
+    def lines(self, pdf_path: str, dpi: int = 300, pages: Optional[Sequence[int]] = None,
+              deadline: Optional[Deadline] = None, preprocess: Optional[Callable] = None) -> LineIndex:
+        out = LineIndex(source="ocr", conf=[], page_starts=[])
+        prep = preprocess or (lambda img: img)
+        if _optional("convert_from_path") is None or _optional("pytesseract") is None or _optional("PIL") is None:
+            out.partial = True  # sin OCR disponible: lectura incompleta (no entra en la caché)
+            return out
+        if deadline is None:
+            # de a pages_in_flight páginas: un escaneo de 40 hojas no queda entero en memoria
+            try: pages = list(pages) if pages is not None else list(range(self._page_count(pdf_path)))
+            except Exception:
+                out.partial = True; return out
+            step = max(1, self.pages_in_flight)
+            for k in range(0, len(pages), step):
+                try: images = self._render(pdf_path, dpi, pages[k:k + step])
+                except Exception:
+                    out.partial = True; return out
+                for img in images:
+                    out.page_starts.append(len(out))
+                    self.image_lines(_closing(prep, img), out)
+                del images
+            return out
+        # Con plazo: una página por vez (render + OCR), cortando entre páginas o dentro de
+        # Tesseract / pdftoppm con el tiempo que quede
+        try: pages = list(pages) if pages is not None else list(range(self._page_count(pdf_path)))
+        except Exception:
+            out.partial = True; return out
+        for p in pages:
+            if deadline.expired():
+                out.partial = True; break
+            try:
+                images = self._render(pdf_path, dpi, [p], timeout=deadline.remaining())
+                for img in images:
+                    out.page_starts.append(len(out))
+                    self.image_lines(prep(img), out, timeout=deadline.remaining())
+            except Exception as e:  # una página que no se pudo renderizar / leer: incompleto
+                out.partial = True
+                if deadline.expired() or _is_timeout(e): break
+        return out
+
+    def image_file_lines(self, image_path: str, pages: Optional[Sequence[int]] = None,
+                         deadline: Optional[Deadline] = None, preprocess: Optional[Callable] = None) -> LineIndex:
+        out = LineIndex(source="ocr", conf=[], page_starts=[])
+        prep = preprocess or (lambda img: img)
+        if _optional("pytesseract") is None or _optional("PIL") is None:
+            out.partial = True
+            return out
+        try:
+            for img in image_pages(image_path, pages):
+                if expired(deadline):
+                    out.partial = True; break
+                out.page_starts.append(len(out))
+                try:
+                    self.image_lines(prep(img), out, timeout=deadline.remaining() if deadline else None)
+                except Exception as e:  # Tesseract cortado o que no corre: incompleto
+                    out.partial = True
+                    if expired(deadline) or _is_timeout(e): break
+        except Exception:  # imagen ilegible / truncada: lo leído hasta ahí
+            out.partial = True
+        return out
+
+
+def _runs(pages: Sequence[int]) -> List[Tuple[int, int]]:
+    """[0, 1, 2, 5] -> [(0, 2), (5, 5)]: una llamada a pdftoppm por tramo de páginas seguidas."""
+    out: List[Tuple[int, int]] = []
+    for p in pages:
+        if out and p == out[-1][1] + 1:
+            out[-1] = (out[-1][0], p)
+        else:
+            out.append((p, p))
+    return out
+
+
+def _closing(prep: Callable, img):
+    """prep(img) liberando el original si el preprocesado devolvió otra imagen."""
+    done = prep(img)
+    if done is not img:
+        img.close()
+    return done
+
+
+def _timeout_kw(timeout: Optional[float]) -> Dict[str, float]:
+    """
+    timeout= para pytesseract / pdf2image. None = sin plazo; 0 es "no queda tiempo" (para
+    pytesseract timeout=0 sería sin límite), así que corta acá mismo.
+    """
+    if timeout is None: return {}
+    if timeout <= 0: raise TimeoutError("timeout: plazo vencido")
+    return {"timeout": timeout}
+
+
+def _is_timeout(e: Exception) -> bool:
+    # pytesseract: RuntimeError("Tesseract process timeout"); pdf2image: PDFPopplerTimeoutError
+    return "timeout" in f"{type(e).__name__} {e}".lower()
+
+
+DEFAULT_TEXT_SOURCE: TextSource = PyMuPDFTextSource()
+DEFAULT_OCR_SOURCE: OcrSource = TesseractOcrSource()
+
+
+def backend_version(text_source: Optional[TextSource] = None, ocr_source: Optional[OcrSource] = None) -> str:
+    t = text_source or DEFAULT_TEXT_SOURCE; o = ocr_source or DEFAULT_OCR_SOURCE
+    return f"{t.name}-{t.version}+{o.name}-{o.version}"
+
+
+def load_lines(pdf_path: str, text_source: Optional[TextSource] = None,
+               ocr_source: Optional[OcrSource] = None, deadline: Optional[Deadline] = None,
+               preprocess: Optional[Callable] = None) -> LineIndex:
+    """Texto embebido; si está vacío (PDF escaneado) cae a OCR. Misma regla en v5 y v6. Una imagen va directo a OCR."""
+    if is_image(pdf_path):
+        return (ocr_source or DEFAULT_OCR_SOURCE).image_file_lines(pdf_path, deadline=deadline, preprocess=preprocess)
+    lines = (text_source or DEFAULT_TEXT_SOURCE).lines(pdf_path, deadline=deadline)
+    if not lines or lines.chars() < MIN_TEXT_CHARS:
+        lines = (ocr_source or DEFAULT_OCR_SOURCE).lines(pdf_path, deadline=deadline, preprocess=preprocess)
+    return lines
+
+
+def needs_ocr(pdf_path: str, pages: int = 2) -> bool:
+    """
+    Aviso barato (milisegundos) para el planificador: ¿las primeras hojas no tienen texto
+    embebido? Misma regla que load_lines. Sin PyMuPDF todo va a OCR; un PDF ilegible, no.
+    """
+    if is_image(pdf_path): return True
+    fitz = _optional("fitz")
+    if fitz is None: return True
+    try:
+        with fitz.open(pdf_path) as doc:
+            chars = sum(len(doc[p].get_text("text").strip()) for p in range(min(pages, doc.page_count)))
+    except Exception:
+        return False
+    return chars < MIN_TEXT_CHARS
@@ -1,48 +1,31 @@
 # extractor_utils.py
-# Lee el texto del PDF con PyMuPDF o con OCR
+# Lee el texto del PDF con PyMuPDF o con OCR (vía extraction_core)
 # Normaliza texto: Limpia espacios, caracteres raros, etc
 # Detecta y convierte numeros
 # Detecta vendedor por nombre o CUIT
 # Extrae datos comunes
 
-import re
 from typing import List, Tuple, Optional, Dict, Any
-try:
-    import fitz
-except Exception:
-    fitz = None
-try:
-    from pdf2image import convert_from_path
-except Exception:
-    convert_from_path = None
-try:
-    import pytesseract
-    from pytesseract import image_to_data
-except Exception:
-    pytesseract = None
-    image_to_data = None
-try:
-    from PIL import Image
-except Exception:
-    Image = None
-    
-
-def norm_line(s: str) -> str:
-    s = s.replace('\xa0', ' ')
-    s = re.sub(r'\s+', ' ', s)
-    return s.strip()
+from patterns import (
+    RE_CURRENCY, RE_NUM_STRIP, RE_DEC_TAIL, RE_SEP, RE_NON_DIGIT,
+    RE_CUIT, RE_FECHA, RE_NUM_FACT, RE_CAE, NUM_PURE, NUM_ANY,
+    RE_FACTURA_TIPO, RE_TIPO_SOLO, RE_CLIENTE_HINT, RE_PROV_GUERRINI, RE_PROV_PIRELLI,
+    MAX_LINE, clip, budget,
+)
+from extraction_core import (
+    norm_line, LineIndex, DEFAULT_TEXT_SOURCE, DEFAULT_OCR_SOURCE, load_lines,
+)
 
 
 def strip_currency(s: str) -> str:
-    return re.sub(r'[$]', '', s).strip()
+    return RE_CURRENCY.sub('', s).strip()
 
 
 def parse_number_smart(s: str) -> Optional[float]:
     if s is None: return None
     s = strip_currency(s).replace(' ', '')
-    s = re.sub(r'[^0-9,.\-]', '', s)
-    import re as _re
-    if _re.search(r'[.,]\d{2}$', s):
+    s = RE_NUM_STRIP.sub('', s)
+    if RE_DEC_TAIL.search(s):
         dec = s[-3:-2]
         t = s.replace('.', '').replace(',', '.') if dec == ',' else s.replace(',', '')
         try: return float(t)
@@ -55,7 +38,7 @@ def parse_number_smart(s: str) -> Optional[float]:
         except:
             try: return float(s.replace('.', ''))
             except: return None
-    m = list(_re.finditer(r'[.,]', s))
+    m = list(RE_SEP.finditer(s))
     if m:
         last = m[-1].group(0)
         t = s.replace('.', '').replace(',', '.') if last == ',' else s.replace(',', '')
@@ -64,68 +47,77 @@ def parse_number_smart(s: str) -> Optional[float]:
     try: return float(s)
     except: return None
 
-RE_CUIT = re.compile(r'\b\d{2}[- ]?\d{7,8}[- ]?\d\b')
-RE_FECHA = re.compile(r'\b(?:\d{2}[\/\-\.]\d{2}[\/\-\.]\d{2,4}|\d{4}[\/\-]\d{2}[\/\-]\d{2})(?:\s+\d{1,2}:\d{1,2}:\d{1,2})?\b')
-RE_NUM_FACT = re.compile(r'\b\d{4}-\d{8}\b')
-RE_CAE = re.compile(r'\b\d{14}\b', re.ASCII)
-NUM_PURE = re.compile(r'^\s*-?\s*\d{1,3}(?:[.,]\d{3})*(?:[.,]\d{2})\s*$')
-NUM_ANY = re.compile(r'[-]?\d{1,3}(?:[.,]\d{3})*(?:[.,]\d{2})|[-]?\d+(?:[.,]\d{2})')
-
 def read_pdf_text(pdf_path: str) -> List[str]:
-    lines = []
-    if fitz is None: return lines
-    try:
-        with fitz.open(pdf_path) as doc:
-            for page in doc:
-                txt = page.get_text("text")
-                if txt: lines.extend(txt.splitlines())
-    except Exception:
-        return []
-    return [norm_line(l) for l in lines if norm_line(l)]
+    return DEFAULT_TEXT_SOURCE.lines(pdf_path)
 
 def ocr_pdf_to_lines(pdf_path: str, dpi: int = 300) -> List[str]:
-    if convert_from_path is None or pytesseract is None or Image is None: return []
-    text_lines: List[str] = []
-    try: images = convert_from_path(pdf_path, dpi=dpi)
-    except Exception: return []
-    for img in images:
-        try:
-            data = pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT, lang='spa+eng')
-            n = len(data['text']); current_line_no = None; buf = []
-            for i in range(n):
-                if int(data['conf'][i]) < 0: continue
-                t = data['text'][i].strip()
-                if not t: continue
-                ln = data.get('line_num', [1]*n)[i]
-                if current_line_no is None: current_line_no = ln
-                if ln != current_line_no:
-                    line = norm_line(' '.join(buf))
-                    if line: text_lines.append(line)
-                    buf = [t]; current_line_no = ln
-                else:
-                    buf.append(t)
-            if buf:
-                line = norm_line(' '.join(buf))
-                if line: text_lines.append(line)
-        except Exception:
-            txt = pytesseract.image_to_string(img, lang='spa+eng')
-            for line in txt.splitlines():
-                line = norm_line(line)
-                if line: text_lines.append(line)
-    return text_lines
+    return DEFAULT_OCR_SOURCE.lines(pdf_path, dpi=dpi)
 
 def first_amount_forward(lines: List[str], start_idx: int, max_ahead: int = 12) -> Optional[float]:
     for j in range(start_idx, min(len(lines), start_idx + max_ahead + 1)):
         line = lines[j].strip()
         if not line: continue
-        import re as _re
-        solo = _re.fullmatch(r'[-]?\s*[\d.,]+\s*', line)
-        m = NUM_PURE.search(line) or NUM_ANY.search(line) if solo else NUM_PURE.search(line) or NUM_ANY.search(line)
+        m = NUM_PURE.search(line) or NUM_ANY.search(line)
         if m:
             v = parse_number_smart(m.group(0))
             if v is not None: return v
     return None
 
+def _line_amount(line: str) -> Optional[float]:
+    m = NUM_PURE.search(line) or NUM_ANY.search(line)
+    return parse_number_smart(m.group(0)) if m else None
+
+class AmountIndex:
+    """
+    "Próximo importe en la línea i o después", armado en una sola pasada inversa desde `start`
+    (cada importe se parsea una vez). forward() da el mismo resultado que first_amount_forward
+    pero en O(1); pure_forward() recorre sólo las líneas que son un número puro (NUM_PURE).
+    Los índices son absolutos (sobre `lines`), no relativos a `start`.
+    """
+    __slots__ = ("start", "end", "values", "next_idx", "pure_values", "next_pure")
+
+    def __init__(self, lines: List[str], start: int = 0):
+        n = len(lines); start = max(0, min(start, n)); size = n - start
+        self.start = start; self.end = n
+        values: List[Optional[float]] = [None] * size; next_idx = [-1] * size
+        pure_values: List[Optional[float]] = [None] * size; next_pure = [-1] * size
+        following = following_pure = -1
+        for k in range(size - 1, -1, -1):
+            line = lines[start + k]
+            v = _line_amount(line)
+            if v is not None:
+                values[k] = v; following = start + k
+                if NUM_PURE.match(line):
+                    pv = parse_number_smart(line)
+                    if pv is not None:
+                        pure_values[k] = pv; following_pure = start + k
+            next_idx[k] = following; next_pure[k] = following_pure
+        self.values = values; self.next_idx = next_idx
+        self.pure_values = pure_values; self.next_pure = next_pure
+
+    def forward(self, i: int, max_ahead: int = 12) -> Optional[float]:
+        if i < self.start or i >= self.end: return None
+        j = self.next_idx[i - self.start]
+        if j < 0 or j - i > max_ahead: return None
+        return self.values[j - self.start]
+
+    def pure_forward(self, i: int, max_ahead: int) -> Optional[Tuple[int, float]]:
+        """(índice, valor) de la próxima línea numérica pura dentro de la ventana [i, i+max_ahead]."""
+        if i < self.start or i >= self.end: return None
+        j = self.next_pure[i - self.start]
+        if j < 0 or j - i > max_ahead: return None
+        return j, self.pure_values[j - self.start]
+
+def amount_index(lines: List[str], start: int = 0) -> AmountIndex:
+    """AmountIndex de `lines`; si es un LineIndex se guarda y lo reusan handlers / fallback / solver."""
+    cached = getattr(lines, "_amounts", None)
+    if cached is not None and cached.start <= start and cached.end == len(lines):
+        return cached
+    idx = AmountIndex(lines, start)
+    if isinstance(lines, LineIndex):
+        lines._amounts = idx
+    return idx
+
 def detect_vendor_basic(lines: List[str], name_keywords: Dict[str, list]) -> Optional[str]:
     header = ' '.join(lines[:120]).upper()
     for vid, keys in name_keywords.items():
@@ -133,16 +125,42 @@ def detect_vendor_basic(lines: List[str], name_keywords: Dict[str, list]) -> Opt
             if k.upper() in header: return vid
     return None
 
+_CUIT_WEIGHTS = (5, 4, 3, 2, 7, 6, 5, 4, 3, 2)
+
+def cuit_digits(cuit: Optional[str]) -> str:
+    return RE_NON_DIGIT.sub('', cuit or '')
+
+def cuit_is_valid(digits: str) -> bool:
+    """Valida el dígito verificador (módulo 11) de un CUIT de 11 dígitos."""
+    if len(digits) != 11 or not digits.isdigit(): return False
+    r = 11 - sum(int(d) * w for d, w in zip(digits, _CUIT_WEIGHTS)) % 11
+    if r == 11: r = 0
+    return r != 10 and r == int(digits[10])
+
 def detect_vendor_by_cuit(cuit: Optional[str], cuit_map: Dict[str, str]) -> Optional[str]:
     if not cuit: return None
-    return cuit_map.get(cuit)
+    hit = cuit_map.get(cuit)
+    if hit: return hit
+    d = cuit_digits(cuit)
+    for k, vid in cuit_map.items():
+        if cuit_digits(k) == d: return vid
+    return None
+
+HEADER_BUDGET_S = 0.05  # cabecera completa; más que esto se cuenta en patterns.SLOW_MATCHES["cabecera"]
 
 def extract_header_common(lines: List[str]) -> Dict[str, Any]:
+    # Líneas de OCR basura de miles de caracteres: los regex de cabecera ven sólo MAX_LINE
+    if any(len(l) > MAX_LINE for l in lines):
+        lines = [clip(l) for l in lines]
+    with budget("cabecera", HEADER_BUDGET_S):
+        return _extract_header(lines)
+
+def _extract_header(lines: List[str]) -> Dict[str, Any]:
     out: Dict[str, Any] = {"tipo": None, "numero": None, "fecha": None, "cae": None, "cae_vto": None}
     for i, line in enumerate(lines[:200]):
-        m = re.search(r'\bFactura\s*([ABC])\b', line, re.I)
+        m = RE_FACTURA_TIPO.search(line)
         if m: out["tipo"] = m.group(1).upper(); break
-        if re.fullmatch(r'[ABC]', line.strip(), re.I): out["tipo"] = line.strip().upper()
+        if RE_TIPO_SOLO.fullmatch(line.strip()): out["tipo"] = line.strip().upper()
     for line in lines:
         m = RE_NUM_FACT.search(line)
         if m: out["numero"] = m.group(0)
@@ -163,7 +181,7 @@ def extract_header_common(lines: List[str]) -> Dict[str, Any]:
                 if mf: out["cae_vto"] = mf.group(0)
     return out
 
-def extract_names_and_cuits(lines: List[str], vendor: Optional[str]):
+def extract_names_and_cuits(lines: List[str], vendor: Optional[str], head_lines: int = 80):
     proveedor = None; cuit_prov = None; cliente = None; cuit_cli = None
     cuit_positions: List[Tuple[int, str]] = []
     for i, line in enumerate(lines):
@@ -178,13 +196,13 @@ def extract_names_and_cuits(lines: List[str], vendor: Optional[str]):
             idx = rest[-1][0]
             for j in range(max(0, idx-5), idx+1):
                 cand = lines[j].strip()
-                if re.search(r'(ALVAREZ|NEUM[AÁ]TIC|S\.A\.|SRL|RESPONSABLE|CLIENTE)', cand, re.I) or cand.isupper():
+                if RE_CLIENTE_HINT.search(cand) or cand.isupper():
                     cliente = cand; break
-    head = [l.strip() for l in lines[:80]]
+    head = [l.strip() for l in lines[:head_lines]]
     if vendor == 'GUERRINI':
         for l in head:
-            if re.search(r'GUERRINI\s+NEUM[AÁ]TICOS?\s*S\.?A\.?', l, re.I): proveedor = l; break
+            if RE_PROV_GUERRINI.search(l): proveedor = l; break
     elif vendor == 'PIRELLI':
         for l in head:
-            if re.search(r'PIRELLI\s+NEUM[AÁ]TICOS?\s*S\.?A\.?I\.?C\.?', l, re.I): proveedor = l; break
+            if RE_PROV_PIRELLI.search(l): proveedor = l; break
     return proveedor, cuit_prov, cliente, cuit_cli
\ No newline at end of file
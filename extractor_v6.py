@@ -1,10 +1,27 @@
-import os, yaml, re
+import os, yaml
 from typing import List, Dict, Any, Optional, Tuple
 from vendors_registry import REGISTRY
 from extractor_utils import (
-    read_pdf_text, ocr_pdf_to_lines, extract_header_common, extract_names_and_cuits,
-    detect_vendor_basic, detect_vendor_by_cuit, parse_number_smart
+    LineIndex, DEFAULT_TEXT_SOURCE, DEFAULT_OCR_SOURCE, extract_header_common, extract_names_and_cuits,
+    parse_number_smart, amount_index
 )
+from patterns import RE_DATE_DMY, RE_DATE_YMD, compile_rules
+from vendor_index import VendorIndex
+from dedup_index import DuplicateIndex, invoice_key, duplicate_ref
+from results_store import ResultsStore
+from afip_qr import find_afip_qr, find_afip_qr_image, qr_to_fields
+from extraction_core import MIN_TEXT_CHARS, backend_version, is_image
+from text_cache import TextCache, file_hash
+from embedded import read_embedded
+from items_table import extract_items, check_items
+from invoice_split import split_invoices
+from deadline import Deadline, expired
+from ocr_preprocess import OcrPreprocess
+import layout_cache
+from layout_cache import LayoutCache
+from profiler import StageClock
+import ocr_batch
+import totals_solver
 
 import handlers_pirelli  # noqa: F401
 import handlers_guerrini  # noqa: F401
@@ -85,8 +102,13 @@ NORMALIZATION_RULES = [
     (r'\bSELLOS\b|\bIMPUESTOS?\s+VARIOS\b|\bIMPUESTOS?\b',     "impuestos_y_sellados"),
 ]
 
+# Evaluación protegida contra ReDoS (ver patterns.RuleSet): mismo resultado que re.search en orden
+_NORMALIZATION_COMPILED = compile_rules(NORMALIZATION_RULES, "normalizacion")
+
 # Alícuotas de IVA que solemos ver; agregamos 27 por las dudas
 IVA_RATES_CANON = (27.0, 21.0, 10.5, 5.0, 2.5)
+# Cabecera que un resultado del OCR por lotes tiene que traer completa (si no, OCR de la hoja entera)
+BATCH_HEADER_FIELDS = ("numero", "fecha", "cae", "cuit_proveedor", "proveedor")
 
 
 # =========================
@@ -98,37 +120,67 @@ def _load_vendor_config(cfg_path: str) -> Dict[str, Any]:
         return {"detect": {"names": {}, "cuits": {}}}
     with open(cfg_path, 'r', encoding='utf-8') as f:
         data = yaml.safe_load(f) or {}
-    names = {}; cuits = {}
+    names = {}; cuits = {}; ocr = {}
     for vid, cfg in (data or {}).items():
         for name in cfg.get('detect', {}).get('names', []):
             names.setdefault(vid.upper(), []).append(name)
         for cuit in cfg.get('detect', {}).get('cuits', []):
             cuits[cuit] = vid.upper()
-    return {"detect": {"names": names, "cuits": cuits}}
+        if isinstance(cfg.get('ocr'), dict):  # `ocr: {}` = preprocesado con los DEFAULTS
+            ocr[vid.upper()] = cfg['ocr']
+    return {"detect": {"names": names, "cuits": cuits}, "ocr": ocr}
+
+_INDEX_CACHE: Dict[str, Tuple[float, VendorIndex, Dict[str, OcrPreprocess]]] = {}
+
+def _vendor_config(cfg_path: str) -> Tuple[VendorIndex, Dict[str, OcrPreprocess]]:
+    """Índice de detección y preprocesado OCR por proveedor; se rearman sólo si cambia vendors.yaml (mtime)."""
+    try:
+        mtime = os.path.getmtime(cfg_path)
+    except OSError:
+        mtime = -1.0
+    hit = _INDEX_CACHE.get(cfg_path)
+    if hit and hit[0] == mtime:
+        return hit[1], hit[2]
+    cfg = _load_vendor_config(cfg_path)
+    index = VendorIndex.from_config(cfg)
+    ocr = {vid: OcrPreprocess.from_config(c) for vid, c in cfg.get("ocr", {}).items()}
+    _INDEX_CACHE[cfg_path] = (mtime, index, ocr)
+    return index, ocr
+
+def _vendor_index(cfg_path: str) -> VendorIndex:
+    return _vendor_config(cfg_path)[0]
+
+def _ocr_preprocess(cfg_path: str, vendor_hint: Optional[str]) -> Optional[OcrPreprocess]:
+    """
+    Preprocesado OCR del proveedor (vendors.yaml, clave `ocr`) o None: sin entrada la página va
+    a Tesseract tal cual (cuesta ~0,8 s por página y no está medido que mejore a todos). En un
+    escaneo el proveedor todavía no se detectó (no hay texto), así que sólo cuenta vendor_hint.
+    """
+    return _vendor_config(cfg_path)[1].get((vendor_hint or "").upper())
 
 def _fallback_labels(lines: List[str], out: Dict[str, Any]) -> None:
-    from extractor_utils import NUM_PURE, NUM_ANY, first_amount_forward
     start = max(0, len(lines) - 150)
-    tail = lines[start:]
+    amounts = amount_index(lines, start)
     sub = iva = perc = tot = None
     iva_items = []; perc_items = []
-    for i, line in enumerate(tail):
+    for i in range(start, len(lines)):
+        line = lines[i]
         up = line.upper()
         if sub is None and 'SUBTOTAL' in up:
-            v = first_amount_forward(tail, i)
+            v = amounts.forward(i)
             if v is not None: sub = v
         if 'IVA' in up:
-            v = first_amount_forward(tail, i)
+            v = amounts.forward(i)
             if v is not None:
                 iva = (iva or 0.0) + v
                 iva_items.append({"alicuota": None, "monto": v})
         if any(k in up for k in ['PERC', 'PERCEP', 'IIBB', 'INGRESOS BRUTOS', 'ARBA', 'AGIP']):
-            v = first_amount_forward(tail, i)
+            v = amounts.forward(i)
             if v is not None:
                 perc = (perc or 0.0) + v
                 perc_items.append({"desc": line, "monto": v})
         if 'TOTAL' in up:
-            v = first_amount_forward(tail, i)
+            v = amounts.forward(i)
             if v is not None: tot = v
     out["subtotal"] = sub
     out["iva"] = iva
@@ -162,13 +214,9 @@ def _normalize_fixed_schema(out: Dict[str, Any]) -> Dict[str, Optional[float]]:
     if (not items) and (total_perc is not None):
         items = [{"desc": "PERCEP. IIBB", "monto": total_perc}]
     for it in items:
-        desc_raw = (it.get("desc") or "").upper()
+        desc_raw = it.get("desc") or ""
         monto = float(it.get("monto") or 0.0)
-        matched_key = None
-        for pattern, key in NORMALIZATION_RULES:
-            if re.search(pattern, desc_raw, flags=re.I):
-                matched_key = key
-                break
+        matched_key = _NORMALIZATION_COMPILED.first(desc_raw)
         if matched_key:
             fixed[matched_key] = round((fixed[matched_key] or 0.0) + monto, 2)
     return fixed
@@ -178,11 +226,11 @@ def _to_iso_date(maybe_date: Optional[str]) -> Optional[str]:
         return None
     s = maybe_date.strip()
     # Formatos típicos: dd/mm/yyyy, dd-mm-yyyy, yyyy-mm-dd
-    m = re.fullmatch(r'(\d{2})[\/\-.](\d{2})[\/\-.](\d{4})', s)
+    m = RE_DATE_DMY.fullmatch(s)
     if m:
         dd, mm, yyyy = m.group(1), m.group(2), m.group(3)
         return f"{yyyy}-{mm}-{dd}"
-    m = re.fullmatch(r'(\d{4})[\/\-](\d{2})[\/\-](\d{2})', s)
+    m = RE_DATE_YMD.fullmatch(s)
     if m:
         return f"{m.group(1)}-{m.group(2)}-{m.group(3)}"
     # Si no puedo parsear, devuelvo lo original
@@ -287,27 +335,254 @@ def _build_minimal_payload(full: Dict[str, Any], prefer_cuit: str = "proveedor")
     }
     return out
 
+def _load_lines(pdf_path: str, use_qr: bool, deadline: Optional[Deadline] = None,
+                preprocess: Optional[OcrPreprocess] = None, ocr: bool = True) -> LineIndex:
+    """
+    Texto embebido -> QR AFIP -> OCR. Los campos del QR (o {}) quedan en lines.qr.
+    En PDFs con texto el QR sólo se busca en links / texto (barato). En escaneos se decodifica
+    la imagen: con el QR ya tenemos cabecera y total, así que el OCR se limita a la página del QR
+    y a la última (el pie con IVA / percepciones, que en un escaneo de varias hojas con el QR en
+    la primera queda al final); en Factura C (sin IVA discriminado) no hace falta OCR.
+    `preprocess` se aplica a cada página antes de Tesseract.
+    Con ocr=False (modo degradado) un escaneo que necesitaba OCR vuelve vacío y cortado en la
+    etapa "ocr" (sólo con lo que dé el QR); no entra en la caché de texto.
+    Un JPEG / PNG / TIFF (por sus bytes, no la extensión) es un escaneo: QR y OCR directo sobre
+    sus páginas, sin re-renderizar.
+    """
+    image = is_image(pdf_path)
+    if image:
+        lines = LineIndex(source="text", page_starts=[])
+        scanned = True
+    else:
+        lines = DEFAULT_TEXT_SOURCE.lines(pdf_path, deadline=deadline)
+        scanned = not lines or lines.chars() < MIN_TEXT_CHARS
+    qr = None
+    if use_qr and not expired(deadline):
+        qr = find_afip_qr_image(pdf_path) if image else find_afip_qr(pdf_path, decode_images=scanned)
+    fields = qr_to_fields(qr["data"]) if qr else {}
+    ocr_pages = DEFAULT_OCR_SOURCE.image_file_lines if image else DEFAULT_OCR_SOURCE.lines
+    if scanned and not ocr and not (qr and fields.get("tipo") == "C"):
+        lines = LineIndex(source="ocr", page_starts=[])
+        lines.partial = True
+    elif scanned:
+        if not qr:
+            lines = ocr_pages(pdf_path, deadline=deadline, preprocess=preprocess)
+        elif fields.get("tipo") == "C":
+            lines = LineIndex(source="qr", page_starts=[])
+        else:
+            pages = sorted({qr["page"], qr["pages"] - 1})
+            lines = ocr_pages(pdf_path, pages=pages, deadline=deadline, preprocess=preprocess)
+    lines.qr = fields
+    return lines
+
+def _text_cache_key(pdf_path: str, use_qr: bool, preprocess: Optional[OcrPreprocess]) -> Tuple[str, str]:
+    """(hash del PDF, backend) con que se guarda su texto en la caché."""
+    # "+qr2": con QR se lee también la última página; lo guardado con "+qr" (sólo la del QR) no sirve
+    backend = backend_version() + ("+qr2" if use_qr else "")
+    if preprocess is not None:
+        backend += "+pre-" + preprocess.key()
+    return file_hash(pdf_path), backend
+
+def _cached_lines(pdf_path: str, use_qr: bool, text_cache: Optional[TextCache],
+                  deadline: Optional[Deadline] = None, preprocess: Optional[OcrPreprocess] = None,
+                  ocr: bool = True) -> Tuple[LineIndex, bool]:
+    """
+    _load_lines pasando por la caché de texto (hash del PDF + backend). Devuelve (líneas, hit).
+    El backend incluye la firma del preprocesado: otra configuración es otro OCR.
+    """
+    if text_cache is None:
+        return _load_lines(pdf_path, use_qr, deadline, preprocess, ocr), False
+    digest, backend = _text_cache_key(pdf_path, use_qr, preprocess)
+    lines = text_cache.get(digest, backend)
+    if lines is not None:
+        return lines, True
+    lines = _load_lines(pdf_path, use_qr, deadline, preprocess, ocr)
+    # una lectura cortada (plazo, OCR no disponible, página ilegible) o un OCR vacío no se guarda:
+    # quedaría para siempre bajo una clave que no sabe si el OCR andaba
+    if not lines.partial and (lines or lines.source != "ocr"):
+        text_cache.put(digest, backend, lines)
+    return lines, False
+
 # =========================
 #  PIPELINE PRINCIPAL
 # =========================
 
-def extract_from_pdf(pdf_path: str, vendor_hint: Optional[str] = None, cfg_path: str = "vendors.yaml") -> Dict[str, Any]:
-    """Mantengo tu pipeline, pero ahora retornamos el payload MINIMAL normalizado."""
-    lines = read_pdf_text(pdf_path)
-    used_ocr = False
+def _results_file_key(pdf_path: str, out: Dict[str, Any], meta: Dict[str, Any]) -> Optional[str]:
+    """Hash del archivo (+ primera hoja si es un tramo) para `results` cuando la factura no tiene clave."""
+    if invoice_key(out["cuit_proveedor"], out.get("tipo"), out["numero"], out.get("cae")):
+        return None
+    try:
+        digest = file_hash(pdf_path)
+    except OSError:
+        return None
+    return f"{digest}#{meta['pages'][0]}" if meta.get("pages") else digest
 
-    if not lines or sum(len(l) for l in lines) < 30:
-        lines = ocr_pdf_to_lines(pdf_path); used_ocr = True
+def _finish(out: Dict[str, Any], meta: Dict[str, Any], pdf_path: str,
+            dedup: Optional[DuplicateIndex], dup_key: Optional[str], prev: Optional[Dict[str, Any]],
+            results: Optional[ResultsStore] = None) -> Dict[str, Any]:
+    """Validación, payload minimal, alta en el índice de duplicados y en `results`, y _meta."""
+    _validate_and_repair(out)
 
-    header = extract_header_common(lines)
-    cfg = _load_vendor_config(cfg_path)
-    name_keywords = cfg["detect"]["names"]; cuit_map = cfg["detect"]["cuits"]
-    vendor = (vendor_hint or "").upper() or detect_vendor_basic(lines, name_keywords) or None
+    # === AQUÍ construimos la RESPUESTA MINIMAL ===
+    minimal = _build_minimal_payload(out, prefer_cuit="proveedor")  # <-- cambia a "cliente" si querés
+
+    # los ítems no se registran: dependen de ?items de este pedido, no de la factura
+    if dup_key and not meta.get("partial"):  # un resultado parcial no se registra
+        dedup.record(dup_key, minimal, validated=not out["warnings"], file=os.path.basename(pdf_path))
+    if results is not None and not meta.get("partial"):
+        results.record(minimal, out.get("tipo"), out.get("cae"), out["debug"]["vendor"],
+                       file=os.path.basename(pdf_path), source=meta.get("source"), validated=not out["warnings"],
+                       file_key=_results_file_key(pdf_path, out, meta))
+    if "items" in out:
+        minimal["items"] = out["items"]
+    if dup_key and prev:
+        meta["duplicado"] = duplicate_ref(prev)
+    minimal["_meta"] = meta
+    return minimal
+
+def _mark_partial(meta: Dict[str, Any], stage: str) -> None:
+    if not meta.get("partial"):
+        meta["partial"] = True
+        meta["partial_stage"] = stage
+
+def partial_payload(stage: str) -> Dict[str, Any]:
+    """Respuesta vacía marcada como parcial (el worker se mató antes de devolver nada)."""
+    minimal = _build_minimal_payload({})
+    minimal["_meta"] = {"source": None, "partial": True, "partial_stage": stage}
+    return minimal
+
+def _totals_from_layout(handler, lines: List[str], layout: Dict[str, Any], out: Dict[str, Any]) -> bool:
+    """Handler sólo sobre el bloque de totales aprendido; se aplica a `out` únicamente si cierra."""
+    trial = dict(out)
+    handler(layout_cache.totals_lines(lines, layout), trial)
+    if trial["total"] is None: return False
+    probe = dict(trial, warnings=[])
+    _validate_and_repair(probe)
+    if probe["warnings"]: return False
+    out.update(trial)
+    return True
+
+def _repair_totals(lines: List[str], out: Dict[str, Any], meta: Dict[str, Any]) -> None:
+    """
+    Si los totales del handler no cierran, busca en las líneas la asignación que cierra
+    (totals_solver) y la aplica; meta["repaired"] guarda lo que había leído el handler.
+    Con QR el total es el autorizado y no se toca. Lo reparado queda con advertencia: no cuenta
+    como validado (duplicados, resultados, disposición, lote OCR).
+    """
+    probe = dict(out, warnings=[])
+    _validate_and_repair(probe)
+    if not probe["warnings"]: return
+    sol = totals_solver.solve(lines, out, IVA_RATES_CANON,
+                              fixed_total=out["total"] if out["debug"].get("qr") else None)
+    if sol is None: return
+    before = {k: out.get(k) for k in ("subtotal", "iva", "percepciones_total", "total")}
+    descs = {it["monto"]: it["desc"] for it in out.get("percepciones_detalle") or []}
+    out["subtotal"] = sol["subtotal"]
+    out["iva"] = round(sum(m for _, m in sol["iva"]), 2)
+    out["iva_detalle"] = [{"alicuota": f"{r:.2f}", "monto": m} for r, m in sol["iva"]]
+    out["percepciones_total"] = round(sum(sol["percepciones"]), 2)
+    out["percepciones_detalle"] = [{"desc": descs.get(p, "PERCEP. IIBB"), "monto": p} for p in sol["percepciones"]]
+    out["total"] = sol["total"]
+    meta["repaired"] = {"antes": before, "alicuotas": [r for r, _ in sol["iva"]], "candidatos": sol["candidatos"]}
+    out.setdefault("warnings", []).append("Totales reparados: el handler había leído otros importes (_meta.repaired)")
+
+def _dedup_lookup(dedup: Optional[DuplicateIndex], out: Dict[str, Any]) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    dup_key = invoice_key(out["cuit_proveedor"], out["tipo"], out["numero"], out["cae"]) if dedup else None
+    return dup_key, (dedup.lookup(dup_key) if dup_key else None)
+
+def extract_from_pdf(pdf_path: str, vendor_hint: Optional[str] = None, cfg_path: str = "vendors.yaml",
+                     dedup: Optional[DuplicateIndex] = None, use_qr: bool = True,
+                     text_cache: Optional[TextCache] = None, lines: Optional[List[str]] = None,
+                     items: bool = False, deadline: Optional[Deadline] = None,
+                     layouts: Optional[LayoutCache] = None, ocr: bool = True,
+                     trace: Optional[Dict[str, Any]] = None,
+                     results: Optional[ResultsStore] = None) -> Dict[str, Any]:
+    """
+    Mantengo tu pipeline, pero ahora retornamos el payload MINIMAL normalizado.
+    minimal["_meta"]["source"] indica de dónde salieron los datos:
+      "embedded:<parser>" (adjunto XML/JSON o XMP), "text", "ocr" o "qr" (sólo QR AFIP, sin texto).
+    Con `dedup`, un comprobante ya visto (CUIT, tipo, número, CAE) se marca en
+    minimal["_meta"]["duplicado"]; si el resultado anterior estaba validado (y no se piden
+    `items`) se devuelve directamente, sin correr handler ni normalización.
+    Con `use_qr`, si el PDF trae el QR de AFIP la cabecera y el total salen de ahí.
+    Con `text_cache`, el texto / OCR se lee una sola vez por PDF (hash del contenido) y
+    minimal["_meta"]["text_cache"] indica que salió de la caché.
+    `lines` (líneas ya extraídas, p. ej. de la caché) saltea la lectura del PDF: sólo corren
+    cabecera, handler y normalización; pdf_path queda como nombre informativo.
+    Con `items`, en PDFs con texto se agrega minimal["items"] (detalle de renglones, ver
+    items_table) y minimal["_meta"]["items"] con la suma de importes contra el subtotal.
+    Con `deadline`, cada etapa (texto, OCR por página, handler, ítems) se corta al vencer el plazo
+    y se devuelve lo que haya: minimal["_meta"]["partial"] = True y "partial_stage" = etapa cortada.
+    Las páginas escaneadas pasan por ocr_preprocess antes de Tesseract, con la configuración `ocr`
+    de vendor_hint en vendors.yaml (o la default).
+    Con `layouts`, si el formato ya se vio (layout_cache) cabecera y handler corren sólo sobre
+    las líneas aprendidas y se saltea la detección de proveedor; si no valida, pasada completa.
+    minimal["_meta"]["layout"] = True indica que se usó la disposición guardada.
+    Si `lines` es un tramo de un PDF con varias facturas (invoice_split), minimal["_meta"]["pages"]
+    = [primera, última] hoja (1-based) y los ítems salen sólo de esas hojas.
+    Con ocr=False (servidor sobrecargado) un PDF escaneado no pasa por OCR: sale lo que haya
+    (datos embebidos, QR) marcado parcial con partial_stage = "ocr".
+    Con `trace` (dict) quedan ms por etapa en trace["stages"], trace["vendor"] (clave del REGISTRY
+    usada, "FALLBACK" si ninguna) y trace["source"] (ver profiler.slow_capture); al pasar por el
+    handler, también trace["warnings"] de la validación, trace["subtotal_read"] y
+    trace["header_missing"] (campos de BATCH_HEADER_FIELDS que no se leyeron).
+    Con `results` cada resultado no parcial queda en el almacén de resultados (results_store)
+    con tipo, CAE, proveedor y archivo, para consultarlo después sin volver a extraer.
+    """
+    cache_hit = False
+    clock = StageClock(trace)
+    if lines is None:
+        # 1) Datos estructurados embebidos: no hace falta texto ni handler
+        emb = read_embedded(pdf_path) if not is_image(pdf_path) else None
+        clock.lap("embedded")
+        if emb:
+            schema_id, out = emb
+            out["debug"] = {"vendor": (vendor_hint or "").upper() or "UNKNOWN", "lines_count": 0}
+            dup_key, prev = _dedup_lookup(dedup, out)
+            if trace is not None: trace.update(vendor=out["debug"]["vendor"], source=f"embedded:{schema_id}")
+            minimal = _finish(out, {"source": f"embedded:{schema_id}"}, pdf_path, dedup, dup_key, prev,
+                              results)
+            clock.lap("finish")
+            return minimal
+
+        # 2) Texto embebido / QR AFIP / OCR
+        lines, cache_hit = _cached_lines(pdf_path, use_qr, text_cache, deadline,
+                                         _ocr_preprocess(cfg_path, vendor_hint), ocr)
+        clock.lap("read")
+    elif not isinstance(lines, LineIndex):
+        lines = LineIndex(lines)
+    qr_fields = lines.qr
+    meta: Dict[str, Any] = {"source": lines.source}
+    if qr_fields: meta["qr"] = True
+    if cache_hit: meta["text_cache"] = True
+    if lines.partial: _mark_partial(meta, lines.source)
+    if lines.page_offset is not None: meta["pages"] = [lines.page_offset + 1, lines.page_offset + lines.pages]
+
+    fp = layout = None
+    if layouts is not None and lines.source in ("text", "ocr") and not lines.partial:
+        fp = layout_cache.fingerprint(lines, lines.source)
+        layout = layouts.get(fp)
+    header = None
+    if layout:
+        header = extract_header_common(layout_cache.header_lines(lines, layout))
+        if not layout_cache.header_ok(header, layout):
+            layouts.fallback(fp); layout = header = None
+    if header is None:
+        header = extract_header_common(lines)
+    scanned_header = dict(header)  # antes del QR: es lo que se ubica en las líneas al aprender
+    for k in ("tipo", "numero", "fecha", "cae"):
+        if qr_fields.get(k): header[k] = qr_fields[k]
+    index = _vendor_index(cfg_path)
+    vendor = ((vendor_hint or "").upper() or (layout["vendor"] if layout else None)
+              or index.detect(lines) or None)
 
     proveedor, cuit_prov, cliente, cuit_cli = extract_names_and_cuits(lines, vendor)
 
+    cuit_prov = qr_fields.get("cuit_proveedor") or cuit_prov
+    cuit_cli = qr_fields.get("cuit_cliente") or cuit_cli
+
     if not vendor and cuit_prov:
-        vendor = detect_vendor_by_cuit(cuit_prov, cuit_map)
+        vendor = index.match_cuit(cuit_prov)
 
     # OUT COMPLETO (se usa como base interna, no es la respuesta final)
     out: Dict[str, Any] = {
@@ -329,18 +604,168 @@ def extract_from_pdf(pdf_path: str, vendor_hint: Optional[str] = None, cfg_path:
         "debug": {"vendor": vendor or "UNKNOWN", "lines_count": len(lines)}
     }
 
-    handler = REGISTRY.get((vendor or "").upper())
-    if handler:
-        handler(lines, out)
+    dup_key, prev = _dedup_lookup(dedup, out)
+    clock.lap("header")
+    handler = REGISTRY.get((vendor or "").upper()) or _fallback_labels
+    if trace is not None:
+        trace.update(vendor=(vendor or "").upper() if handler is not _fallback_labels else "FALLBACK",
+                     source=lines.source)
+    if prev and prev["validated"] and not items:  # con items hay que leer la tabla igual
+        dedup.touch(prev["id"])
+        minimal = prev["result"]
+        minimal.pop("items", None)  # registros anteriores a que se dejaran de guardar
+        minimal["_meta"] = dict(meta, duplicado=duplicate_ref(prev))
+        return minimal
+
+    if expired(deadline):
+        _mark_partial(meta, "handler")
+    elif layout and _totals_from_layout(handler, lines, layout, out):
+        meta["layout"] = True
     else:
-        _fallback_labels(lines, out)
-
-    _validate_and_repair(out)
-
-    # === AQUÍ construimos la RESPUESTA MINIMAL ===
-    minimal = _build_minimal_payload(out, prefer_cuit="proveedor")  # <-- cambia a "cliente" si querés
-
-    # Si te interesa saber si usamos OCR para log/debug, podés anexarlo:
-    # minimal["_meta"] = {"source": "ocr" if used_ocr else "text", "file": os.path.basename(pdf_path)}
+        if layout: layouts.fallback(fp); layout = None
+        handler(lines, out)
 
+    if qr_fields.get("total") is not None:
+        # El importe del QR es el que AFIP autorizó: manda sobre lo leído del texto
+        out["total"] = qr_fields["total"]
+        if out["subtotal"] is None and qr_fields.get("tipo") == "C":
+            out["subtotal"] = qr_fields["total"]
+        out["debug"]["qr"] = True
+    if not meta.get("partial"):
+        _repair_totals(lines, out, meta)
+    clock.lap("handler")
+
+    if items and lines.source == "text" and expired(deadline):
+        _mark_partial(meta, "items")
+    elif items and lines.source == "text":
+        words = DEFAULT_TEXT_SOURCE.words(pdf_path)
+        if lines.page_offset is not None:  # una factura dentro de un PDF con varias: sólo sus hojas
+            first, end = lines.page_offset, lines.page_offset + lines.pages
+            words = [w for w in words if first <= w[0] < end]
+        rows = extract_items(words)
+        if rows:
+            out["items"] = rows
+            meta["items"] = check_items(rows, out["subtotal"])
+        clock.lap("items")
+
+    minimal = _finish(out, meta, pdf_path, dedup, dup_key, prev, results)
+    if trace is not None:
+        trace.update(warnings=list(out["warnings"]), subtotal_read=out["subtotal"] is not None,
+                     header_missing=[f for f in BATCH_HEADER_FIELDS if not out.get(f)])
+    if fp and not layout and not out["warnings"] and not meta.get("partial") and not meta.get("repaired"):
+        learned = layout_cache.learn(lines, scanned_header, out, vendor)
+        if learned: layouts.put(fp, learned)
+    clock.lap("finish")
     return minimal
+
+def read_invoices(pdf_path: str, vendor_hint: Optional[str] = None, cfg_path: str = "vendors.yaml",
+                  use_qr: bool = True, text_cache: Optional[TextCache] = None,
+                  deadline: Optional[Deadline] = None) -> Optional[List[LineIndex]]:
+    """
+    Líneas de cada factura del PDF (invoice_split), para pasarlas a extract_from_pdf(lines=...).
+    None si el PDF trae datos estructurados embebidos: es una sola factura y va por extract_from_pdf.
+    Un escaneo se lee entero (sin el atajo del QR de _load_lines, que sólo pasa por OCR la página
+    del QR y la última: las demás facturas del lote se perderían); con `use_qr` el QR se busca
+    después en la última y primera hoja de cada tramo y queda en su .qr.
+    """
+    image = is_image(pdf_path)
+    if not image and read_embedded(pdf_path):
+        return None
+    lines, _ = _cached_lines(pdf_path, False, text_cache, deadline, _ocr_preprocess(cfg_path, vendor_hint))
+    segments = split_invoices(lines)
+    if not use_qr:
+        return segments
+    for seg in segments:
+        if expired(deadline): break
+        # una sola factura: el archivo entero (una lectura cortada no sabe cuántas hojas tiene)
+        span = None if seg.page_offset is None else (seg.page_offset, seg.page_offset + seg.pages)
+        qr = (find_afip_qr_image(pdf_path, span) if image
+              else find_afip_qr(pdf_path, decode_images=lines.source == "ocr", span=span))
+        seg.qr = qr_to_fields(qr["data"]) if qr else {}
+    return segments
+
+def extract_invoices(pdf_path: str, vendor_hint: Optional[str] = None, cfg_path: str = "vendors.yaml",
+                     dedup: Optional[DuplicateIndex] = None, use_qr: bool = True,
+                     text_cache: Optional[TextCache] = None, items: bool = False,
+                     deadline: Optional[Deadline] = None, layouts: Optional[LayoutCache] = None,
+                     results: Optional[ResultsStore] = None) -> List[Dict[str, Any]]:
+    """
+    extract_from_pdf para PDFs con varias facturas (resumen del mes, original + duplicado):
+    un payload minimal por factura, en orden, sin las copias repetidas. En serie; el servidor
+    reparte los tramos entre los workers (jobs.split_job / jobs.segments_job).
+    """
+    kw = dict(vendor_hint=vendor_hint, cfg_path=cfg_path, dedup=dedup, use_qr=use_qr,
+              text_cache=text_cache, items=items, deadline=deadline, layouts=layouts, results=results)
+    segments = read_invoices(pdf_path, vendor_hint, cfg_path, use_qr, text_cache, deadline)
+    if segments is None:
+        return [extract_from_pdf(pdf_path, **kw)]
+    return [extract_from_pdf(pdf_path, lines=seg, **kw) for seg in segments]
+
+def _batch_candidate(pdf_path: str, use_qr: bool, text_cache: Optional[TextCache],
+                     preprocess: Optional[OcrPreprocess]) -> Optional[Dict[str, Any]]:
+    """
+    Campos del QR ({} si no hay) si el archivo es un escaneo que iría al OCR completo; None si
+    tiene datos embebidos, texto, ya está en la caché de texto o es Factura C con QR (sin OCR).
+    """
+    image = is_image(pdf_path)
+    if not image:
+        if read_embedded(pdf_path):
+            return None
+        lines = DEFAULT_TEXT_SOURCE.lines(pdf_path)
+        if lines and lines.chars() >= MIN_TEXT_CHARS:
+            return None
+    if text_cache is not None and text_cache.get(*_text_cache_key(pdf_path, use_qr, preprocess)) is not None:
+        return None
+    qr = None
+    if use_qr:
+        qr = find_afip_qr_image(pdf_path) if image else find_afip_qr(pdf_path, decode_images=True)
+    fields = qr_to_fields(qr["data"]) if qr else {}
+    return None if fields.get("tipo") == "C" else fields
+
+def extract_ocr_batch(pdf_paths: List[str], vendor_hint: Optional[str] = None, cfg_path: str = "vendors.yaml",
+                      dedup: Optional[DuplicateIndex] = None, use_qr: bool = True,
+                      text_cache: Optional[TextCache] = None, items: bool = False,
+                      deadline: Optional[Deadline] = None, layouts: Optional[LayoutCache] = None,
+                      results: Optional[ResultsStore] = None) -> List[Dict[str, Any]]:
+    """
+    extract_from_pdf de varios archivos (un payload minimal por archivo, en orden) con el OCR de
+    los escaneos por lotes: cabecera y totales de todos en pocas llamadas a Tesseract (ocr_batch).
+    Un escaneo cuyo resultado no valida (advertencias, subtotal no leído, parcial) o al que le falta
+    algún campo de cabecera (BATCH_HEADER_FIELDS) se repite con el OCR completo de siempre; los que
+    no son escaneos van directo por extract_from_pdf. Con `items` no hay lote: los recortes no
+    tienen la tabla de renglones.
+    minimal["_meta"]["ocr_batch"] = True en los que salieron del lote.
+    """
+    kw = dict(vendor_hint=vendor_hint, cfg_path=cfg_path, dedup=dedup, use_qr=use_qr,
+              text_cache=text_cache, items=items, deadline=deadline, layouts=layouts, results=results)
+    if items:
+        return [extract_from_pdf(path, **kw) for path in pdf_paths]
+    preprocess = _ocr_preprocess(cfg_path, vendor_hint)
+    out: List[Optional[Dict[str, Any]]] = [None] * len(pdf_paths)
+    batch: List[Tuple[int, Dict[str, Any]]] = []
+    for i, path in enumerate(pdf_paths):
+        fields = _batch_candidate(path, use_qr, text_cache, preprocess) if not expired(deadline) else None
+        if fields is None:
+            out[i] = extract_from_pdf(path, **kw)
+        else:
+            batch.append((i, fields))
+    read = ocr_batch.batch_lines([pdf_paths[i] for i, _ in batch], preprocess, deadline)
+    for (i, fields), lines in zip(batch, read):
+        path = pdf_paths[i]
+        if lines is not None:
+            # prueba sin dedup ni layouts: las líneas son recortes, no se aprenden ni se registran
+            lines.qr = fields
+            trace: Dict[str, Any] = {}
+            probe = extract_from_pdf(path, vendor_hint=vendor_hint, cfg_path=cfg_path, lines=lines,
+                                     deadline=deadline, trace=trace)
+            if (not trace.get("warnings", True) and trace["subtotal_read"] and not trace["header_missing"]
+                    and not probe["_meta"].get("partial")):
+                minimal = probe
+                if dedup is not None or results is not None:  # validó: ahora sí se registra
+                    minimal = extract_from_pdf(path, vendor_hint=vendor_hint, cfg_path=cfg_path, dedup=dedup,
+                                               lines=lines, deadline=deadline, results=results)
+                minimal["_meta"]["ocr_batch"] = True
+                out[i] = minimal
+                continue
+        out[i] = extract_from_pdf(path, **kw)
+    return out
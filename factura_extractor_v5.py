@@ -13,151 +13,17 @@ import re
 import os
 from typing import List, Dict, Any, Tuple, Optional
 
-try:
-    import fitz  # PyMuPDF
-except Exception:
-    fitz = None
-
-try:
-    from pdf2image import convert_from_path
-except Exception:
-    convert_from_path = None
-
-try:
-    import pytesseract
-    from pytesseract import image_to_data
-except Exception:
-    pytesseract = None
-    image_to_data = None
-
-try:
-    from PIL import Image
-except Exception:
-    Image = None
-
-def _norm_line(s: str) -> str:
-    s = s.replace('\xa0', ' ')
-    s = re.sub(r'\s+', ' ', s)
-    return s.strip()
-
-def _strip_currency(s: str) -> str:
-    return re.sub(r'[$]', '', s).strip()
-
-def _parse_number_smart(s: str) -> Optional[float]:
-    if s is None:
-        return None
-    s = _strip_currency(s)
-    s = s.replace(' ', '')
-    s = re.sub(r'[^0-9,.\-]', '', s)
-    if re.search(r'[.,]\d{2}$', s):
-        dec = s[-3:-2]
-        if dec == ',':
-            t = s.replace('.', '').replace(',', '.')
-        else:
-            t = s.replace(',', '')
-        try:
-            return float(t)
-        except Exception:
-            return None
-    if ',' in s and '.' not in s:
-        t = s.replace(',', '')
-        try:
-            return float(t)
-        except Exception:
-            return None
-    if '.' in s and ',' not in s:
-        try:
-            return float(s)
-        except Exception:
-            t = s.replace('.', '')
-            try:
-                return float(t)
-            except Exception:
-                return None
-    m = list(re.finditer(r'[.,]', s))
-    if m:
-        last = m[-1].group(0)
-        if last == ',':
-            t = s.replace('.', '').replace(',', '.')
-        else:
-            t = s.replace(',', '')
-        try:
-            return float(t)
-        except Exception:
-            return None
-    try:
-        return float(s)
-    except Exception:
-        return None
-
-
-RE_CUIT = re.compile(r'\b\d{2}[- ]?\d{7,8}[- ]?\d\b')
-RE_FECHA = re.compile(
-    r'\b(?:\d{2}[\/\-\.]\d{2}[\/\-\.]\d{2,4}|\d{4}[\/\-]\d{2}[\/\-]\d{2})(?:\s+\d{1,2}:\d{1,2}:\d{1,2})?\b'
+# Lectura de PDF / OCR, números y cabecera vienen del núcleo compartido con v6
+# (extraction_core / extractor_utils); acá quedan sólo las reglas propias de v5.
+# (read_pdf_text, ocr_pdf_to_lines y RE_* se re-exportan para clientes que los importan desde v5)
+from extraction_core import norm_line as _norm_line, load_lines
+from extractor_utils import (
+    strip_currency as _strip_currency,
+    parse_number_smart as _parse_number_smart,
+    read_pdf_text, ocr_pdf_to_lines,
+    extract_header_common, extract_names_and_cuits,
 )
-RE_NUM_FACT = re.compile(r'\b\d{4}-\d{8}\b')
-RE_CAE = re.compile(r'\b\d{14}\b', re.ASCII)
-NUM_PURE = re.compile(r'^\s*-?\s*\d{1,3}(?:[.,]\d{3})*(?:[.,]\d{2})\s*$')  # línea “sólo número con 2 decimales”
-NUM_ANY = re.compile(r'[-]?\d{1,3}(?:[.,]\d{3})*(?:[.,]\d{2})|[-]?\d+(?:[.,]\d{2})')
-
-
-def read_pdf_text(pdf_path: str) -> List[str]:
-    lines = []
-    if fitz is None:
-        return lines
-    try:
-        with fitz.open(pdf_path) as doc:
-            for page in doc:
-                txt = page.get_text("text")
-                if txt:
-                    lines.extend(txt.splitlines())
-    except Exception:
-        return []
-    return [_norm_line(l) for l in lines if _norm_line(l)]
-
-
-def ocr_pdf_to_lines(pdf_path: str, dpi: int = 300) -> List[str]:
-    if convert_from_path is None or pytesseract is None or Image is None:
-        return []
-    text_lines: List[str] = []
-    try:
-        images = convert_from_path(pdf_path, dpi=dpi)
-    except Exception:
-        return []
-    for img in images:
-        try:
-            data = pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT, lang='spa+eng')
-            n = len(data['text'])
-            current_line_no = None
-            buf = []
-            for i in range(n):
-                if int(data['conf'][i]) < 0:
-                    continue
-                t = data['text'][i].strip()
-                if not t:
-                    continue
-                ln = data.get('line_num', [1]*n)[i]
-                if current_line_no is None:
-                    current_line_no = ln
-                if ln != current_line_no:
-                    line = _norm_line(' '.join(buf))
-                    if line:
-                        text_lines.append(line)
-                    buf = [t]
-                    current_line_no = ln
-                else:
-                    buf.append(t)
-            if buf:
-                line = _norm_line(' '.join(buf))
-                if line:
-                    text_lines.append(line)
-        except Exception:
-            txt = pytesseract.image_to_string(img, lang='spa+eng')
-            for line in txt.splitlines():
-                line = _norm_line(line)
-                if line:
-                    text_lines.append(line)
-    return text_lines
+from patterns import RE_CUIT, RE_FECHA, RE_NUM_FACT, RE_CAE, RE_SUBTOTAL_WORD, NUM_PURE, NUM_ANY
 
 
 def _detect_vendor(lines: List[str]) -> Optional[str]:
@@ -170,95 +36,16 @@ def _detect_vendor(lines: List[str]) -> Optional[str]:
 
 
 def _extract_names_and_cuits(lines: List[str], vendor: Optional[str]) -> Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]:
-    proveedor = None
-    cuit_prov = None
-    cliente = None
-    cuit_cli = None
-
-    # Proveedor: buscar explícito por vendor en cabecera
-    head = [l.strip() for l in lines[:60]]
-    if vendor == 'GUERRINI':
-        for l in head:
-            if re.search(r'GUERRINI\s+NEUM[AÁ]TICOS?\s*S\.?A\.?', l, re.I):
-                proveedor = l
-                break
-    elif vendor == 'PIRELLI':
-        for l in head:
-            if re.search(r'PIRELLI\s+NEUM[AÁ]TICOS?\s*S\.?A\.?I\.?C\.?', l, re.I):
-                proveedor = l
-                break
-
-    # CUITs
-    cuit_positions: List[Tuple[int, str]] = []
-    for i, line in enumerate(lines):
-        for m in RE_CUIT.finditer(line):
-            cuit_positions.append((i, m.group(0)))
-    cuit_positions.sort(key=lambda x: x[0])
-    if cuit_positions:
-        cuit_prov = cuit_positions[0][1]
-        # cliente = último CUIT distinto
-        rest = [c for c in cuit_positions if c[1] != cuit_prov]
-        if rest:
-            cuit_cli = rest[-1][1]
-            # nombre de cliente: buscar líneas anteriores a ese CUIT que parezcan nombre
-            idx = rest[-1][0]
-            for j in range(max(0, idx-5), idx+1):
-                cand = lines[j].strip()
-                if re.search(r'(ALVAREZ|NEUM[AÁ]TIC|S\.A\.|SRL|RESPONSABLE|CLIENTE)', cand, re.I) or cand.isupper():
-                    cliente = cand
-                    break
-
-    return proveedor, cuit_prov, cliente, cuit_cli
+    # v5 busca el nombre del proveedor sólo en las primeras 60 líneas
+    return extract_names_and_cuits(lines, vendor, head_lines=60)
 
 
 def _extract_header_common(lines: List[str]) -> Dict[str, Any]:
     out: Dict[str, Any] = {
         "proveedor": None, "cuit_proveedor": None,
         "cliente": None, "cuit_cliente": None,
-        "tipo": None, "numero": None, "fecha": None,
-        "cae": None, "cae_vto": None,
     }
-
-    # Tipo y número
-    for i, line in enumerate(lines[:200]):
-        m = re.search(r'\bFactura\s*([ABC])\b', line, re.I)
-        if m:
-            out["tipo"] = m.group(1).upper()
-            break
-        if re.fullmatch(r'[ABC]', line.strip(), re.I):
-            out["tipo"] = line.strip().upper()
-
-    for line in lines:
-        m = RE_NUM_FACT.search(line)
-        if m:
-            out["numero"] = m.group(0)
-
-    # Fecha (primera razonable)
-    for line in lines:
-        m = RE_FECHA.search(line)
-        if m:
-            out["fecha"] = m.group(0)
-            break
-
-    # CAE + Vto
-    for i, line in enumerate(lines):
-        up = line.upper()
-        if 'CAE' in up:
-            m = RE_CAE.search(line)
-            if not m:
-                m = RE_CAE.search(line.replace('CAE', ''))
-            if m:
-                out["cae"] = m.group(0)
-            # Vto en misma o próximas 2 líneas
-            if any(k in up for k in ['VTO', 'VENC']):
-                mf = RE_FECHA.search(line)
-                if not mf and i+1 < len(lines):
-                    for k in range(i+1, min(i+3, len(lines))):
-                        mf = RE_FECHA.search(lines[k])
-                        if mf:
-                            break
-                if mf:
-                    out["cae_vto"] = mf.group(0)
+    out.update(extract_header_common(lines))
     return out
 
 
@@ -267,7 +54,7 @@ def _extract_totals_block_guerrini(lines: List[str], out: Dict[str, Any]) -> Non
     # Encontrar índice de 'SUBTOTAL:' que esté más cerca del pie
     idx_sub = None
     for i in range(len(lines)-1, -1, -1):
-        if re.search(r'\bSUBTOTAL\b', lines[i].upper()):
+        if RE_SUBTOTAL_WORD.search(lines[i]):
             idx_sub = i
             break
     if idx_sub is None:
@@ -382,12 +169,8 @@ def extract_fields_from_lines(lines: List[str]) -> Dict[str, Any]:
 
 
 def extract_from_pdf(pdf_path: str) -> Dict[str, Any]:
-    lines = read_pdf_text(pdf_path)
-    used_ocr = False
-    if not lines or sum(len(l) for l in lines) < 30:
-        lines = ocr_pdf_to_lines(pdf_path)
-        used_ocr = True
+    lines = load_lines(pdf_path)
     result = extract_fields_from_lines(lines)
-    result["source"] = "ocr" if used_ocr else "text"
+    result["source"] = lines.source
     result["file"] = os.path.basename(pdf_path)
     return result
@@ -0,0 +1,157 @@
+# handlers_embedded.py
+# Parsers de datos estructurados embebidos en el PDF (ver embedded.py).
+# Cada parser devuelve el OUT interno completo (mismas claves que extract_from_pdf) o None.
+import codecs
+import json
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, Iterator, List, Optional
+
+from vendors_registry import register_embedded
+from afip_qr import TIPO_LETRA
+from extractor_utils import cuit_digits
+from patterns import RE_NON_DIGIT
+
+# Id de alícuota de IVA en WSFE -> tasa
+_WSFE_IVA = {3: "0", 4: "10.5", 5: "21", 6: "27", 8: "5", 9: "2.5"}
+
+
+def _record(**fields) -> Dict[str, Any]:
+    out: Dict[str, Any] = {
+        "proveedor": None, "cuit_proveedor": None, "cliente": None, "cuit_cliente": None,
+        "tipo": None, "numero": None, "fecha": None, "cae": None, "cae_vto": None,
+        "subtotal": None, "iva": None, "iva_detalle": [],
+        "percepciones_total": None, "percepciones_detalle": [], "total": None,
+    }
+    out.update(fields)
+    return out
+
+
+def _f(v) -> Optional[float]:
+    try: return round(float(v), 2)
+    except (TypeError, ValueError): return None
+
+
+def _fmt_cuit(v) -> Optional[str]:
+    d = cuit_digits(str(v)) if v is not None else ""
+    return f"{d[:2]}-{d[2:10]}-{d[10:]}" if len(d) == 11 else (d or None)
+
+
+def _yyyymmdd(v) -> Optional[str]:
+    s = RE_NON_DIGIT.sub('', str(v)) if v else ""
+    return f"{s[:4]}-{s[4:6]}-{s[6:8]}" if len(s) == 8 else None
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+def _xml_to_obj(el: ET.Element) -> Any:
+    """XML -> dict/list/str por nombre local (sin namespaces); hijos repetidos quedan en lista."""
+    children = list(el)
+    if not children:
+        return (el.text or "").strip()
+    out: Dict[str, Any] = {}
+    for ch in children:
+        k = _local(ch.tag); v = _xml_to_obj(ch)
+        if k in out:
+            if not isinstance(out[k], list): out[k] = [out[k]]
+            out[k].append(v)
+        else:
+            out[k] = v
+    return out
+
+
+def _walk(obj: Any) -> Iterator[Dict[str, Any]]:
+    if isinstance(obj, dict):
+        yield obj
+        for v in obj.values(): yield from _walk(v)
+    elif isinstance(obj, list):
+        for v in obj: yield from _walk(v)
+
+
+def _as_list(v) -> List[Any]:
+    if v is None: return []
+    return v if isinstance(v, list) else [v]
+
+
+# ---------------------------------------------------------------
+# Factura electrónica AFIP (estructura WSFE: FECAEDetRequest), en JSON o XML
+# ---------------------------------------------------------------
+@register_embedded("wsfe")
+def parse_wsfe(name: str, data: bytes) -> Optional[Dict[str, Any]]:
+    head = data[:4096].removeprefix(codecs.BOM_UTF8)  # JSON guardado con BOM (Windows)
+    if b"ImpTotal" not in data or not (b"CbteTipo" in data or b"CbteDesde" in data):
+        return None
+    if head.lstrip().startswith((b"{", b"[")):
+        obj = json.loads(data.decode("utf-8-sig"))
+    else:
+        obj = _xml_to_obj(ET.fromstring(data))
+    det = next((d for d in _walk(obj) if "ImpTotal" in d), None)
+    if det is None: return None
+    cab = next((d for d in _walk(obj) if "CbteTipo" in d), det)
+    cuit = next((d["Cuit"] for d in _walk(obj) if d.get("Cuit")), None)
+    try: tipo = TIPO_LETRA.get(int(cab.get("CbteTipo")))
+    except (TypeError, ValueError): tipo = None
+    try: numero = f"{int(cab.get('PtoVta')):04d}-{int(det.get('CbteDesde') or det.get('CbteNro')):08d}"
+    except (TypeError, ValueError): numero = None
+    iva_items = []
+    for a in _as_list((det.get("Iva") or {}).get("AlicIva") if isinstance(det.get("Iva"), dict) else det.get("Iva")):
+        try: alic = _WSFE_IVA.get(int(a.get("Id")))
+        except (TypeError, ValueError): alic = None
+        monto = _f(a.get("Importe"))
+        if monto is not None: iva_items.append({"alicuota": alic, "monto": monto})
+    perc_items = []
+    trib = det.get("Tributos")
+    for t in _as_list(trib.get("Tributo") if isinstance(trib, dict) else trib):
+        monto = _f(t.get("Importe"))
+        if monto is not None: perc_items.append({"desc": str(t.get("Desc") or ""), "monto": monto})
+    iva = _f(det.get("ImpIVA"))
+    return _record(
+        cuit_proveedor=_fmt_cuit(cuit),
+        cuit_cliente=_fmt_cuit(det.get("DocNro")) if str(det.get("DocTipo")) == "80" else None,
+        tipo=tipo, numero=numero, fecha=_yyyymmdd(det.get("CbteFch")),
+        cae=str(det["CAE"]) if det.get("CAE") else None, cae_vto=_yyyymmdd(det.get("CAEFchVto")),
+        subtotal=_f(det.get("ImpNeto")), iva=iva, iva_detalle=iva_items,
+        percepciones_total=_f(det.get("ImpTrib")), percepciones_detalle=perc_items,
+        total=_f(det.get("ImpTotal")),
+    )
+
+
+# ---------------------------------------------------------------
+# ZUGFeRD / Factur-X (UN/CEFACT Cross Industry Invoice)
+# ---------------------------------------------------------------
+def _text(el: Optional[ET.Element], *path: str) -> Optional[str]:
+    for step in path:
+        if el is None: return None
+        el = next((c for c in el.iter() if c is not el and _local(c.tag) == step), None)
+    return (el.text or "").strip() if el is not None else None
+
+
+@register_embedded("cii")
+def parse_cii(name: str, data: bytes) -> Optional[Dict[str, Any]]:
+    if b"CrossIndustryInvoice" not in data[:2048]:
+        return None
+    root = ET.fromstring(data)
+    doc = next((c for c in root if _local(c.tag) == "ExchangedDocument"), None)
+    summ = next((c for c in root.iter() if _local(c.tag) == "SpecifiedTradeSettlementHeaderMonetarySummation"), None)
+    settle = next((c for c in root.iter() if _local(c.tag) == "ApplicableHeaderTradeSettlement"), None)
+    iva_items = []; perc_items = []
+    for tax in (c for c in (settle if settle is not None else []) if _local(c.tag) == "ApplicableTradeTax"):
+        monto = _f(_text(tax, "CalculatedAmount"))
+        if monto is None: continue
+        if (_text(tax, "TypeCode") or "VAT").upper() == "VAT":
+            iva_items.append({"alicuota": _text(tax, "RateApplicablePercent"), "monto": monto})
+        else:
+            perc_items.append({"desc": _text(tax, "ExemptionReason") or _text(tax, "TypeCode") or "", "monto": monto})
+    iva = round(sum(i["monto"] for i in iva_items), 2) if iva_items else _f(_text(summ, "TaxTotalAmount"))
+    perc = round(sum(p["monto"] for p in perc_items), 2) if perc_items else None
+    return _record(
+        proveedor=_text(root, "SellerTradeParty", "Name"),
+        cuit_proveedor=_fmt_cuit(_text(root, "SellerTradeParty", "SpecifiedTaxRegistration", "ID")),
+        cliente=_text(root, "BuyerTradeParty", "Name"),
+        cuit_cliente=_fmt_cuit(_text(root, "BuyerTradeParty", "SpecifiedTaxRegistration", "ID")),
+        numero=_text(doc, "ID"), fecha=_yyyymmdd(_text(doc, "IssueDateTime", "DateTimeString")),
+        subtotal=_f(_text(summ, "TaxBasisTotalAmount")), iva=iva, iva_detalle=iva_items,
+        percepciones_total=perc, percepciones_detalle=perc_items,
+        total=_f(_text(summ, "GrandTotalAmount")),
+    )
@@ -1,22 +1,23 @@
 # handlers_guerrini.py
-import re
 from typing import List, Dict, Any, Tuple
 from vendors_registry import register
-from extractor_utils import NUM_PURE, parse_number_smart
+from extractor_utils import amount_index
+from patterns import RE_SUBTOTAL_WORD
 
 @register("GUERRINI")
 def extract_totals_guerrini(lines: List[str], out: Dict[str, Any]) -> None:
     idx_sub = None
     for i in range(len(lines)-1, -1, -1):
-        if re.search(r'\bSUBTOTAL\b', lines[i].upper()):
+        if RE_SUBTOTAL_WORD.search(lines[i]):
             idx_sub = i; break
     if idx_sub is None: return
-    win = lines[idx_sub: min(len(lines), idx_sub + 60)]
+    amounts = amount_index(lines, idx_sub)
     numeric_lines: List[Tuple[int, float]] = []
-    for j, l in enumerate(win):
-        if NUM_PURE.match(l):
-            v = parse_number_smart(l)
-            if v is not None: numeric_lines.append((j, v))
+    j = idx_sub; last = idx_sub + 59  # ventana de 60 líneas desde SUBTOTAL
+    while len(numeric_lines) < 4:
+        hit = amounts.pure_forward(j, last - j)
+        if hit is None: break
+        numeric_lines.append(hit); j = hit[0] + 1
     values = [v for _, v in numeric_lines[:4]]
     if len(values) >= 2:
         out["subtotal"] = values[0]
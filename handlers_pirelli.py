@@ -1,32 +1,28 @@
 # handlers_pirelli.py
-import re
 from typing import List, Dict, Any, Optional
 from vendors_registry import register
-from extractor_utils import NUM_ANY, NUM_PURE, parse_number_smart
+from extractor_utils import amount_index
+from patterns import RE_IVA_RATE, RE_TOTAL_WORD
 
 @register("PIRELLI")
 def extract_totals_pirelli(lines: List[str], out: Dict[str, Any]) -> None:
     
     start = max(0, len(lines) - 120)
-    tail = lines[start:]
+    amounts = amount_index(lines, start)
     subtotal = iva_total = percep_total = total = None
     iva_items = []; percep_items = []
 
     def first_num_near(i: int, span: int = 6) -> Optional[float]:
-        for j in range(i, min(len(tail), i + span + 1)):
-            m = NUM_PURE.search(tail[j]) or NUM_ANY.search(tail[j])
-            if m:
-                v = parse_number_smart(m.group(0))
-                if v is not None: return v
-        return None
+        return amounts.forward(i, span)
 
-    for i, line in enumerate(tail):
+    for i in range(start, len(lines)):
+        line = lines[i]
         up = line.upper()
         if 'SUBTOTAL' in up and subtotal is None:
             v = first_num_near(i)
             if v is not None: subtotal = v
         if 'IVA' in up:
-            mrate = re.search(r'IVA\s*([\d]{1,2}(?:[.,]\d{1,2})?)', line, re.I)
+            mrate = RE_IVA_RATE.search(line)
             alic = mrate.group(1).replace(',', '.') if mrate else None
             v = first_num_near(i)
             if v is not None:
@@ -37,7 +33,7 @@ def extract_totals_pirelli(lines: List[str], out: Dict[str, Any]) -> None:
             if v is not None:
                 percep_total = (percep_total or 0.0) + v
                 percep_items.append({"desc": line, "monto": v})
-        if 'IMPORTE TOTAL' in up or re.search(r'\bTOTAL\b', up):
+        if 'IMPORTE TOTAL' in up or RE_TOTAL_WORD.search(line):
             v = first_num_near(i)
             if v is not None: total = v
 
@@ -0,0 +1,72 @@
+# invoice_split.py
+# Un PDF con varias facturas (el resumen del mes, u original + duplicado + triplicado) se corta
+# en tramos de páginas, uno por comprobante. Marcas por página, en la cabecera de cada hoja:
+#   - número de comprobante (RE_NUM_FACT): otro número -> otra factura
+#   - copia (ORIGINAL / DUPLICADO / ...): otra copia del mismo número -> otro tramo
+#   - CAE (en cualquier parte de la hoja): otro CAE -> otra factura
+# Una hoja sin marcas sigue el tramo anterior (facturas de varias hojas).
+# Las copias repetidas (mismo número y CAE) se descartan: queda la primera.
+from typing import Any, Dict, List, Optional
+
+from extraction_core import LineIndex
+from patterns import RE_CAE, RE_COPIA, RE_NUM_FACT
+
+HEAD_LINES = 40  # líneas de cada hoja donde se buscan número y copia
+
+
+def page_markers(page: List[str]) -> Dict[str, Optional[str]]:
+    numero = copia = cae = None
+    for line in page[:HEAD_LINES]:
+        if numero is None:
+            m = RE_NUM_FACT.search(line)
+            if m: numero = m.group(0)
+        if copia is None:
+            m = RE_COPIA.search(line)
+            if m: copia = m.group(1).upper()
+        if numero and copia: break
+    for line in page:
+        if 'CAE' in line.upper():
+            m = RE_CAE.search(line) or RE_CAE.search(line.replace('CAE', ''))
+            if m: cae = m.group(0); break
+    return {"numero": numero, "copia": copia, "cae": cae}
+
+
+def _starts_new(cur: Dict[str, Any], mk: Dict[str, Optional[str]]) -> bool:
+    if mk["numero"] and cur["numero"] and mk["numero"] != cur["numero"]: return True
+    if mk["copia"] and cur["copia"] and mk["copia"] != cur["copia"]: return True
+    # el CAE va al pie: una hoja con otro CAE es de otra factura aunque no se haya leído el número
+    return bool(mk["cae"] and cur["cae"] and mk["cae"] != cur["cae"])
+
+
+def segment_pages(lines: LineIndex) -> List[Dict[str, Any]]:
+    """Tramos [{"first", "end", "numero", "copia", "cae"}] en orden, antes de descartar copias."""
+    segs: List[Dict[str, Any]] = []
+    for p in range(lines.pages):
+        mk = page_markers(lines.page_lines(p))
+        if not segs or _starts_new(segs[-1], mk):
+            segs.append(dict(mk, first=p, end=p + 1))
+            continue
+        cur = segs[-1]; cur["end"] = p + 1
+        for k, v in mk.items():
+            if cur[k] is None: cur[k] = v
+    return segs
+
+
+def split_invoices(lines: LineIndex) -> List[LineIndex]:
+    """
+    Un LineIndex por factura (page_range; page_offset = primera hoja en el PDF). Con una sola
+    factura devuelve [lines] tal cual (con QR y todo). El QR del archivo no se pasa a los tramos:
+    no se sabe de cuál de las facturas es (read_invoices busca el de cada tramo en sus hojas).
+    """
+    if lines.pages <= 1: return [lines]
+    segs = segment_pages(lines)
+    if len(segs) <= 1: return [lines]
+    seen = set(); out: List[LineIndex] = []
+    for s in segs:
+        key = (s["numero"], s["cae"])
+        if s["numero"] and key in seen: continue  # otra copia del mismo comprobante
+        seen.add(key)
+        out.append(lines.page_range(s["first"], s["end"]))
+    if lines.partial:
+        out[-1].partial = True  # la lectura se cortó: lo que falta es del final
+    return out
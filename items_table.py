@@ -0,0 +1,150 @@
+# items_table.py
+# Detalle de ítems (código, descripción, cantidad, precio unitario, importe) a partir de las
+# palabras con coordenadas (TextSource.words). Vectorizado con NumPy:
+# - números: se parsean todos juntos (mismas reglas que parse_number_smart para 1.234,56 / 1,234.56)
+# - renglones: orden por (página, y) y corte donde el salto vertical supera media altura de palabra
+# - columnas: clustering 1D del borde derecho de los números (los importes van alineados a derecha)
+# Lo único que recorre renglón por renglón es el armado de la descripción (unir palabras).
+# NumPy es opcional: sin NumPy no hay detalle (la extracción de totales no cambia).
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from extraction_core import Word, _optional
+
+ROW_TOL = 0.5        # fracción de la altura mediana de palabra: mismo renglón
+COL_GAP = 8.0        # pt entre bordes derechos para considerar otra columna
+COL_SUPPORT = 0.5    # una columna numérica tiene que estar en al menos la mitad de los renglones
+MIN_ROWS = 2         # con menos renglones no hay tabla
+_NUM_START = list("0123456789-$")
+STOP_WORDS = ("SUBTOTAL", "SUBTOTAL:", "TOTAL", "TOTAL:", "IVA", "NETO", "PERCEP.", "PERCEPCION", "CAE")
+
+
+def parse_numbers(np, texts) -> Tuple[Any, Any, Any]:
+    """
+    texts (array de str) -> (valores float con nan, es_número, es_importe).
+    es_importe: número con dos decimales (1.234,56), que es como vienen cantidades con coma e importes.
+    """
+    values = np.full(len(texts), np.nan)
+    is_num = np.zeros(len(texts), dtype=bool); is_amt = is_num.copy()
+    # Sólo se parsea lo que empieza como un número (la mayoría de las palabras son texto)
+    idx = np.flatnonzero(np.isin(texts.astype('U1'), _NUM_START))
+    if not len(idx): return values, is_num, is_amt
+    s = np.char.replace(texts[idx], '$', '')
+    n = np.char.str_len(s)
+    comma = np.char.rfind(s, ',')
+    dot = np.char.rfind(s, '.')
+    dec2 = (n >= 4) & ((comma == n - 3) | (dot == n - 3))
+    # El último separador es el decimal cuando está a dos posiciones del final; si no, ',' es de miles
+    comma_dec = dec2 & (comma == n - 3)
+    t = np.where(comma_dec,
+                 np.char.replace(np.char.replace(s, '.', ''), ',', '.'),
+                 np.char.replace(s, ',', ''))
+    body = np.char.replace(np.char.lstrip(t, '-'), '.', '')
+    ok = (np.char.str_len(body) > 0) & np.char.isdigit(body) & (np.char.count(t, '.') <= 1)
+    values[idx[ok]] = t[ok].astype(float)
+    is_num[idx] = ok; is_amt[idx] = ok & dec2
+    return values, is_num, is_amt
+
+
+def _rows(np, page, y0, y1):
+    """Orden (página, y centro) e id de renglón de cada palabra en ese orden."""
+    yc = (y0 + y1) / 2.0
+    h = np.median(y1 - y0) if len(y0) else 0.0
+    order = np.lexsort((yc, page))
+    yc_s = yc[order]; page_s = page[order]
+    brk = np.empty(len(order), dtype=bool)
+    if len(order):
+        brk[0] = True
+        brk[1:] = (page_s[1:] != page_s[:-1]) | (np.diff(yc_s) > ROW_TOL * max(h, 1.0))
+    return order, np.cumsum(brk) - 1
+
+
+def _columns(np, x1, row, n_rows, n_cand):
+    """Clusters de bordes derechos con soporte suficiente -> (límites, índices de columnas válidas)."""
+    xs = np.sort(x1)
+    cut = np.flatnonzero(np.diff(xs) > COL_GAP)
+    bounds = (xs[cut] + xs[cut + 1]) / 2.0
+    cid = np.searchsorted(bounds, x1)
+    # soporte = renglones distintos por cluster
+    pairs = np.unique(cid * (n_rows + 1) + row)
+    support = np.bincount(pairs // (n_rows + 1), minlength=len(bounds) + 1)
+    keep = np.flatnonzero(support >= COL_SUPPORT * n_cand)
+    return bounds, keep
+
+
+def extract_items(words: Sequence[Word]) -> List[Dict[str, Any]]:
+    """Renglones de ítems, en orden de aparición. [] si no hay NumPy o no se reconoce una tabla."""
+    np = _optional("numpy")
+    if np is None or not words: return []
+    pages, x0, y0, x1, y1, texts = zip(*words)
+    page = np.array(pages, dtype=np.int64); x0 = np.array(x0, dtype=float); x1 = np.array(x1, dtype=float)
+    texts = np.array(texts, dtype=str)
+
+    order, row = _rows(np, page, np.array(y0, dtype=float), np.array(y1, dtype=float))
+    # dentro del renglón, de izquierda a derecha
+    perm = np.lexsort((x0[order], row))
+    order = order[perm]; row = row[perm]
+    page = page[order]; x1 = x1[order]; texts = texts[order]
+    values, is_num, is_amt = parse_numbers(np, texts)
+
+    n_rows = int(row[-1]) + 1
+    starts = np.r_[0, np.flatnonzero(np.diff(row)) + 1]
+    ends = np.r_[starts[1:], len(row)] - 1
+    first = np.zeros(len(row), dtype=bool); first[starts] = True
+
+    stop = np.isin(np.char.upper(texts), STOP_WORDS)
+    # el primer token es el código aunque sea numérico; no cuenta como columna
+    num_cols = is_num & ~first
+    n_num = np.bincount(row, weights=num_cols, minlength=n_rows)
+    n_txt = np.bincount(row, weights=~is_num, minlength=n_rows)
+    has_stop = np.bincount(row, weights=stop, minlength=n_rows) > 0
+    cand = is_amt[ends] & (n_num >= 2) & (n_txt >= 1) & ~has_stop
+    if cand.sum() < MIN_ROWS: return []
+
+    in_cand = cand[row] & num_cols
+    cand_rows = np.flatnonzero(cand)
+    bounds, keep = _columns(np, x1[in_cand], row[in_cand], n_rows, len(cand_rows))
+    if len(keep) < 2: return []
+    col_pos = np.full(len(bounds) + 1, -1); col_pos[keep] = np.arange(len(keep))
+    wcol = np.full(len(row), -1)
+    wcol[in_cand] = col_pos[np.searchsorted(bounds, x1[in_cand])]
+
+    # matriz renglón x columna (nan = vacío); si una celda tiene dos números queda el último
+    row_pos = np.full(n_rows, -1); row_pos[cand_rows] = np.arange(len(cand_rows))
+    table = np.full((len(cand_rows), len(keep)), np.nan)
+    sel = wcol >= 0
+    table[row_pos[row[sel]], wcol[sel]] = values[sel]
+    importe = table[:, -1]; precio = table[:, -2]
+    cantidad = table[:, 0] if len(keep) >= 3 else np.full(len(cand_rows), np.nan)
+    # la descripción termina donde empieza la primera columna numérica
+    first_col = np.full(n_rows, len(row))
+    np.minimum.at(first_col, row[sel], np.flatnonzero(sel))
+
+    code_like = first & ~is_amt & (np.char.str_len(texts) >= 3) & np.char.isalnum(np.char.replace(texts, '-', ''))
+    # de acá en adelante es armar dicts: listas de Python, no escalares de NumPy
+    words_l = texts.tolist(); code_l = code_like.tolist(); page_l = page.tolist()
+    starts_l = starts.tolist(); first_l = first_col.tolist()
+    items: List[Dict[str, Any]] = []
+    for r, qty, pu, imp in zip(cand_rows.tolist(), cantidad.tolist(), precio.tolist(), importe.tolist()):
+        if imp != imp: continue  # nan
+        a, b = starts_l[r], first_l[r]
+        code = None
+        if code_l[a] and any(ch.isdigit() for ch in words_l[a]):
+            code = words_l[a]; a += 1
+        items.append({
+            "codigo": code,
+            "descripcion": " ".join(words_l[a:b]),
+            "cantidad": None if qty != qty else qty,
+            "precio_unitario": None if pu != pu else pu,
+            "importe": imp,
+            "pagina": page_l[starts_l[r]],
+        })
+    return items
+
+
+def check_items(items: List[Dict[str, Any]], subtotal: Optional[float]) -> Dict[str, Any]:
+    """Suma de importes contra el subtotal del handler (tolerancia: redondeo de medio centavo por renglón)."""
+    suma = round(sum(it["importe"] for it in items), 2)
+    res: Dict[str, Any] = {"count": len(items), "suma": suma}
+    if subtotal is not None:
+        res["cuadra"] = abs(suma - subtotal) <= 0.05 + 0.005 * len(items)
+    return res
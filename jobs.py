@@ -0,0 +1,142 @@
+# jobs.py
+# Trabajos que corren dentro de los workers (worker_pool) o en el mismo proceso si no hay pool.
+# Cada proceso abre sus propios índices SQLite (las conexiones no se pueden pasar entre procesos;
+# WAL permite varios procesos sobre el mismo archivo).
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import memory_guard
+import settings
+from deadline import Deadline
+from dedup_index import DuplicateIndex
+from extraction_core import LineIndex
+from extractor_v6 import extract_from_pdf, extract_ocr_batch, read_invoices
+from layout_cache import LayoutCache
+from profiler import SlowLog, StageClock, slow_capture, watch_requests
+from results_store import ResultsStore
+from text_cache import TextCache
+
+_Stores = Tuple[Optional[DuplicateIndex], Optional[TextCache], Optional[LayoutCache]]
+_STORES: Optional[_Stores] = None
+_SLOW_LOG: Optional[SlowLog] = None
+_RESULTS: Optional[ResultsStore] = None
+
+
+def stores() -> _Stores:
+    """(índice de duplicados, caché de texto, caché de disposición) de este proceso; None si están deshabilitados."""
+    global _STORES
+    if _STORES is None:
+        _STORES = (DuplicateIndex(settings.DEDUP_DB) if settings.DEDUP_ENABLED else None,
+                   TextCache(settings.TEXT_CACHE_DB) if settings.TEXT_CACHE_ENABLED else None,
+                   LayoutCache(settings.LAYOUT_CACHE_DB, settings.LAYOUT_CACHE_MAX)
+                   if settings.LAYOUT_CACHE_ENABLED else None)
+    return _STORES
+
+
+def slow_log() -> Optional[SlowLog]:
+    """Anillo de extracciones lentas de este proceso (profiler.SlowLog); None si está deshabilitado."""
+    global _SLOW_LOG
+    if _SLOW_LOG is None and settings.SLOW_MS > 0:
+        _SLOW_LOG = SlowLog(settings.SLOW_LOG_DB, settings.SLOW_LOG_MAX)
+    return _SLOW_LOG
+
+
+def results_store() -> Optional[ResultsStore]:
+    """Almacén de resultados (results_store) de este proceso; None si está deshabilitado."""
+    global _RESULTS
+    if _RESULTS is None and settings.RESULTS_ENABLED:
+        _RESULTS = ResultsStore(settings.RESULTS_DB)
+    return _RESULTS
+
+
+def _capture(pdf_path: str):
+    return slow_capture(slow_log(), pdf_path, settings.SLOW_MS,
+                        settings.SLOW_PROFILE_RATE if settings.SLOW_PROFILE else 0.0)
+
+
+def init_worker() -> None:
+    memory_guard.configure(settings.FITZ_STORE_MB, settings.OCR_PAGES_IN_FLIGHT)
+    stores()
+    slow_log()
+    results_store()
+    if settings.ADMIN_TOKEN:  # /admin/profile: muestreo a pedido, sin ocupar el worker
+        watch_requests(settings.PROFILE_DIR)
+
+
+def _deadline(deadline_ts: Optional[float], cancel: Optional[threading.Event] = None) -> Deadline:
+    return Deadline(max(0.0, deadline_ts - time.time()) if deadline_ts is not None else None, cancel)
+
+
+def extract_job(pdf_path: str, vendor_hint: Optional[str], items: bool = False,
+                deadline_ts: Optional[float] = None, cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
+    """
+    extract_from_pdf con los índices del proceso.
+    deadline_ts: plazo absoluto (time.time()), así el tiempo en cola del pool también cuenta.
+    cancel: sólo en el mismo proceso (un Event no cruza a los workers; ahí se mata el proceso).
+    """
+    dedup, text_cache, layouts = stores()
+    with _capture(pdf_path) as trace:
+        return extract_from_pdf(pdf_path, vendor_hint=vendor_hint, cfg_path="vendors.yaml", dedup=dedup,
+                                text_cache=text_cache, items=items, deadline=_deadline(deadline_ts, cancel),
+                                layouts=layouts, trace=trace, results=results_store())
+
+
+def text_layer_job(pdf_path: str, vendor_hint: Optional[str], items: bool = False,
+                   deadline_ts: Optional[float] = None, cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
+    """extract_job sin OCR (modo degradado): un escaneo sale parcial en la etapa "ocr"."""
+    dedup, text_cache, layouts = stores()
+    with _capture(pdf_path) as trace:
+        return extract_from_pdf(pdf_path, vendor_hint=vendor_hint, cfg_path="vendors.yaml", dedup=dedup,
+                                text_cache=text_cache, items=items, deadline=_deadline(deadline_ts, cancel),
+                                layouts=layouts, ocr=False, trace=trace, results=results_store())
+
+
+def split_job(pdf_path: str, vendor_hint: Optional[str], items: bool = False,
+              deadline_ts: Optional[float] = None, cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
+    """
+    Primer paso de un PDF con varias facturas: lee el texto una vez y lo corta por factura.
+    {"results": [payload]} si hay una sola (se extrae acá mismo); {"segments": [LineIndex]} si hay
+    varias, para repartirlas con segments_job.
+    """
+    dedup, text_cache, layouts = stores()
+    deadline = _deadline(deadline_ts, cancel)
+    with _capture(pdf_path) as trace:
+        clock = StageClock(trace)
+        segments = read_invoices(pdf_path, vendor_hint, "vendors.yaml", text_cache=text_cache, deadline=deadline)
+        clock.lap("read")
+        if segments is not None and len(segments) > 1:
+            trace["source"] = "split"
+            return {"segments": segments}
+        return {"results": [extract_from_pdf(pdf_path, vendor_hint=vendor_hint, cfg_path="vendors.yaml",
+                                             dedup=dedup, text_cache=text_cache, items=items, deadline=deadline,
+                                             layouts=layouts, lines=segments[0] if segments else None,
+                                             trace=trace, results=results_store())]}
+
+
+def segments_job(pdf_path: str, vendor_hint: Optional[str], items: bool, segments: List[LineIndex],
+                 deadline_ts: Optional[float] = None, cancel: Optional[threading.Event] = None) -> List[Dict[str, Any]]:
+    """extract_from_pdf de un grupo de facturas ya cortadas (un grupo por worker: menos idas y vueltas)."""
+    dedup, _, layouts = stores()
+    deadline = _deadline(deadline_ts, cancel)
+    out = []
+    for seg in segments:
+        with _capture(pdf_path) as trace:
+            out.append(extract_from_pdf(pdf_path, vendor_hint=vendor_hint, cfg_path="vendors.yaml", dedup=dedup,
+                                        items=items, deadline=deadline, layouts=layouts, lines=seg, trace=trace,
+                                        results=results_store()))
+    return out
+
+
+def batch_ocr_job(pdf_paths: List[str], vendor_hint: Optional[str], items: bool = False,
+                  deadline_ts: Optional[float] = None, cancel: Optional[threading.Event] = None) -> List[Dict[str, Any]]:
+    """extract_ocr_batch de un grupo de escaneos (un grupo por worker, una sola ranura OCR)."""
+    dedup, text_cache, layouts = stores()
+    with _capture(pdf_paths[0]) as trace:
+        trace.update(source="ocr_batch", vendor=(vendor_hint or "").upper() or None)
+        clock = StageClock(trace)
+        out = extract_ocr_batch(pdf_paths, vendor_hint=vendor_hint, cfg_path="vendors.yaml", dedup=dedup,
+                                text_cache=text_cache, items=items, deadline=_deadline(deadline_ts, cancel),
+                                layouts=layouts, results=results_store())
+        clock.lap("ocr_batch")
+        return out
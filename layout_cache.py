@@ -0,0 +1,172 @@
+# layout_cache.py
+# Caché persistente (SQLite) de la disposición de cada formato de factura. Las facturas de un
+# mismo proveedor salen del mismo sistema: la cabecera está en las mismas líneas y el bloque de
+# totales a la misma distancia del final (lo que cambia es la cantidad de ítems en el medio).
+# Después de una extracción que cierra contablemente se guarda, por huella del formato:
+#   - proveedor detectado (se saltea la detección)
+#   - línea de cada campo de cabecera, contada desde el principio o desde el final del documento
+#   - ventana del bloque de totales, contada desde el final
+# En la próxima factura con la misma huella cabecera y handler corren sólo sobre esas líneas;
+# si el resultado no valida se descarta la entrada y se hace la pasada completa.
+# Huella: primeras líneas con los dígitos enmascarados (membrete, rótulos) + origen del texto.
+# Acotada a MAX_ENTRIES (se desalojan las menos usadas).
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from extractor_utils import amount_index, extract_header_common
+
+HEAD_LINES = 8         # líneas del membrete que entran en la huella
+HEADER_FIELDS = ("tipo", "numero", "fecha", "cae", "cae_vto")
+HEADER_SPAN = 3        # cae_vto puede estar hasta dos líneas después del rótulo
+TOTALS_TAIL = 200      # donde se busca el bloque de totales al aprender
+LABEL_SLACK = 8        # rótulos antes del primer importe (GUERRINI: 4 rótulos y después 4 importes)
+MAX_ENTRIES = 5000
+_DIGITS = str.maketrans("0123456789", "9999999999")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS layouts (
+    fingerprint TEXT PRIMARY KEY,
+    vendor      TEXT,
+    layout      TEXT NOT NULL,
+    created     REAL NOT NULL,
+    last_used   REAL NOT NULL,
+    hits        INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+
+def fingerprint(lines: Sequence[str], source: str = "text") -> str:
+    head = "\n".join(l.translate(_DIGITS) for l in lines[:HEAD_LINES])
+    return hashlib.sha1(f"{source}\n{head}".encode("utf-8")).hexdigest()
+
+
+def _anchor(i: int, n: int) -> List[Any]:
+    return ["s", i] if i < n / 2 else ["e", n - i]
+
+
+def _resolve(anchor: Sequence[Any], n: int) -> int:
+    return anchor[1] if anchor[0] == "s" else n - anchor[1]
+
+
+def _field_line(lines: Sequence[str], field: str, value: str) -> Optional[int]:
+    """Primera línea desde la que la cabecera encuentra ese valor (mirando HEADER_SPAN líneas)."""
+    up = value.upper()
+    for i in range(len(lines)):
+        window = list(lines[i:i + HEADER_SPAN])
+        if up in " ".join(window).upper() and extract_header_common(window)[field] == value:
+            return i
+    return None
+
+
+def _totals_window(lines: Sequence[str], out: Dict[str, Any]) -> Optional[List[int]]:
+    """[desde, hasta) del bloque de totales contado desde el final, o None si no se ubica."""
+    targets = [out.get(k) for k in ("subtotal", "iva", "percepciones_total", "total")]
+    targets += [it.get("monto") for it in (out.get("iva_detalle") or []) + (out.get("percepciones_detalle") or [])]
+    targets = {round(v, 2) for v in targets if v}
+    if not targets: return None
+    n = len(lines); start = max(0, n - TOTALS_TAIL)
+    values = amount_index(lines, start).values
+    last: Dict[float, int] = {}
+    for k, v in enumerate(values):
+        if v is not None and round(v, 2) in targets:
+            last[round(v, 2)] = start + k
+    if len(last) < len(targets): return None
+    lo = max(0, min(last.values()) - LABEL_SLACK); hi = max(last.values()) + 1
+    return [n - lo, n - hi]
+
+
+def learn(lines: Sequence[str], header: Dict[str, Any], out: Dict[str, Any],
+          vendor: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Disposición de una extracción que cerró; None si el bloque de totales no se puede ubicar."""
+    totals = _totals_window(lines, out)
+    if totals is None: return None
+    n = len(lines); fields = {}
+    for f in HEADER_FIELDS:
+        if header.get(f):
+            i = _field_line(lines, f, header[f])
+            if i is None: return None
+            fields[f] = _anchor(i, n)
+    return {"vendor": vendor, "header": fields, "totals": totals}
+
+
+def header_lines(lines: Sequence[str], layout: Dict[str, Any]) -> List[str]:
+    """Sólo las líneas donde estaban los campos de cabecera (más una de margen), en orden."""
+    n = len(lines); keep = set()
+    for anchor in layout["header"].values():
+        i = _resolve(anchor, n)
+        keep.update(range(max(0, i - 1), min(n, i + HEADER_SPAN + 1)))
+    return [lines[i] for i in sorted(keep)]
+
+
+def header_ok(header: Dict[str, Any], layout: Dict[str, Any]) -> bool:
+    """Todo campo que la pasada completa encontró tiene que aparecer en las líneas de la caché."""
+    return all(header.get(f) for f in layout["header"])
+
+
+def totals_lines(lines: Sequence[str], layout: Dict[str, Any]) -> List[str]:
+    n = len(lines); a, b = layout["totals"]
+    return list(lines[max(0, n - a):max(0, n - b)])
+
+
+class LayoutCache:
+    def __init__(self, path: str, max_entries: int = MAX_ENTRIES):
+        d = os.path.dirname(path)
+        if d: os.makedirs(d, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(_SCHEMA)
+        self._db.execute("CREATE INDEX IF NOT EXISTS layouts_last_used ON layouts (last_used)")
+        self._db.commit()
+        # contadores de este proceso
+        self.lookups = 0; self.hits = 0; self.fallbacks = 0
+
+    def get(self, fp: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self.lookups += 1
+            row = self._db.execute("SELECT layout FROM layouts WHERE fingerprint = ?", (fp,)).fetchone()
+            if not row: return None
+            self.hits += 1
+            with self._db:
+                self._db.execute("UPDATE layouts SET last_used = ?, hits = hits + 1 WHERE fingerprint = ?",
+                                 (time.time(), fp))
+        return json.loads(row[0])
+
+    def put(self, fp: str, layout: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO layouts (fingerprint, vendor, layout, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (fp, layout.get("vendor"), json.dumps(layout, separators=(",", ":")), now, now))
+            extra = self._db.execute("SELECT COUNT(*) FROM layouts").fetchone()[0] - self.max_entries
+            if extra > 0:
+                self._db.execute(
+                    "DELETE FROM layouts WHERE fingerprint IN "
+                    "(SELECT fingerprint FROM layouts ORDER BY last_used LIMIT ?)", (extra,))
+
+    def fallback(self, fp: str) -> None:
+        """La disposición guardada no validó: se descarta (se vuelve a aprender si la pasada completa cierra)."""
+        with self._lock, self._db:
+            self.fallbacks += 1
+            self._db.execute("DELETE FROM layouts WHERE fingerprint = ?", (fp,))
+
+    def stats(self) -> Dict[str, Any]:
+        """hit_rate: consultas resueltas con la disposición guardada (sin volver a la pasada completa)."""
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM layouts").fetchone()[0]
+            used = self.hits - self.fallbacks
+            return {"entries": entries, "lookups": self.lookups, "hits": self.hits,
+                    "fallbacks": self.fallbacks,
+                    "hit_rate": round(used / self.lookups, 4) if self.lookups else 0.0}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,103 @@
+# memory_guard.py
+# Memoria de los workers de extracción. Un worker de larga vida crece: imágenes PIL de
+# convert_from_path, el store global de PyMuPDF (caché de fuentes / imágenes decodificadas, hasta
+# 256 MB por default) y la fragmentación del heap después de un escaneo grande.
+# - configure(): tope del store de PyMuPDF y páginas renderizadas a la vez (jobs.init_worker).
+# - metered(fn, *args): corre un trabajo midiendo su pico de RSS (VmHWM, que se reinicia por
+#   trabajo con /proc/self/clear_refs), recorta el store y devuelve la memoria libre al sistema
+#   (malloc_trim) si el trabajo la hizo crecer. WorkerPool lo usa para todos los trabajos.
+# - rss_mb(pid): RSS de cualquier proceso; WorkerPool recicla el worker que pasa el tope.
+# Las mediciones son de Linux (/proc); en otro sistema dan None y no se recicla por memoria.
+import ctypes
+import ctypes.util
+import gc
+import os
+from typing import Any, Callable, Optional, Tuple
+
+from extraction_core import DEFAULT_OCR_SOURCE, _optional
+
+TRIM_GROWTH_MB = 32.0  # crecimiento del pico sobre el RSS inicial a partir del cual se compacta
+
+_PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_fitz_store_mb = 0.0
+_libc: Any = None
+
+
+def configure(fitz_store_mb: float = 0.0, pages_in_flight: int = 0) -> None:
+    """En cada worker: tope del store de PyMuPDF (MB, 0 = el de PyMuPDF) y páginas de OCR a la vez."""
+    global _fitz_store_mb
+    _fitz_store_mb = fitz_store_mb
+    if pages_in_flight > 0 and hasattr(DEFAULT_OCR_SOURCE, "pages_in_flight"):
+        DEFAULT_OCR_SOURCE.pages_in_flight = pages_in_flight
+
+
+def rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as f:
+            return round(int(f.read().split()[1]) * _PAGE / 2 ** 20, 1)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _status_mb(key: str) -> Optional[float]:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(key + ":"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def reset_peak() -> bool:
+    """Reinicia VmHWM (pico de RSS) del proceso; False si el kernel no lo permite."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def trim_fitz_store() -> None:
+    """Vacía el store de PyMuPDF en la proporción que se pasa del tope configurado."""
+    fitz = _optional("fitz") if _fitz_store_mb > 0 else None
+    if fitz is None: return
+    try:
+        size = fitz.TOOLS.store_size
+        limit = _fitz_store_mb * 2 ** 20
+        if size > limit:
+            fitz.TOOLS.store_shrink(min(100, int(100 * (size - limit) / size) + 1))
+    except Exception:
+        pass
+
+
+def release() -> None:
+    """Basura cíclica (imágenes PIL que quedaron en ciclos) y heap libre de vuelta al sistema."""
+    global _libc
+    gc.collect()
+    if _libc is None:
+        name = ctypes.util.find_library("c")
+        try: _libc = ctypes.CDLL(name) if name else False
+        except OSError: _libc = False
+        if _libc and not hasattr(_libc, "malloc_trim"): _libc = False  # no es glibc
+    if _libc:
+        _libc.malloc_trim(0)
+
+
+def metered(fn: Callable, *args: Any) -> Tuple[Any, Optional[float], Optional[float]]:
+    """fn(*args) -> (resultado, pico de RSS del trabajo en MB, RSS al terminar en MB)."""
+    before = rss_mb()
+    exact = reset_peak()
+    try:
+        return_value = fn(*args)
+    finally:
+        trim_fitz_store()
+        peak = _status_mb("VmHWM") if exact else None
+        if peak is not None and before is not None and peak - before >= TRIM_GROWTH_MB:
+            release()
+    after = rss_mb()
+    if peak is None and before is not None and after is not None:
+        peak = max(before, after)  # sin clear_refs: cota inferior
+    return return_value, peak, after
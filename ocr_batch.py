@@ -0,0 +1,144 @@
+# ocr_batch.py
+# OCR por lotes para corridas masivas: en vez de una llamada a Tesseract por página de cada factura
+# (arranque del proceso, carga del modelo y análisis de página cada vez), se recortan de cada
+# escaneo sólo las zonas que usa el pipeline -cabecera (arriba de la primera hoja) y totales
+# (abajo de la última)-, se apilan en hojas compuestas con un margen blanco entre zonas y se hace
+# una sola llamada por hoja compuesta. Cada palabra vuelve a su factura y zona por su coordenada
+# vertical (los offsets de cada recorte se conocen).
+# El que llama (extractor_v6.extract_ocr_batch) valida cada factura y, si no cierra, la repite
+# con el OCR completo de siempre: la precisión no baja.
+import bisect
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from deadline import Deadline, expired
+from extraction_core import (DEFAULT_OCR_SOURCE, LineIndex, TesseractOcrSource, _optional, _timeout_kw,
+                             image_pages, is_image, norm_line)
+
+HEADER_FRAC = 0.30     # alto de la cabecera, fracción de la primera hoja
+TOTALS_FRAC = 0.35     # alto del pie con totales, fracción de la última hoja
+GUTTER_PX = 80         # blanco entre zonas: Tesseract no junta renglones de dos facturas
+MAX_SHEET_PX = 16000   # alto máximo de una hoja compuesta
+RENDER_DPI = 300
+
+
+class Region(NamedTuple):
+    doc: int      # índice de la factura en el lote
+    page: int     # 0 = cabecera, 1 = totales (página del LineIndex resultante)
+    img: Any      # recorte PIL en grises
+
+
+class Sheet(NamedTuple):
+    img: Any
+    tops: List[int]          # y inicial de cada recorte (ordenado)
+    slots: List[Region]      # recorte de cada franja
+
+
+def _pages(path: str, preprocess: Optional[Callable]) -> List[Any]:
+    """Primera y última hoja (una sola si es de una hoja) a RENDER_DPI, ya preprocesadas."""
+    prep = preprocess or (lambda img: img)
+    if is_image(path):
+        from PIL import Image
+        with Image.open(path) as img:
+            n = getattr(img, "n_frames", 1)
+        pages = list(image_pages(path, sorted({0, n - 1})))
+    else:
+        n = TesseractOcrSource._page_count(path)
+        pages = DEFAULT_OCR_SOURCE._render(path, RENDER_DPI, sorted({0, n - 1}))
+    return [prep(p).convert("L") for p in pages]
+
+
+def regions(doc: int, pages: Sequence[Any]) -> List[Region]:
+    first, last = pages[0], pages[-1]
+    if len(pages) == 1 and HEADER_FRAC + TOTALS_FRAC >= 1:
+        return [Region(doc, 0, first)]
+    w, h = first.size
+    out = [Region(doc, 0, first.crop((0, 0, w, int(h * HEADER_FRAC))))]
+    w, h = last.size
+    out.append(Region(doc, 1, last.crop((0, int(h * (1 - TOTALS_FRAC)), w, h))))
+    return out
+
+
+def tile(regs: Sequence[Region]) -> List[Sheet]:
+    """Apila los recortes en hojas de hasta MAX_SHEET_PX de alto, con GUTTER_PX entre ellos."""
+    from PIL import Image
+    sheets: List[Sheet] = []; group: List[Region] = []; height = 0
+
+    def flush() -> None:
+        if not group: return
+        width = max(r.img.size[0] for r in group)
+        canvas = Image.new("L", (width, height), 255)
+        tops = []; y = 0
+        for r in group:
+            canvas.paste(r.img, (0, y)); tops.append(y); y += r.img.size[1] + GUTTER_PX
+        sheets.append(Sheet(canvas, tops, list(group)))
+
+    for r in regs:
+        need = r.img.size[1] + GUTTER_PX
+        if group and height + need > MAX_SHEET_PX:
+            flush(); group = []; height = 0
+        group.append(r); height += need
+    flush()
+    return sheets
+
+
+def read_sheet(sheet: Sheet, timeout: Optional[float] = None,
+               ocr_source: TesseractOcrSource = DEFAULT_OCR_SOURCE) -> Dict[Tuple[int, int], List[Tuple[int, str, float]]]:
+    """Una llamada a Tesseract -> {(factura, página): [(y, renglón, confianza)]}."""
+    pytesseract = _optional("pytesseract")
+    kw = _timeout_kw(timeout)
+    data = pytesseract.image_to_data(sheet.img, output_type=pytesseract.Output.DICT, lang=ocr_source.lang, **kw)
+    lines: Dict[Tuple[int, int, int, int], List[Tuple[int, int, str, float]]] = {}
+    for i in range(len(data["text"])):
+        c = float(data["conf"][i]); t = data["text"][i].strip()
+        if c < 0 or not t: continue
+        mid = data["top"][i] + data["height"][i] // 2
+        slot = bisect.bisect_right(sheet.tops, mid) - 1
+        if slot < 0: continue
+        key = (slot, data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(key, []).append((data["top"][i] - sheet.tops[slot], data["left"][i], t, c))
+    out: Dict[Tuple[int, int], List[Tuple[int, str, float]]] = {}
+    for (slot, *_), words in lines.items():
+        words.sort(key=lambda w: w[1])
+        text = norm_line(" ".join(w[2] for w in words))
+        if not text: continue
+        r = sheet.slots[slot]
+        out.setdefault((r.doc, r.page), []).append(
+            (min(w[0] for w in words), text, round(sum(w[3] for w in words) / len(words), 1)))
+    return out
+
+
+def batch_lines(paths: Sequence[str], preprocess: Optional[Callable] = None,
+                deadline: Optional[Deadline] = None) -> List[Optional[LineIndex]]:
+    """
+    Líneas de cabecera + totales de cada escaneo, con una llamada a Tesseract por hoja compuesta.
+    None en las facturas que no se pudieron leer (o si venció el plazo): van por el OCR completo.
+    """
+    if _optional("pytesseract") is None or _optional("PIL") is None:
+        return [None] * len(paths)
+    regs: List[Region] = []; n_regions = [0] * len(paths)
+    for doc, path in enumerate(paths):
+        if expired(deadline): break
+        try:
+            mine = regions(doc, _pages(path, preprocess))
+        except Exception:
+            continue
+        regs.extend(mine); n_regions[doc] = len(mine)
+    found: Dict[Tuple[int, int], List[Tuple[int, str, float]]] = {}
+    for sheet in tile(regs):
+        if expired(deadline):
+            return [None] * len(paths)
+        try:
+            found.update(read_sheet(sheet, timeout=deadline.remaining() if deadline else None))
+        except Exception:
+            return [None] * len(paths)
+    out: List[Optional[LineIndex]] = []
+    for doc in range(len(paths)):
+        if not n_regions[doc]:
+            out.append(None); continue
+        li = LineIndex(source="ocr", conf=[], page_starts=[])
+        for page in range(n_regions[doc]):
+            li.page_starts.append(len(li))
+            for _, text, conf in sorted(found.get((doc, page), ())):
+                li.append(text); li.conf.append(conf)
+        out.append(li)
+    return out
@@ -0,0 +1,182 @@
+# ocr_preprocess.py
+# Preprocesado de la página antes de Tesseract, vectorizado sobre arrays NumPy:
+#   escala de grises -> recorte de bordes (márgenes vacíos / borde negro del escáner)
+#   -> enderezado (ángulo por perfil de proyección) -> reducción al tamaño de letra efectivo
+#   -> binarización adaptativa (media local con imagen integral).
+# Rotación y escalado los hace PIL (C); el análisis es NumPy. Sin NumPy la imagen pasa tal cual.
+# Configurable por proveedor en vendors.yaml:
+#   PIRELLI:
+#     ocr: {deskew: false, target_line_px: 36}
+import hashlib
+import json
+from typing import Any, Dict, Optional, Tuple
+
+from extraction_core import _optional
+
+DEFAULTS: Dict[str, Any] = {
+    "enabled": True,
+    "crop": True,
+    "deskew": True,
+    "downsample": True,
+    "binarize": True,
+    "max_skew": 5.0,        # grados, a cada lado
+    "skew_step": 0.25,
+    "target_line_px": 40,   # alto de renglón (px) con el que mejor anda Tesseract; sólo se achica
+    "min_scale": 0.5,
+    "block": 31,            # ventana de la binarización adaptativa (px, impar)
+    "offset": 12,           # cuánto más oscuro que la media local tiene que ser un pixel de texto
+}
+SKEW_SAMPLE = 200_000       # pixeles de tinta usados para estimar el ángulo
+
+
+def to_gray(img):
+    """PIL -> PIL modo L (luma BT.601; la conversión de PIL es C y evita un float32 de la página)."""
+    return img if img.mode == "L" else img.convert("RGB").convert("L")
+
+
+def otsu(np, hist) -> int:
+    """Umbral global de Otsu sobre el histograma de 256 niveles (para análisis, no para la salida)."""
+    hist = np.asarray(hist, dtype=np.float64)
+    w0 = np.cumsum(hist); w1 = w0[-1] - w0
+    mu = np.cumsum(hist * np.arange(256))
+    m0 = mu / np.maximum(w0, 1); m1 = (mu[-1] - mu) / np.maximum(w1, 1)
+    return int(np.argmax(w0 * w1 * (m0 - m1) ** 2))
+
+
+def _edge_trim(np, dark) -> Tuple[int, int]:
+    """(inicio, fin) sin las corridas de filas / columnas oscuras pegadas al borde."""
+    ok = np.flatnonzero(~dark)
+    return (int(ok[0]), int(ok[-1]) + 1) if len(ok) else (0, len(dark))
+
+
+def crop_box(np, ink, margin: int = 8) -> Tuple[int, int, int, int]:
+    """
+    (top, bottom, left, right) del contenido: primero saca el borde negro del escáner (filas /
+    columnas de borde casi llenas), después los márgenes vacíos, dejando `margin` px de aire.
+    """
+    top, bottom = _edge_trim(np, ink.mean(axis=1) > 0.6)
+    left, right = _edge_trim(np, ink.mean(axis=0) > 0.6)
+    inner = ink[top:bottom, left:right]
+    r = np.flatnonzero(inner.mean(axis=1) > 0.002)
+    c = np.flatnonzero(inner.mean(axis=0) > 0.002)
+    if not len(r) or not len(c):
+        return top, bottom, left, right
+    return (top + max(0, int(r[0]) - margin), top + min(bottom - top, int(r[-1]) + 1 + margin),
+            left + max(0, int(c[0]) - margin), left + min(right - left, int(c[-1]) + 1 + margin))
+
+
+def _profiles(np, ys, xs, angles):
+    """Perfiles horizontales (filas con tinta) para cada ángulo: una matriz y un solo bincount."""
+    t = np.tan(np.radians(angles))[:, None]
+    rows = np.rint(ys[None, :] - xs[None, :] * t).astype(np.int64)
+    rows -= rows.min()
+    span = int(rows.max()) + 1
+    return np.bincount((rows + np.arange(len(angles))[:, None] * span).ravel(),
+                       minlength=len(angles) * span).reshape(len(angles), span).astype(np.float64)
+
+
+def estimate_skew(np, ink, max_deg: float, step: float) -> Tuple[float, Any]:
+    """
+    (ángulo en grados, perfil horizontal a ese ángulo). El ángulo es el que maximiza la nitidez
+    del perfil: derecho, los renglones caen en pocas filas. Primero de a 1 grado y después fino
+    alrededor del mejor, sobre una muestra de pixeles de tinta.
+    """
+    ys, xs = np.nonzero(ink)
+    if len(ys) < 500:
+        return 0.0, ink.sum(axis=1)
+    if len(ys) > SKEW_SAMPLE:
+        idx = np.linspace(0, len(ys) - 1, SKEW_SAMPLE).astype(np.int64)
+        ys = ys[idx]; xs = xs[idx]
+    best = 0.0
+    for angles in (np.arange(-max_deg, max_deg + 0.5, 1.0), None):
+        if angles is None:
+            angles = np.arange(best - 1.0, best + 1.0 + step / 2, step)
+        prof = _profiles(np, ys, xs, angles)
+        k = int(np.argmax((np.diff(prof, axis=1) ** 2).sum(axis=1)))
+        best = float(angles[k])
+    return best, prof[k]
+
+
+def line_height(np, profile) -> Optional[float]:
+    """Alto mediano de renglón (px) a partir de las corridas de filas con tinta del perfil."""
+    if not len(profile) or profile.max() <= 0: return None
+    rows = profile > 0.05 * profile.max()
+    edges = np.diff(np.r_[0, rows.astype(np.int8), 0])
+    starts = np.flatnonzero(edges == 1); ends = np.flatnonzero(edges == -1)
+    runs = ends - starts
+    runs = runs[runs >= 4]  # líneas de tabla / ruido
+    return float(np.median(runs)) if len(runs) else None
+
+
+def adaptive_binarize(np, gray, block: int, offset: int):
+    """
+    Pixel de texto si es `offset` más oscuro que la media de su ventana block x block.
+    Imagen integral sobre la página con borde replicado: O(N) sin importar el tamaño de ventana.
+    uint32 alcanza aunque la integral desborde: la suma de una ventana (<= block² * 255) se recupera
+    bien en aritmética módulo 2**32.
+    """
+    r = block // 2
+    p = np.pad(gray, ((r + 1, r), (r + 1, r)), mode="edge").astype(np.uint32)
+    p[0, :] = 0; p[:, 0] = 0
+    ii = p.cumsum(0, dtype=np.uint32).cumsum(1, dtype=np.uint32)
+    sums = ii[block:, block:] - ii[:-block, block:] - ii[block:, :-block] + ii[:-block, :-block]
+    area = block * block
+    return np.where(gray.astype(np.int64) * area + offset * area < sums.astype(np.int64), 0, 255).astype(np.uint8)
+
+
+class OcrPreprocess:
+    """Preprocesado configurable; se llama con una imagen PIL y devuelve otra (modo L)."""
+
+    def __init__(self, **opts: Any):
+        self.opts = dict(DEFAULTS)
+        self.opts.update({k: v for k, v in opts.items() if k in DEFAULTS})
+
+    @classmethod
+    def from_config(cls, cfg: Optional[Dict[str, Any]]) -> "OcrPreprocess":
+        return cls(**(cfg or {}))
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.opts["enabled"]) and _optional("numpy") is not None
+
+    def key(self) -> str:
+        """Firma de la configuración (para la caché de texto: otro preprocesado -> otro OCR)."""
+        if not self.enabled: return "raw"
+        blob = json.dumps(self.opts, sort_keys=True).encode("utf-8")
+        return hashlib.sha1(blob).hexdigest()[:10]
+
+    def analyze(self, img) -> Dict[str, Any]:
+        """Medidas sin modificar la imagen: recorte, ángulo, alto de renglón, escala."""
+        np = _optional("numpy"); o = self.opts
+        gray = to_gray(img)
+        a = np.asarray(gray)
+        ink = a < otsu(np, gray.histogram())
+        box = crop_box(np, ink) if o["crop"] else (0, a.shape[0], 0, a.shape[1])
+        ink = ink[box[0]:box[1], box[2]:box[3]]
+        if o["deskew"]:
+            angle, profile = estimate_skew(np, ink, o["max_skew"], o["skew_step"])
+        else:
+            angle, profile = 0.0, ink.sum(axis=1)
+        lh = line_height(np, profile)
+        scale = 1.0
+        if o["downsample"] and lh and lh > o["target_line_px"] * 1.25:
+            scale = max(o["min_scale"], o["target_line_px"] / lh)
+        return {"gray": gray, "box": box, "angle": angle, "line_px": lh, "scale": scale}
+
+    def __call__(self, img):
+        if not self.enabled:
+            return img
+        from PIL import Image
+        np = _optional("numpy"); o = self.opts
+        a = self.analyze(img)
+        top, bottom, left, right = a["box"]
+        out = a["gray"].crop((left, top, right, bottom))
+        if abs(a["angle"]) >= o["skew_step"]:
+            # renglones con pendiente tan(angle) (y crece hacia abajo) -> PIL rota angle antihorario
+            out = out.rotate(a["angle"], resample=Image.BICUBIC, expand=True, fillcolor=255)
+        if a["scale"] < 1.0:
+            out = out.resize((max(1, int(out.width * a["scale"])), max(1, int(out.height * a["scale"]))),
+                             Image.LANCZOS)
+        if o["binarize"]:
+            out = Image.fromarray(adaptive_binarize(np, np.asarray(out), int(o["block"]) | 1, int(o["offset"])))
+        return out
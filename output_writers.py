@@ -0,0 +1,257 @@
+# output_writers.py
+# Serializa el payload minimal a JSON / KV / INI.
+# Las plantillas se arman una sola vez al importar; los bytes de KV e INI
+# son idénticos a los que generaba server.py (los consumen clientes VB6).
+import csv
+import io
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from patterns import RE_KV_CLEAN
+
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+# Orden clásico de tasas comunes (KV e INI)
+IVA_ORDER = ("27", "21", "10.5", "5", "2.5")
+_IVA_RANK = {k: i for i, k in enumerate(IVA_ORDER)}
+
+_CLEAN_CHARS = frozenset("\r\n=")
+
+# ---- Plantillas KV ----
+_KV_HEAD = (
+    "status=ok\n"
+    "version=1\n"
+    "numero={0}\n"
+    "fecha={1}\n"
+    "cuit={2}\n"
+    "subtotal={3}\n"
+    "total={4}\n"
+    "iva_count={5}"
+).format
+_KV_IVA = "\niva_{0}_tasa={1}\niva_{0}_monto={2}".format
+_KV_PERC_COUNT = "\npercepciones_count={0}".format
+_KV_PERC = "\npercepciones_{0}_clave={1}\npercepciones_{0}_monto={2}".format
+_KV_RET_COUNT = "\nretenciones_count={0}".format
+_KV_RET = "\nretenciones_{0}_clave={1}\nretenciones_{0}_monto={2}".format
+_KV_DUP = "\nduplicado=1\nduplicado_id={0}\nduplicado_recibido={1}".format
+_KV_PARTIAL = "\nparcial=1\nparcial_etapa={0}".format
+_KV_OCR_PENDING = "\nocr_pendiente={0}".format
+_KV_REPAIRED = "\ntotales_reparados=1\ntotales_leido_total={0}".format
+
+# ---- Plantillas INI ----
+_INI_HEAD = (
+    "[meta]\n"
+    "status=ok\n"
+    "version=1\n"
+    "\n"
+    "[factura]\n"
+    "numero={0}\n"
+    "fecha={1}\n"
+    "cuit={2}\n"
+    "total={3}\n"
+    "\n"
+    "[iva]"
+).format
+
+# Separador entre registros en respuestas batch
+BATCH_SEPARATORS = {"kv": "\n\n", "ini": "\n"}
+
+
+def num(v) -> str:
+    try:
+        return str(float(v))
+    except Exception:
+        return "0"
+
+
+def clean(s) -> str:
+    s = str(s)
+    if _CLEAN_CHARS.isdisjoint(s):
+        return s.strip()
+    return RE_KV_CLEAN.sub(" ", s).strip()
+
+
+def _nonzero_items(d: Dict[str, Any]) -> List[Tuple[Any, float]]:
+    items = []
+    for k, v in d.items():
+        if v:
+            f = float(v)
+            if f != 0.0:
+                items.append((k, f))
+    return items
+
+
+def to_kv(minimal: Dict[str, Any]) -> str:
+    """
+    Payload minimal -> key=value por líneas, con contadores + claves indexadas.
+    """
+    iva_items = [(str(k), f) for k, f in _nonzero_items(minimal.get("iva") or {})]
+    iva_items.sort(key=lambda x: (_IVA_RANK.get(x[0], 999), x[0]))
+    parts = [_KV_HEAD(
+        minimal.get('numero', ''), minimal.get('fecha', ''), minimal.get('cuit', ''),
+        num(minimal.get('subtotal', 0)), num(minimal.get('total', 0)), len(iva_items),
+    )]
+    for i, (rate, monto) in enumerate(iva_items, start=1):
+        parts.append(_KV_IVA(i, clean(rate), str(monto)))
+
+    perc_items = _nonzero_items(minimal.get("percepciones") or {})
+    perc_items.sort(key=lambda x: x[0])
+    parts.append(_KV_PERC_COUNT(len(perc_items)))
+    for i, (name, monto) in enumerate(perc_items, start=1):
+        parts.append(_KV_PERC(i, name, str(monto)))
+
+    ret_items = _nonzero_items(minimal.get("retenciones") or {})
+    ret_items.sort(key=lambda x: x[0])
+    parts.append(_KV_RET_COUNT(len(ret_items)))
+    for i, (name, monto) in enumerate(ret_items, start=1):
+        parts.append(_KV_RET(i, name, str(monto)))
+
+    meta = minimal.get("_meta") or {}
+    dup = meta.get("duplicado")
+    if dup:
+        parts.append(_KV_DUP(dup.get("id", ""), dup.get("recibido", "")))
+    if meta.get("partial"):
+        parts.append(_KV_PARTIAL(meta.get("partial_stage", "")))
+        if meta.get("ocr_pending"):
+            parts.append(_KV_OCR_PENDING(meta["ocr_pending"]))
+    if meta.get("repaired"):
+        parts.append(_KV_REPAIRED(num((meta["repaired"].get("antes") or {}).get("total") or 0)))
+
+    return "".join(parts)
+
+
+def to_ini(minimal: Dict[str, Any]) -> str:
+    """
+    Alternativa INI por secciones.
+    """
+    out: List[str] = [_INI_HEAD(
+        minimal.get('numero', ''), minimal.get('fecha', ''), minimal.get('cuit', ''),
+        num(minimal.get('total', 0)),
+    )]
+    iva = minimal.get("iva") or {}
+    for r in IVA_ORDER:
+        if r in iva:
+            f = float(iva[r])
+            if f != 0.0:
+                out.append(f"{r}={f}")
+    # tasas “no estándar” que aparezcan
+    for k, v in iva.items():
+        if k not in _IVA_RANK:
+            f = float(v)
+            if f != 0.0:
+                out.append(f"{clean(k)}={f}")
+    out.append("\n[percepciones]")
+    for k, f in sorted(_nonzero_items(minimal.get("percepciones") or {}), key=lambda x: x[0]):
+        out.append(f"{k}={f}")
+    out.append("\n[retenciones]")
+    for k, f in sorted(_nonzero_items(minimal.get("retenciones") or {}), key=lambda x: x[0]):
+        out.append(f"{k}={f}")
+    meta = minimal.get("_meta") or {}
+    dup = meta.get("duplicado")
+    if dup:
+        out += ["", "[duplicado]", f"id={dup.get('id', '')}", f"recibido={dup.get('recibido', '')}"]
+    if meta.get("partial"):
+        out += ["", "[parcial]", f"etapa={meta.get('partial_stage', '')}"]
+        if meta.get("ocr_pending"):
+            out.append(f"ocr_pendiente={meta['ocr_pending']}")
+    if meta.get("repaired"):
+        before = meta["repaired"].get("antes") or {}
+        out += ["", "[totales_reparados]"] + [f"{k}_leido={num(before.get(k) or 0)}" for k in
+                                              ("subtotal", "iva", "percepciones_total", "total")]
+    out.append("")
+    return "\n".join(out)
+
+
+def _json_std(content: Any) -> bytes:
+    # Mismos parámetros que starlette.responses.JSONResponse.render
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def to_json_bytes(content: Any) -> bytes:
+    """JSON compacto en UTF-8. Usa orjson si está instalado; si no (o si falla), json estándar."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(content)
+        except (TypeError, orjson.JSONEncodeError):
+            pass
+    return _json_std(content)
+
+
+WRITERS = {"kv": to_kv, "ini": to_ini}
+
+
+def render(minimal: Dict[str, Any], fmt: str) -> bytes:
+    if fmt in WRITERS:
+        return WRITERS[fmt](minimal).encode("utf-8")
+    return to_json_bytes(minimal)
+
+
+def iter_batch(records: Iterable[Dict[str, Any]], fmt: str) -> Iterator[bytes]:
+    """
+    Serializa una secuencia de payloads a medida que se producen (para StreamingResponse).
+    json -> array JSON; kv / ini -> registros separados por línea en blanco.
+    """
+    if fmt in WRITERS:
+        writer = WRITERS[fmt]
+        sep = BATCH_SEPARATORS[fmt].encode("utf-8")
+        first = True
+        for rec in records:
+            if not first:
+                yield sep
+            first = False
+            yield writer(rec).encode("utf-8")
+        return
+    yield b"["
+    first = True
+    for rec in records:
+        if not first:
+            yield b","
+        first = False
+        yield to_json_bytes(rec)
+    yield b"]"
+
+
+# ---- Exportación de resultados (results_store) ----
+RESULT_COLUMNS = ("id", "extraido", "archivo", "vendor", "tipo", "numero", "fecha", "cuit", "cae",
+                  "validado", "subtotal", "total")
+EXPORT_CHUNK = 500  # filas por bloque de bytes
+
+
+def result_columns(tax_fields: Iterable[str]) -> List[str]:
+    """Columnas planas: cabecera, IVA por tasa (IVA_ORDER + otros) y un tributo por columna."""
+    return [*RESULT_COLUMNS, *(f"iva_{r}" for r in IVA_ORDER), "iva_otros", *tax_fields]
+
+
+def result_row(entry: Dict[str, Any], tax_fields: Iterable[str]) -> List[Any]:
+    iva = entry.get("iva") or {}
+    otros = round(sum(float(v) for k, v in iva.items() if k not in _IVA_RANK), 2)
+    taxes = dict(entry.get("percepciones") or {}, **(entry.get("retenciones") or {}))
+    return [*(entry.get(c, "") for c in RESULT_COLUMNS), *(iva.get(r, "") for r in IVA_ORDER),
+            otros or "", *(taxes.get(k, "") for k in tax_fields)]
+
+
+def iter_csv(entries: Iterable[Dict[str, Any]], tax_fields: List[str]) -> Iterator[bytes]:
+    """CSV (UTF-8, coma, punto decimal) con una fila por resultado, de a EXPORT_CHUNK filas."""
+    buf = io.StringIO(); w = csv.writer(buf, lineterminator="\r\n")
+    w.writerow(result_columns(tax_fields))
+    n = 0
+    for entry in entries:
+        w.writerow(result_row(entry, tax_fields)); n += 1
+        if n % EXPORT_CHUNK == 0:
+            yield buf.getvalue().encode("utf-8"); buf.seek(0); buf.truncate()
+    yield buf.getvalue().encode("utf-8")
+
+
+def iter_jsonl(entries: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    """Un resultado JSON por línea, de a EXPORT_CHUNK líneas."""
+    chunk: List[bytes] = []
+    for entry in entries:
+        chunk.append(to_json_bytes(entry))
+        if len(chunk) >= EXPORT_CHUNK:
+            yield b"\n".join(chunk) + b"\n"; chunk = []
+    if chunk:
+        yield b"\n".join(chunk) + b"\n"
@@ -0,0 +1,55 @@
+# overload.py
+# Modo degradado: con el servidor saturado los PDFs escaneados no toman un worker para OCR;
+# se contesta con lo que dé la capa de texto / QR y el OCR queda diferido (deferred_ocr.py).
+# Señales: pedidos esperando en el planificador y carga de CPU (load average de 1 minuto por CPU;
+# en Windows no hay load average y manda sólo la cola).
+# Histéresis: entra al pasar cualquiera de los umbrales altos; sale cuando cola y CPU están bajo
+# los umbrales bajos durante hold_s seguidos (así no oscila con cada pedido).
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+def cpu_load() -> float:
+    """Load average de 1 minuto por CPU (0.0 si el sistema no lo da)."""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return 0.0
+
+
+class LoadGovernor:
+    def __init__(self, queue_depth: Callable[[], int], queue_high: int, queue_low: int,
+                 cpu_high: float = 0.0, cpu_low: float = 0.0, hold_s: float = 10.0,
+                 cpu: Callable[[], float] = cpu_load):
+        """cpu_high = 0 ignora la CPU."""
+        self.queue_depth = queue_depth
+        self.queue_high = queue_high; self.queue_low = min(queue_low, queue_high)
+        self.cpu_high = cpu_high; self.cpu_low = min(cpu_low, cpu_high)
+        self.hold_s = hold_s
+        self.cpu = cpu
+        self._lock = threading.Lock()
+        self._degraded = False
+        self._calm_since: Optional[float] = None
+        self.entered = 0  # veces que entró en modo degradado
+
+    def degraded(self) -> bool:
+        q = self.queue_depth()
+        load = self.cpu() if self.cpu_high else 0.0
+        now = time.monotonic()
+        with self._lock:
+            if not self._degraded:
+                if q >= self.queue_high or (self.cpu_high and load >= self.cpu_high):
+                    self._degraded = True; self._calm_since = None; self.entered += 1
+            elif q > self.queue_low or (self.cpu_high and load > self.cpu_low):
+                self._calm_since = None
+            elif self._calm_since is None:
+                self._calm_since = now
+            elif now - self._calm_since >= self.hold_s:
+                self._degraded = False
+            return self._degraded
+
+    def state(self) -> Dict[str, Any]:
+        return {"degraded": self._degraded, "entered": self.entered, "queue": self.queue_depth(),
+                "cpu": round(self.cpu(), 2) if self.cpu_high else None}
@@ -0,0 +1,153 @@
+# patterns.py
+# Registro central de expresiones regulares: todo se compila una vez al importar.
+# Lo que necesita ignorar mayúsculas usa re.I acá, así los helpers no copian cada línea con .upper().
+# Texto de OCR no confiable: las reglas "A.*B.*C" se evalúan como cadenas de búsquedas (lineal),
+# las líneas se recortan a MAX_LINE y las evaluaciones que pasan el presupuesto se cuentan.
+import re
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Pattern, Sequence, Tuple
+
+# Grupos atómicos / cuantificadores posesivos: Python 3.11+
+_POSSESSIVE = "+" if sys.version_info >= (3, 11) else ""
+
+# ---- Texto / números ----
+RE_WS = re.compile(r'\s+')
+RE_CURRENCY = re.compile(r'[$]')
+RE_NUM_STRIP = re.compile(r'[^0-9,.\-]')
+RE_DEC_TAIL = re.compile(r'[.,]\d{2}$')
+RE_SEP = re.compile(r'[.,]')
+RE_NON_DIGIT = re.compile(r'\D')
+
+NUM_PURE = re.compile(r'^\s*-?\s*\d{1,3}(?:[.,]\d{3})*(?:[.,]\d{2})\s*$')
+NUM_ANY = re.compile(r'[-]?\d{1,3}(?:[.,]\d{3})*(?:[.,]\d{2})|[-]?\d+(?:[.,]\d{2})')
+
+# ---- Cabecera ----
+RE_CUIT = re.compile(r'\b\d{2}[- ]?\d{7,8}[- ]?\d\b')
+RE_FECHA = re.compile(r'\b(?:\d{2}[\/\-\.]\d{2}[\/\-\.]\d{2,4}|\d{4}[\/\-]\d{2}[\/\-]\d{2})(?:\s+' + _POSSESSIVE +
+                      r'\d{1,2}:\d{1,2}:\d{1,2})?\b')
+RE_NUM_FACT = re.compile(r'\b\d{4}-\d{8}\b')
+RE_CAE = re.compile(r'\b\d{14}\b', re.ASCII)
+RE_FACTURA_TIPO = re.compile(r'\bFactura\s*([ABC])\b', re.I)
+RE_TIPO_SOLO = re.compile(r'[ABC]', re.I)
+RE_CLIENTE_HINT = re.compile(r'(ALVAREZ|NEUM[AÁ]TIC|S\.A\.|SRL|RESPONSABLE|CLIENTE)', re.I)
+RE_PROV_GUERRINI = re.compile(r'GUERRINI\s+NEUM[AÁ]TICOS?\s*S\.?A\.?', re.I)
+RE_PROV_PIRELLI = re.compile(r'PIRELLI\s+NEUM[AÁ]TICOS?\s*S\.?A\.?I\.?C\.?', re.I)
+RE_COPIA = re.compile(r'\b(ORIGINAL|DUPLICADO|TRIPLICADO|CUADRUPLICADO)\b', re.I)
+
+# ---- Fechas ----
+RE_DATE_DMY = re.compile(r'(\d{2})[\/\-.](\d{2})[\/\-.](\d{4})')
+RE_DATE_YMD = re.compile(r'(\d{4})[\/\-](\d{2})[\/\-](\d{2})')
+
+# ---- Totales (handlers) ----
+RE_SUBTOTAL_WORD = re.compile(r'\bSUBTOTAL\b', re.I)
+RE_TOTAL_WORD = re.compile(r'\bTOTAL\b', re.I)
+RE_IVA_RATE = re.compile(r'IVA\s*([\d]{1,2}(?:[.,]\d{1,2})?)', re.I)
+
+# ---- QR AFIP (RG 4892) ----
+RE_QR_URL = re.compile(r'https?://(?:www\.)?(?:afip|arca)\.gob\.ar/fe/qr/?\?p=([A-Za-z0-9+/=_\-%]+)', re.I)
+
+# ---- Salida KV / INI ----
+RE_KV_CLEAN = re.compile(r"[\r\n=]+")
+
+
+# ---- Ejecución protegida (ReDoS) ----
+MAX_LINE = 1024            # más que esto es basura de OCR: se evalúa sólo el principio de la línea
+MATCH_BUDGET_S = 0.005     # una línea contra todas las reglas; lineal sobre MAX_LINE ronda 1-2 ms
+SLOW_MATCHES: Counter = Counter()   # evaluaciones lentas por conjunto de reglas (ver budget())
+
+
+def clip(s: str) -> str:
+    return s if len(s) <= MAX_LINE else s[:MAX_LINE]
+
+
+@contextmanager
+def budget(name: str, seconds: float = MATCH_BUDGET_S) -> Iterator[None]:
+    """Cuenta en SLOW_MATCHES[name] los bloques que tardan más que `seconds`."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        if time.perf_counter() - t0 > seconds:
+            SLOW_MATCHES[name] += 1
+
+
+def _split_top(pattern: str, sep: str) -> List[str]:
+    """Parte el patrón en `sep` ('|' o '.*') sólo a nivel 0: fuera de grupos, clases y escapes."""
+    parts: List[str] = []; buf: List[str] = []
+    depth = 0; in_class = False; i = 0; n = len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == '\\':
+            buf.append(pattern[i:i + 2]); i += 2; continue
+        if in_class:
+            if c == ']': in_class = False
+        elif c == '[':
+            in_class = True
+            if pattern[i + 1:i + 2] == ']':  # ']' literal al principio de la clase
+                buf.append('[]'); i += 2; continue
+        elif c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+        elif depth == 0 and pattern.startswith(sep, i):
+            parts.append(''.join(buf)); buf = []; i += len(sep)
+            if sep == '.*' and pattern[i:i + 1] in ('?', '+'): i += 1  # .*? / .*+ valen lo mismo acá
+            continue
+        buf.append(c); i += 1
+    parts.append(''.join(buf))
+    return parts
+
+
+class ChainPattern:
+    """
+    Equivalente booleano de re.search para reglas "A.*B.*C" (con alternativas '|' a nivel 0):
+    se busca A, después B desde donde terminó A, etc. Cada tramo es un patrón simple y se
+    recorre la línea una vez por tramo, sin el backtracking cúbico de los .* anidados.
+    """
+    __slots__ = ("pattern", "alts")
+
+    def __init__(self, pattern: str, flags: int = 0):
+        self.pattern = pattern
+        self.alts = [[re.compile(seg, flags) for seg in _split_top(alt, '.*')]
+                     for alt in _split_top(pattern, '|')]
+
+    def search(self, s: str) -> bool:
+        for segs in self.alts:
+            pos = 0
+            for seg in segs:
+                m = seg.search(s, pos)
+                if m is None: break
+                pos = m.end()
+            else:
+                return True
+        return False
+
+
+class RuleSet:
+    """Reglas (patrón, clave) en orden; first() devuelve la clave de la primera que matchea."""
+
+    def __init__(self, name: str, rules: Sequence[Tuple[str, str]]):
+        self.name = name
+        self.rules: List[Tuple[ChainPattern, str]] = [(ChainPattern(p, re.I), key) for p, key in rules]
+
+    def __iter__(self):
+        return iter(self.rules)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def first(self, text: str) -> Optional[str]:
+        text = clip(text)
+        with budget(self.name):
+            for pattern, key in self.rules:
+                if pattern.search(text):
+                    return key
+        return None
+
+
+def compile_rules(rules: Sequence[Tuple[str, str]], name: str = "rules") -> RuleSet:
+    """(patrón, clave) -> RuleSet (re.I, ejecución protegida), respetando el orden."""
+    return RuleSet(name, rules)
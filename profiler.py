@@ -0,0 +1,290 @@
+# profiler.py
+# Diagnóstico en producción (endpoints /admin del servidor):
+# - StackSampler: muestreo de pilas en Python puro (sys._current_frames cada `interval`), sin
+#   dependencias; salida "collapsed" (flamegraph.pl, speedscope) o JSON de speedscope.
+# - Muestreo del pool: el servidor deja un pedido en PROFILE_DIR/request.json y cada worker
+#   (hilo watch_requests, arrancado en jobs.init_worker) muestrea sus propios hilos hasta `until`
+#   y escribe <id>-<pid>.collapsed; collect() junta los archivos. No ocupa ningún worker.
+# - StageClock / slow_capture: tiempos por etapa de cada extracción y cProfile de una muestra
+#   (profile_rate); si pasa del umbral queda en SlowLog (SQLite, anillo de `max_entries`) con hash
+#   del PDF, proveedor y fuente. Un solo cProfile activo por proceso: desde Python 3.12 un segundo
+#   enable() en otro hilo falla ("Another profiling tool is already active"), así que la extracción
+#   concurrente sale sólo con tiempos por etapa.
+import cProfile
+import json
+import marshal
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from text_cache import file_hash
+
+INTERVAL_S = 0.005
+WATCH_POLL_S = 0.5
+COLLECT_GRACE_S = 2.0
+MAX_DEPTH = 128
+
+_PROFILING = threading.Lock()  # cProfile activo en este proceso
+
+
+def _label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+
+
+class StackSampler:
+    """Cuenta pilas (raíz;...;hoja) de todos los hilos del proceso salvo el propio."""
+
+    def __init__(self, interval: float = INTERVAL_S, skip: Optional[set] = None):
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self._skip = set(skip or ())
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self) -> None:
+        for tid, frame in sys._current_frames().items():
+            if tid in self._skip: continue
+            stack: List[str] = []
+            while frame is not None and len(stack) < MAX_DEPTH:
+                stack.append(_label(frame.f_code)); frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self) -> None:
+        self._skip.add(threading.get_ident())
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> "StackSampler":
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread is not None: self._thread.join()
+        return self.counts
+
+
+def sample(seconds: float, interval: float = INTERVAL_S) -> Counter:
+    """Muestrea este proceso durante `seconds` (servidor sin pool de workers)."""
+    s = StackSampler(interval, skip={threading.get_ident()}).start()
+    time.sleep(seconds)
+    return s.stop()
+
+
+def collapsed(counts: Counter) -> str:
+    return "".join(f"{stack} {n}\n" for stack, n in counts.most_common())
+
+
+def speedscope(counts: Counter, name: str, interval: float = INTERVAL_S) -> Dict[str, Any]:
+    frames: List[Dict[str, Any]] = []; index: Dict[str, int] = {}
+    samples: List[List[int]] = []; weights: List[float] = []
+    for stack, n in counts.most_common():
+        ids = []
+        for label in stack.split(";"):
+            if label not in index:
+                index[label] = len(frames)
+                fn, _, loc = label.partition(" (")
+                file, _, line = loc.rstrip(")").rpartition(":")
+                frames.append({"name": fn, "file": file, "line": int(line) if line.isdigit() else None})
+            ids.append(index[label])
+        samples.append(ids); weights.append(round(n * interval * 1000, 3))
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name, "exporter": "factura-extractor",
+        "shared": {"frames": frames},
+        "profiles": [{"type": "sampled", "name": name, "unit": "milliseconds", "startValue": 0,
+                      "endValue": round(sum(weights), 3), "samples": samples, "weights": weights}],
+    }
+
+
+# ---- muestreo del pool (pedido por archivo) ----
+def _write_atomic(path: str, data: str) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f: f.write(data)
+    os.replace(tmp, path)
+
+
+def request_profile(control_dir: str, seconds: float, interval: float = INTERVAL_S) -> str:
+    os.makedirs(control_dir, exist_ok=True)
+    req_id = uuid.uuid4().hex[:12]
+    _write_atomic(os.path.join(control_dir, "request.json"),
+                  json.dumps({"id": req_id, "until": time.time() + seconds, "interval": interval}))
+    return req_id
+
+
+def collect(control_dir: str, req_id: str, seconds: float, expect: int) -> Counter:
+    """Espera los archivos de `expect` workers (o hasta seconds + gracia) y suma las pilas."""
+    end = time.time() + seconds + COLLECT_GRACE_S
+    time.sleep(seconds)
+    mine = lambda: [f for f in os.listdir(control_dir) if f.startswith(req_id + "-") and f.endswith(".collapsed")]
+    while len(mine()) < expect and time.time() < end:
+        time.sleep(0.1)
+    total: Counter = Counter()
+    for name in mine():
+        path = os.path.join(control_dir, name)
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                stack, _, n = line.rstrip("\n").rpartition(" ")
+                if stack and n.isdigit(): total[stack] += int(n)
+        try: os.remove(path)
+        except OSError: pass
+    return total
+
+
+def watch_requests(control_dir: str) -> None:
+    """En cada worker: hilo que atiende los pedidos de muestreo de request_profile."""
+    os.makedirs(control_dir, exist_ok=True)
+    path = os.path.join(control_dir, "request.json")
+    start_mtime = os.stat(path).st_mtime if os.path.exists(path) else 0.0
+
+    def loop() -> None:
+        seen = None; mtime = start_mtime  # un pedido anterior al arranque del worker no se atiende
+        me = threading.get_ident()
+        while True:
+            time.sleep(WATCH_POLL_S)
+            try:
+                m = os.stat(path).st_mtime
+                if m == mtime: continue
+                mtime = m
+                with open(path, encoding="utf-8") as f: req = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if req.get("id") == seen or req.get("until", 0) <= time.time(): continue
+            seen = req["id"]
+            s = StackSampler(float(req.get("interval") or INTERVAL_S), skip={me}).start()
+            time.sleep(max(0.0, req["until"] - time.time()))
+            _write_atomic(os.path.join(control_dir, f"{seen}-{os.getpid()}.collapsed"), collapsed(s.stop()))
+
+    threading.Thread(target=loop, name="profile-watch", daemon=True).start()
+
+
+# ---- extracciones lentas ----
+class StageClock:
+    """Milisegundos por etapa en trace["stages"] (trace None -> no hace nada)."""
+
+    def __init__(self, trace: Optional[Dict[str, Any]]):
+        self.stages = trace.setdefault("stages", {}) if trace is not None else None
+        self._t = time.perf_counter()
+
+    def lap(self, name: str) -> None:
+        if self.stages is None: return
+        now = time.perf_counter()
+        self.stages[name] = round(self.stages.get(name, 0.0) + (now - self._t) * 1000, 2)
+        self._t = now
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS slow (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts        REAL NOT NULL,
+    ms        REAL NOT NULL,
+    file      TEXT,
+    sha256    TEXT,
+    vendor    TEXT,
+    source    TEXT,
+    stages    TEXT NOT NULL,
+    profile   BLOB
+)
+"""
+
+
+class SlowLog:
+    def __init__(self, path: str, max_entries: int = 200):
+        d = os.path.dirname(path)
+        if d: os.makedirs(d, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(_SCHEMA)
+        self._db.commit()
+
+    def record(self, ms: float, file: str, sha256: Optional[str], vendor: Optional[str],
+               source: Optional[str], stages: Dict[str, float], profile: Optional[bytes]) -> int:
+        with self._lock, self._db:
+            cur = self._db.execute(
+                "INSERT INTO slow (ts, ms, file, sha256, vendor, source, stages, profile) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), ms, file, sha256, vendor, source, json.dumps(stages), profile))
+            # anillo: quedan las últimas max_entries
+            self._db.execute("DELETE FROM slow WHERE id <= ?", (cur.lastrowid - self.max_entries,))
+            return cur.lastrowid
+
+    def list(self, vendor: Optional[str] = None, source: Optional[str] = None,
+             limit: int = 50) -> List[Dict[str, Any]]:
+        sql = "SELECT id, ts, ms, file, sha256, vendor, source, stages, profile IS NOT NULL FROM slow"
+        where, args = [], []
+        if vendor: where.append("vendor = ?"); args.append(vendor.upper())
+        if source: where.append("source LIKE ?"); args.append(source + "%")
+        if where: sql += " WHERE " + " AND ".join(where)
+        with self._lock:
+            rows = self._db.execute(sql + " ORDER BY id DESC LIMIT ?", (*args, limit)).fetchall()
+        return [{"id": r[0], "ts": r[1], "ms": r[2], "file": r[3], "sha256": r[4], "vendor": r[5],
+                 "source": r[6], "stages": json.loads(r[7]), "profile": bool(r[8])} for r in rows]
+
+    def profile(self, entry_id: int) -> Optional[bytes]:
+        with self._lock:
+            row = self._db.execute("SELECT profile FROM slow WHERE id = ?", (entry_id,)).fetchone()
+        return row[0] if row else None
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def profile_bytes(prof: cProfile.Profile) -> bytes:
+    """Mismo formato que Profile.dump_stats: se abre con pstats.Stats / snakeviz."""
+    prof.create_stats()
+    return marshal.dumps(prof.stats)
+
+
+@contextmanager
+def slow_capture(log: Optional[SlowLog], pdf_path: str, threshold_ms: float,
+                 profile_rate: float = 0.0) -> Iterator[Dict[str, Any]]:
+    """
+    Entrega el `trace` que se pasa a extract_from_pdf; al salir, si tardó más de threshold_ms,
+    lo guarda en `log` con el hash del PDF y, para una fracción profile_rate de las extracciones,
+    el cProfile. log None -> no mide nada.
+    """
+    if log is None:
+        yield {}; return
+    trace: Dict[str, Any] = {}
+    prof = _start_profile() if profile_rate > 0 and random.random() < profile_rate else None
+    t0 = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        if prof is not None:
+            prof.disable(); _PROFILING.release()
+        ms = (time.perf_counter() - t0) * 1000
+        if ms >= threshold_ms:
+            try: digest = file_hash(pdf_path)
+            except OSError: digest = None
+            log.record(round(ms, 1), os.path.basename(pdf_path), digest, trace.get("vendor"),
+                       trace.get("source"), trace.get("stages", {}),
+                       profile_bytes(prof) if prof is not None else None)
+
+
+def _start_profile() -> Optional[cProfile.Profile]:
+    """cProfile ya activo, o None si hay otro en curso (otra extracción, un depurador)."""
+    if not _PROFILING.acquire(blocking=False): return None
+    prof = cProfile.Profile()
+    try:
+        prof.enable()
+    except ValueError:  # otra herramienta de perfilado (sys.monitoring, 3.12+)
+        _PROFILING.release()
+        return None
+    return prof
@@ -0,0 +1,174 @@
+# results_store.py
+# Resultados de todas las extracciones (SQLite), para conciliar por CUIT / período sin volver a
+# subir ni extraer los PDFs. Una fila por comprobante: payload minimal + tipo, CAE, proveedor,
+# archivo y fuente. Misma clave que dedup_index (CUIT, tipo, número, CAE): una reextracción
+# actualiza la fila (un resultado validado no se pisa con uno sin validar); sin clave (falta CUIT o
+# número), la fila se identifica por el hash del archivo, así reextraer el mismo PDF no la duplica.
+# Consultas por índice: (cuit, fecha), (fecha), (numero), (vendor, fecha). Se pagina por cursor
+# (fecha, id) en el orden del índice -sin OFFSET ni ORDER BY que ordene en memoria-, así la
+# página N cuesta lo mismo que la primera con millones de filas; iter_query recorre todo de a
+# páginas con su propia conexión (la exportación no bloquea a los que graban).
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from dedup_index import _norm_numero, invoice_key
+from extractor_utils import cuit_digits
+
+PAGE_MAX = 1000
+EXPORT_PAGE = 2000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    key        TEXT UNIQUE,
+    ts         REAL NOT NULL,
+    cuit       TEXT NOT NULL,
+    fecha      TEXT NOT NULL,
+    numero     TEXT NOT NULL,
+    tipo       TEXT NOT NULL,
+    cae        TEXT NOT NULL,
+    vendor     TEXT NOT NULL,
+    file       TEXT,
+    source     TEXT,
+    validated  INTEGER NOT NULL,
+    result     TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_cuit_fecha ON results (cuit, fecha);
+CREATE INDEX IF NOT EXISTS results_fecha ON results (fecha);
+CREATE INDEX IF NOT EXISTS results_numero ON results (numero);
+CREATE INDEX IF NOT EXISTS results_vendor_fecha ON results (vendor, fecha);
+"""
+
+_COLUMNS = "id, ts, file, vendor, tipo, cae, source, validated, result"
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    return db
+
+
+def _entry(row: Sequence[Any]) -> Dict[str, Any]:
+    out = json.loads(row[8])
+    out.update(id=row[0], tipo=row[4], cae=row[5], vendor=row[3], archivo=row[2] or "",
+               fuente=row[6] or "", validado=bool(row[7]),
+               extraido=time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(row[1])))
+    return out
+
+
+def _where(cuit: Optional[str], desde: Optional[str], hasta: Optional[str], numero: Optional[str],
+           vendor: Optional[str], tipo: Optional[str]) -> Tuple[List[str], List[Any]]:
+    where: List[str] = []; args: List[Any] = []
+    if cuit: where.append("cuit = ?"); args.append(cuit_digits(cuit))
+    if numero: where.append("numero = ?"); args.append(_norm_numero(numero))
+    if vendor: where.append("vendor = ?"); args.append(vendor.upper())
+    if tipo: where.append("tipo = ?"); args.append(tipo.strip().upper())
+    if desde: where.append("fecha >= ?"); args.append(desde)
+    if hasta: where.append("fecha <= ?"); args.append(hasta)
+    return where, args
+
+
+def _page(db: sqlite3.Connection, where: List[str], args: List[Any], limit: int,
+          after: Optional[Tuple[str, int]]) -> List[Tuple]:
+    if after is not None:
+        where = where + ["(fecha, id) > (?, ?)"]; args = args + list(after)
+    sql = f"SELECT {_COLUMNS}, fecha FROM results"
+    if where: sql += " WHERE " + " AND ".join(where)
+    return db.execute(sql + " ORDER BY fecha, id LIMIT ?", (*args, limit)).fetchall()
+
+
+def parse_cursor(cursor: Optional[str]) -> Optional[Tuple[str, int]]:
+    """'2025-03-01|1234' -> ('2025-03-01', 1234); ValueError si no es un cursor de query()."""
+    if not cursor: return None
+    fecha, sep, rid = cursor.rpartition("|")
+    if not sep: raise ValueError(cursor)
+    return fecha, int(rid)
+
+
+class ResultsStore:
+    def __init__(self, path: str):
+        d = os.path.dirname(path)
+        if d: os.makedirs(d, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = _connect(path)
+        self._db.executescript(_SCHEMA)
+        self._db.commit()
+
+    @staticmethod
+    def _row(result: Dict[str, Any], tipo: Optional[str], cae: Optional[str], vendor: Optional[str],
+             file: Optional[str], source: Optional[str], validated: bool, ts: float,
+             file_key: Optional[str] = None) -> Tuple:
+        result = {k: v for k, v in result.items() if k not in ("_meta", "items")}
+        result["cuit"] = cuit_digits(result.get("cuit"))  # como sale en la respuesta del servidor
+        t = (tipo or "").strip().upper()
+        key = invoice_key(result["cuit"], t, result.get("numero"), cae) or (f"file:{file_key}" if file_key else None)
+        return (key, ts,
+                result["cuit"], result.get("fecha") or "", _norm_numero(result.get("numero")),
+                t, cuit_digits(cae), (vendor or "").upper(), file, source, int(validated),
+                json.dumps(result, ensure_ascii=False))
+
+    def record(self, result: Dict[str, Any], tipo: Optional[str], cae: Optional[str], vendor: Optional[str],
+               file: Optional[str] = None, source: Optional[str] = None, validated: bool = True,
+               file_key: Optional[str] = None) -> None:
+        """
+        Alta o actualización del payload minimal (sin _meta ni items) con los datos de cabecera.
+        file_key (hash del archivo): identifica la fila cuando no hay CUIT o número.
+        """
+        self.record_many([self._row(result, tipo, cae, vendor, file, source, validated, time.time(), file_key)])
+
+    def record_many(self, rows: Iterable[Tuple]) -> None:
+        """Varias filas de _row en una transacción (importaciones, benchmarks)."""
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT INTO results (key, ts, cuit, fecha, numero, tipo, cae, vendor, file, source, validated, result) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET ts = excluded.ts, fecha = excluded.fecha, "
+                "  vendor = excluded.vendor, file = excluded.file, source = excluded.source, "
+                "  validated = excluded.validated, result = excluded.result "
+                "WHERE excluded.validated >= results.validated", rows)
+
+    def get(self, entry_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(f"SELECT {_COLUMNS} FROM results WHERE id = ?", (entry_id,)).fetchone()
+        return _entry(row) if row else None
+
+    def query(self, cuit: Optional[str] = None, desde: Optional[str] = None, hasta: Optional[str] = None,
+              numero: Optional[str] = None, vendor: Optional[str] = None, tipo: Optional[str] = None,
+              limit: int = 100, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Página de resultados por fecha (fechas ISO, desde / hasta inclusive). Devuelve (filas, cursor
+        de la página siguiente o None). Sin fecha conocida, fecha = "" (van primero).
+        """
+        where, args = _where(cuit, desde, hasta, numero, vendor, tipo)
+        limit = max(1, min(limit, PAGE_MAX))
+        with self._lock:
+            rows = _page(self._db, where, args, limit + 1, parse_cursor(cursor))
+        nxt = f"{rows[limit - 1][9]}|{rows[limit - 1][0]}" if len(rows) > limit else None
+        return [_entry(r) for r in rows[:limit]], nxt
+
+    def iter_query(self, cuit: Optional[str] = None, desde: Optional[str] = None, hasta: Optional[str] = None,
+                   numero: Optional[str] = None, vendor: Optional[str] = None,
+                   tipo: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Todas las filas del filtro, de a EXPORT_PAGE por vez (memoria constante)."""
+        where, args = _where(cuit, desde, hasta, numero, vendor, tipo)
+        db = _connect(self.path)
+        try:
+            after = None
+            while True:
+                rows = _page(db, where, args, EXPORT_PAGE, after)
+                for r in rows:
+                    yield _entry(r)
+                if len(rows) < EXPORT_PAGE: break
+                after = (rows[-1][9], rows[-1][0])
+        finally:
+            db.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,214 @@
+# scheduler.py
+# Planificador delante de los workers: decide quién usa el próximo worker libre.
+# - Dos carriles: "interactive" (un /extract de una caja) va siempre antes que "bulk" (batch,
+#   ?split=true, clientes que piden X-Priority: bulk). Además bulk nunca ocupa los últimos
+#   `interactive_reserved` slots: un pedido interactivo no espera a que termine un OCR largo.
+# - Dentro de cada carril, colas por cliente con Start-time Fair Queuing ponderado: cada pedido
+#   lleva la etiqueta max(V, última del cliente) + 1/peso y se atiende el de etiqueta menor, así
+#   un cliente con 10.000 facturas en cola avanza a la par de uno con 3, no delante.
+# - Los trabajos con OCR (PDF escaneado) tienen su propio tope (ocr_slots) para que un lote de
+#   escaneos no deje sin workers a los PDFs con texto, que son de milisegundos.
+# - Métricas por cliente: en cola por carril, corriendo, atendidos, espera p50 / p95. El cliente
+#   sale de X-Tenant o de la IP: uno sin pedidos en cola ni corriendo se olvida pasados idle_s
+#   segundos (si no, cada IP o X-Tenant inventado dejaría su entrada para siempre).
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from worker_pool import WorkerCancelled, WorkerTimeout
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+LANES = (INTERACTIVE, BULK)
+POLL_S = 0.2        # cada cuánto mira cancelación / plazo quien espera
+WAIT_SAMPLES = 1000  # esperas recientes por cliente para p50 / p95
+
+log = logging.getLogger("scheduler")
+
+
+class _Waiter:
+    __slots__ = ("tenant", "lane", "ocr", "tag", "event", "granted", "dropped", "queued_at")
+
+    def __init__(self, tenant: str, lane: str, ocr: bool):
+        self.tenant = tenant; self.lane = lane; self.ocr = ocr
+        self.tag = 0.0
+        self.event = threading.Event()
+        self.granted = False; self.dropped = False
+        self.queued_at = time.monotonic()
+
+
+class _TenantStats:
+    __slots__ = ("queued", "running", "done", "waits", "seen")
+
+    def __init__(self):
+        self.queued = {lane: 0 for lane in LANES}
+        self.running = 0
+        self.done = 0
+        self.waits: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+        self.seen = time.monotonic()  # último pedido o liberación
+
+    def idle(self) -> bool:
+        return self.running == 0 and not any(self.queued.values())
+
+
+def _pct(values: List[float], q: float) -> float:
+    if not values: return 0.0
+    s = sorted(values)
+    return s[min(len(s) - 1, int(q * len(s)))]
+
+
+class FairScheduler:
+    def __init__(self, slots: int, ocr_slots: Optional[int] = None, interactive_reserved: int = 1,
+                 weights: Optional[Dict[str, float]] = None, idle_s: float = 600.0):
+        self.slots = max(1, slots)
+        self.ocr_slots = min(self.slots, ocr_slots or self.slots)
+        # bulk nunca se queda sin slot: con un solo worker no hay nada que reservar y un lote
+        # ocupa el único worker (el /extract de la caja espera a que termine ese trabajo)
+        self.bulk_slots = max(1, self.slots - interactive_reserved)
+        if interactive_reserved > 0 and self.bulk_slots == self.slots:
+            log.warning("%d worker(s): el carril interactivo no tiene slot reservado; "
+                        "hacen falta al menos %d", self.slots, interactive_reserved + 1)
+        self.weights = dict(weights or {})
+        self.idle_s = idle_s
+        self._next_sweep = time.monotonic() + idle_s
+        self._lock = threading.Lock()
+        # heap por (carril, ocr): el primero de cada uno es el de menor etiqueta que cabe
+        self._queues: Dict[Tuple[str, bool], List[Tuple[float, int, _Waiter]]] = {
+            (lane, ocr): [] for lane in LANES for ocr in (False, True)}
+        self._vtime = {lane: 0.0 for lane in LANES}
+        self._last_tag: Dict[Tuple[str, str], float] = {}
+        self._seq = itertools.count()
+        self.running = 0; self.running_ocr = 0; self.running_bulk = 0
+        self.waiting = 0  # pedidos en cola, todos los carriles (lo mira overload.LoadGovernor)
+        self._stats: Dict[str, _TenantStats] = defaultdict(_TenantStats)
+
+    # ---- pedido / liberación ----
+    @contextmanager
+    def slot(self, tenant: str, lane: str = INTERACTIVE, ocr: bool = False,
+             timeout: Optional[float] = None, cancel: Optional[threading.Event] = None) -> Iterator[None]:
+        """
+        Espera un slot (orden justo) y lo libera al salir.
+        timeout: segundos de espera en cola -> WorkerTimeout; cancel seteado -> WorkerCancelled.
+        """
+        w = self.acquire(tenant, lane, ocr, timeout, cancel)
+        try:
+            yield
+        finally:
+            self.release(w)
+
+    def acquire(self, tenant: str, lane: str = INTERACTIVE, ocr: bool = False,
+                timeout: Optional[float] = None, cancel: Optional[threading.Event] = None) -> _Waiter:
+        w = _Waiter(tenant, lane if lane in LANES else BULK, ocr)
+        end = time.monotonic() + timeout if timeout is not None else None
+        with self._lock:
+            key = (w.lane, tenant)
+            w.tag = max(self._vtime[w.lane], self._last_tag.get(key, 0.0)) + 1.0 / self.weights.get(tenant, 1.0)
+            self._last_tag[key] = w.tag
+            heapq.heappush(self._queues[(w.lane, ocr)], (w.tag, next(self._seq), w))
+            st = self._stats[tenant]
+            st.queued[w.lane] += 1; st.seen = time.monotonic()
+            self.waiting += 1
+            self._dispatch()
+            self._sweep()
+        while not w.event.wait(POLL_S if end is None else max(0.0, min(POLL_S, end - time.monotonic()))):
+            err = None
+            if cancel is not None and cancel.is_set(): err = WorkerCancelled()
+            elif end is not None and time.monotonic() >= end: err = WorkerTimeout()
+            if err is None: continue
+            with self._lock:
+                if not w.granted:
+                    w.dropped = True  # se saca del heap la próxima vez que llegue al frente
+                    self._stats[tenant].queued[w.lane] -= 1
+                    self.waiting -= 1
+                    raise err
+            break  # lo atendieron justo: se usa el slot
+        return w
+
+    def release(self, w: _Waiter) -> None:
+        with self._lock:
+            self.running -= 1
+            if w.ocr: self.running_ocr -= 1
+            if w.lane == BULK: self.running_bulk -= 1
+            st = self._stats[w.tenant]
+            st.running -= 1; st.done += 1; st.seen = time.monotonic()
+            self._dispatch()
+
+    def _sweep(self) -> None:
+        """
+        Olvida los clientes sin pedidos pasados idle_s segundos (una pasada cada idle_s).
+        Sin su última etiqueta vuelve con la del tiempo virtual, como cualquiera que estuvo sin pedidos.
+        """
+        now = time.monotonic()
+        if now < self._next_sweep: return
+        self._next_sweep = now + self.idle_s
+        for name in [n for n, st in self._stats.items() if st.idle() and now - st.seen >= self.idle_s]:
+            del self._stats[name]
+            for lane in LANES:
+                self._last_tag.pop((lane, name), None)
+
+    def _head(self, lane: str, ocr: bool) -> Optional[Tuple[float, int, _Waiter]]:
+        q = self._queues[(lane, ocr)]
+        while q and q[0][2].dropped:
+            heapq.heappop(q)
+        return q[0] if q else None
+
+    def _fits(self, lane: str, ocr: bool) -> bool:
+        if ocr and self.running_ocr >= self.ocr_slots: return False
+        return lane == INTERACTIVE or self.running_bulk < self.bulk_slots
+
+    def _dispatch(self) -> None:
+        while self.running < self.slots:
+            best = None
+            for lane in LANES:
+                heads = [h for ocr in (False, True)
+                         if self._fits(lane, ocr) and (h := self._head(lane, ocr)) is not None]
+                if heads:
+                    best = min(heads); break
+            if best is None: return
+            w = best[2]
+            heapq.heappop(self._queues[(w.lane, w.ocr)])
+            self._vtime[w.lane] = w.tag
+            self.running += 1; self.waiting -= 1
+            if w.ocr: self.running_ocr += 1
+            if w.lane == BULK: self.running_bulk += 1
+            st = self._stats[w.tenant]
+            st.queued[w.lane] -= 1; st.running += 1
+            st.waits.append(time.monotonic() - w.queued_at)
+            w.granted = True
+            w.event.set()
+
+    # ---- métricas ----
+    def snapshot(self, tenants: bool = True) -> Dict[str, Any]:
+        """Estado de los slots; con tenants=False sin el detalle por cliente (sólo cuántos hay)."""
+        with self._lock:
+            base = {"slots": self.slots, "bulk_slots": self.bulk_slots, "ocr_slots": self.ocr_slots,
+                    "running": self.running, "waiting": self.waiting, "running_bulk": self.running_bulk,
+                    "running_ocr": self.running_ocr, "tenant_count": len(self._stats)}
+            if not tenants:
+                return base
+            per_tenant = {}
+            for name, st in self._stats.items():
+                waits = list(st.waits)
+                per_tenant[name] = {
+                    "queued": dict(st.queued), "running": st.running, "done": st.done,
+                    "weight": self.weights.get(name, 1.0),
+                    "wait_p50_ms": round(_pct(waits, 0.50) * 1000, 1),
+                    "wait_p95_ms": round(_pct(waits, 0.95) * 1000, 1),
+                }
+            return dict(base, tenants=per_tenant)
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """'caja=4,erp=1' -> {'caja': 4.0, 'erp': 1.0} (EXTRACTOR_TENANT_WEIGHTS)."""
+    out: Dict[str, float] = {}
+    for part in spec.split(","):
+        name, sep, value = part.partition("=")
+        if sep and name.strip():
+            try: out[name.strip()] = max(0.01, float(value))
+            except ValueError: pass
+    return out
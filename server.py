@@ -1,11 +1,27 @@
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Query
+from fastapi import Depends, FastAPI, File, UploadFile, Form, HTTPException, Query, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
 from enum import Enum
-from typing import Annotated, Dict, Any, List
-import tempfile, os, re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Annotated, Dict, Any, List, Iterator, Optional
+import asyncio, hashlib, hmac, tempfile, os, threading, time
 
-from extractor_v6 import extract_from_pdf  # <- devuelve el payload minimal normalizado
+from extraction_core import SNIFF_BYTES, needs_ocr, sniff_bytes
+from extractor_v6 import FIXED_TAX_FIELDS, partial_payload
+from extractor_utils import cuit_digits
+from uploads import SUFFIXES, UNSUPPORTED, Uploads
+from worker_pool import WorkerPool, WorkerTimeout, WorkerCancelled
+from scheduler import BULK, INTERACTIVE, FairScheduler, parse_weights
+from overload import LoadGovernor
+from deferred_ocr import DeferredOcr, DeferredStore
+from results_store import PAGE_MAX, ResultsStore, parse_cursor
+import memory_guard
+import profiler
+import jobs  # <- extract_job devuelve el payload minimal normalizado
+import output_writers
+import settings
 
 app = FastAPI(title="Factura Extractor API v6", version="1.2.0")
 
@@ -15,6 +31,22 @@ app.add_middleware(
     allow_methods=["*"], allow_headers=["*"]
 )
 
+# Procesos de extracción: un OCR que se pasa del plazo se mata sin afectar al resto.
+# Cada proceso abre su índice de duplicados y su caché de texto (ver jobs.py).
+# Se reciclan entre trabajos pasado un número de pedidos o un RSS (memory_guard.py).
+POOL = WorkerPool(settings.WORKERS, initializer=jobs.init_worker, max_requests=settings.WORKER_MAX_REQUESTS,
+                  max_rss_mb=settings.WORKER_MAX_RSS_MB) if settings.WORKERS > 0 else None
+if POOL is None:  # se extrae en el proceso del servidor: mismos topes de PyMuPDF / páginas
+    memory_guard.configure(settings.FITZ_STORE_MB, settings.OCR_PAGES_IN_FLIGHT)
+# Quién usa el próximo worker: carril interactivo primero, reparto justo entre clientes (scheduler.py)
+SCHED = FairScheduler(max(1, settings.WORKERS), ocr_slots=settings.OCR_SLOTS or None,
+                      interactive_reserved=settings.INTERACTIVE_RESERVED,
+                      weights=parse_weights(settings.TENANT_WEIGHTS), idle_s=settings.TENANT_IDLE_S)
+# Saturado -> los escaneos salen con la capa de texto y el OCR se completa de fondo (overload.py)
+GOVERNOR = LoadGovernor(lambda: SCHED.waiting, settings.DEGRADE_QUEUE_HIGH, settings.DEGRADE_QUEUE_LOW,
+                        settings.DEGRADE_CPU_HIGH, settings.DEGRADE_CPU_LOW,
+                        settings.DEGRADE_HOLD_S) if settings.DEGRADE_ENABLED else None
+
 class Vendor(str, Enum):
     GUERRINI = "GUERRINI"
     PIRELLI = "PIRELLI"
@@ -28,152 +60,241 @@ class OutFmt(str, Enum):
 async def health() -> dict:
     return {"status": "ok"}
 
+@app.get("/metrics/queues")
+async def queue_metrics() -> dict:
+    """Slots ocupados y pedidos en cola (scheduler.FairScheduler); el detalle por cliente va en /admin/queues."""
+    out = SCHED.snapshot(tenants=False)
+    if GOVERNOR is not None:
+        out["overload"] = GOVERNOR.state()
+        out["deferred"] = DEFERRED.store.counts()
+    return out
+
+@app.get("/metrics/memory")
+async def memory_metrics() -> dict:
+    """RSS por worker, reciclados y pico de memoria por tipo de trabajo (p50 / p95 / máx, MB)."""
+    if POOL is None:
+        return {"workers": [], "server_rss_mb": memory_guard.rss_mb()}
+    return dict(POOL.memory(), server_rss_mb=memory_guard.rss_mb())
+
 # ----------------------------
 # Helpers VB6-friendly
 # ----------------------------
 
-def _to_kv(minimal: Dict[str, Any]) -> str:
+# Las plantillas viven en output_writers (bytes idénticos a la versión anterior)
+_to_kv = output_writers.to_kv
+_to_ini = output_writers.to_ini
+_num = output_writers.num
+_clean = output_writers.clean
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse con el encoder rápido (orjson si está disponible)."""
+    def render(self, content: Any) -> bytes:
+        return output_writers.to_json_bytes(content)
+
+
+def _clean_cuit(cuit: str) -> str:
+    """Deja solo los dígitos del CUIT."""
+    if not cuit:
+        return ""
+    return cuit_digits(cuit)
+
+# ----------------------------
+# Plazo por request
+# ----------------------------
+def _deadline_ts(timeout_q: Optional[float], timeout_h: Optional[str]) -> float:
+    """?timeout= o X-Request-Timeout (segundos) -> plazo absoluto; default y tope del servidor."""
+    t = timeout_q
+    if t is None and timeout_h:
+        try: t = float(timeout_h)
+        except ValueError: t = None
+    if t is None or t <= 0:
+        t = settings.DEADLINE_S
+    return time.time() + min(t, settings.DEADLINE_MAX_S)
+
+# ----------------------------
+# Cliente y carril
+# ----------------------------
+def _tenant(request: Request, x_tenant: Optional[str], x_api_key: Optional[str]) -> str:
+    """X-Tenant; si no, la API key (hasheada: no se muestra en métricas); si no, la IP."""
+    if x_tenant and x_tenant.strip():
+        return x_tenant.strip()[:64]
+    if x_api_key:
+        return "key-" + hashlib.sha1(x_api_key.encode("utf-8")).hexdigest()[:10]
+    return request.client.host if request.client else "anon"
+
+def _lane(x_priority: Optional[str]) -> str:
+    """Un /extract suelto es interactivo salvo que el cliente pida X-Priority: bulk."""
+    return BULK if (x_priority or "").strip().lower() == BULK else INTERACTIVE
+
+def _run_job(fn, *args: Any, deadline_ts: float, cancel: threading.Event,
+             tenant: str, lane: str, ocr: bool = False) -> Any:
     """
-    Convierte el payload minimal:
-      {
-        "numero": "...",
-        "fecha": "YYYY-MM-DD",
-        "cuit": "nn-nnnnnnnn-n",
-        "total": 123.45,
-        "iva": {"21": 100.10, "10.5": 16.50, ...},
-        "percepciones": {"percepcion_iva": 123.4, ...},
-        "retenciones": {"retencion_iva": 55.0, ...}
-      }
-    a key=value por líneas, con contadores + claves indexadas.
+    fn(*args, deadline_ts[, cancel]) en el pool si hay, cuando el planificador da el turno.
+    WorkerTimeout / WorkerCancelled pasan (también si el plazo vence esperando en la cola).
     """
-    lines: List[str] = []
-
-    # Campos principales
-    lines.append(f"status=ok")
-    lines.append(f"version=1")
-    lines.append(f"numero={minimal.get('numero','')}")
-    lines.append(f"fecha={minimal.get('fecha','')}")
-    lines.append(f"cuit={minimal.get('cuit','')}")
-    lines.append(f"subtotal={_num(minimal.get('subtotal', 0))}")
-    lines.append(f"total={_num(minimal.get('total', 0))}")
-
-    # IVA por alícuota
-    iva = minimal.get("iva") or {}
-    iva_items = [(str(k), float(v)) for k, v in iva.items() if v and float(v) != 0.0]
-    lines.append(f"iva_count={len(iva_items)}")
-    # orden clásico de tasas comunes
-    order = ["27", "21", "10.5", "5", "2.5"]
-    def rank(k: str) -> int:
-        return order.index(k) if k in order else 999
-    iva_items.sort(key=lambda x: (rank(x[0]), x[0]))
-    for i, (rate, monto) in enumerate(iva_items, start=1):
-        lines.append(f"iva_{i}_tasa={_clean(rate)}")
-        lines.append(f"iva_{i}_monto={_num(monto)}")
-
-    # Percepciones normalizadas
-    percs = minimal.get("percepciones") or {}
-    perc_items = [(k, float(v)) for k, v in percs.items() if v and float(v) != 0.0]
-    perc_items.sort(key=lambda x: x[0])
-    lines.append(f"percepciones_count={len(perc_items)}")
-    for i, (name, monto) in enumerate(perc_items, start=1):
-        lines.append(f"percepciones_{i}_clave={name}")
-        lines.append(f"percepciones_{i}_monto={_num(monto)}")
-
-    # Retenciones normalizadas
-    rets = minimal.get("retenciones") or {}
-    ret_items = [(k, float(v)) for k, v in rets.items() if v and float(v) != 0.0]
-    ret_items.sort(key=lambda x: x[0])
-    lines.append(f"retenciones_count={len(ret_items)}")
-    for i, (name, monto) in enumerate(ret_items, start=1):
-        lines.append(f"retenciones_{i}_clave={name}")
-        lines.append(f"retenciones_{i}_monto={_num(monto)}")
-
-    return "\n".join(lines)
-
-def _to_ini(minimal: Dict[str, Any]) -> str:
+    with SCHED.slot(tenant, lane, ocr, timeout=max(0.0, deadline_ts - time.time()), cancel=cancel):
+        if POOL is None:
+            return fn(*args, deadline_ts, cancel)
+        hard = max(0.0, deadline_ts - time.time()) + settings.KILL_GRACE_S
+        return POOL.run(fn, *args, deadline_ts, timeout=hard, cancel=cancel)
+
+def _killed_payload(e: Exception) -> Dict[str, Any]:
+    return partial_payload("timeout" if isinstance(e, WorkerTimeout) else "cancelled")
+
+def _extract(tmp_path: str, vendor_hint: str, items: bool, deadline_ts: float,
+             cancel: threading.Event, tenant: str, lane: str,
+             callback: Optional[str] = None) -> Dict[str, Any]:
     """
-    Alternativa INI por secciones (si te gusta agrupar visualmente).
+    Corre la extracción (en el pool si hay) y siempre devuelve un payload: completo o parcial.
+    En modo degradado un escaneo sale sin OCR (parcial, etapa "ocr") y con _meta.ocr_pending:
+    el id del OCR diferido (GET /extract/deferred/{id} o POST a `callback`).
     """
-    out: List[str] = []
-    out += ["[meta]", "status=ok", "version=1", ""]
-    out += ["[factura]"]
-    out += [f"numero={minimal.get('numero','')}",
-            f"fecha={minimal.get('fecha','')}",
-            f"cuit={minimal.get('cuit','')}",
-            f"total={_num(minimal.get('total', 0))}", ""]
-    out += ["[iva]"]
-    iva = minimal.get("iva") or {}
-    order = ["27", "21", "10.5", "5", "2.5"]
-    for r in order:
-        if r in iva and float(iva[r]) != 0.0:
-            out.append(f"{r}={_num(iva[r])}")
-    # tasas “no estándar” que aparezcan
-    for k, v in iva.items():
-        if k not in order and float(v) != 0.0:
-            out.append(f"{_clean(k)}={_num(v)}")
-    out.append("")
-
-    out += ["[percepciones]"]
-    for k, v in sorted((minimal.get("percepciones") or {}).items(), key=lambda x: x[0]):
-        if v and float(v) != 0.0:
-            out.append(f"{k}={_num(v)}")
-    out.append("")
-
-    out += ["[retenciones]"]
-    for k, v in sorted((minimal.get("retenciones") or {}).items(), key=lambda x: x[0]):
-        if v and float(v) != 0.0:
-            out.append(f"{k}={_num(v)}")
-    out.append("")
-    return "\n".join(out)
-
-def _num(v) -> str:
+    ocr = needs_ocr(tmp_path)
+    degraded = ocr and GOVERNOR is not None and GOVERNOR.degraded()
+    job = jobs.text_layer_job if degraded else jobs.extract_job
     try:
-        return str(float(v)).replace(",", ".")
-    except Exception:
-        return "0"
+        minimal = _run_job(job, tmp_path, vendor_hint, items, deadline_ts=deadline_ts,
+                           cancel=cancel, tenant=tenant, lane=lane, ocr=ocr and not degraded)
+    except (WorkerTimeout, WorkerCancelled) as e:
+        minimal = _killed_payload(e)
+    meta = minimal.get("_meta") or {}
+    if degraded and meta.get("partial_stage") == "ocr":
+        meta["degraded"] = True
+        meta["ocr_pending"] = DEFERRED.submit(tmp_path, vendor_hint, items, tenant, callback)
+    if "cuit" in minimal:
+        minimal["cuit"] = _clean_cuit(minimal["cuit"])
+    return minimal
 
-def _clean(s: str) -> str:
-    return re.sub(r"[\r\n=]+", " ", str(s)).strip()
+def _deferred_run(pdf_path: str, vendor_hint: Optional[str], items: bool, tenant: str) -> Dict[str, Any]:
+    """OCR diferido: extracción completa por el carril bulk, con el plazo máximo del servidor."""
+    deadline_ts = time.time() + settings.DEADLINE_MAX_S
+    try:
+        minimal = _run_job(jobs.extract_job, pdf_path, vendor_hint, items, deadline_ts=deadline_ts,
+                           cancel=threading.Event(), tenant=tenant, lane=BULK, ocr=True)
+    except (WorkerTimeout, WorkerCancelled) as e:
+        minimal = _killed_payload(e)
+    if "cuit" in minimal:
+        minimal["cuit"] = _clean_cuit(minimal["cuit"])
+    return minimal
 
+# Sin modo degradado no hay OCR diferido: ni base ni carpeta de espera
+DEFERRED = DeferredOcr(DeferredStore(settings.DEFERRED_DB), settings.DEFERRED_DIR, _deferred_run,
+                       settings.CALLBACK_ALLOW, settings.DEFERRED_KEEP_H * 3600) if GOVERNOR is not None else None
+if DEFERRED is not None:
+    DEFERRED.start()
 
-def _clean_cuit(cuit: str) -> str:
-    """Deja solo los dígitos del CUIT."""
-    if not cuit:
-        return ""
-    import re
-    return re.sub(r"\D", "", cuit or "")
+def _extract_ocr_batch(paths: List[str], vendor_hint: str, deadline_ts: float,
+                       cancel: threading.Event, tenant: str) -> List[Dict[str, Any]]:
+    """Un grupo de escaneos en un solo job (jobs.batch_ocr_job), carril bulk. Un payload por archivo."""
+    try:
+        results = _run_job(jobs.batch_ocr_job, paths, vendor_hint, False, deadline_ts=deadline_ts,
+                           cancel=cancel, tenant=tenant, lane=BULK, ocr=True)
+    except (WorkerTimeout, WorkerCancelled) as e:
+        results = [_killed_payload(e) for _ in paths]
+    for minimal in results:
+        if "cuit" in minimal:
+            minimal["cuit"] = _clean_cuit(minimal["cuit"])
+    return results
+
+def _extract_invoices(tmp_path: str, vendor_hint: str, items: bool, deadline_ts: float,
+                      cancel: threading.Event, tenant: str) -> List[Dict[str, Any]]:
+    """
+    PDF con varias facturas: se lee y se corta en un worker (jobs.split_job) y los tramos se
+    reparten en grupos contiguos, uno por worker, que corren a la vez. Un payload por factura, en orden.
+    Va por el carril bulk: son muchas facturas de una vez.
+    """
+    try:
+        first = _run_job(jobs.split_job, tmp_path, vendor_hint, items, deadline_ts=deadline_ts,
+                         cancel=cancel, tenant=tenant, lane=BULK, ocr=needs_ocr(tmp_path))
+    except (WorkerTimeout, WorkerCancelled) as e:
+        first = {"results": [_killed_payload(e)]}
+    results = first.get("results")
+    if results is None:
+        segments = first["segments"]
+        n = min(len(segments), SCHED.bulk_slots)
+        size = -(-len(segments) // n)
+        chunks = [segments[i:i + size] for i in range(0, len(segments), size)]
+
+        def run(chunk) -> List[Dict[str, Any]]:
+            try:
+                return _run_job(jobs.segments_job, tmp_path, vendor_hint, items, chunk,
+                                deadline_ts=deadline_ts, cancel=cancel, tenant=tenant, lane=BULK)
+            except (WorkerTimeout, WorkerCancelled) as e:
+                killed = []
+                for seg in chunk:
+                    p = _killed_payload(e)
+                    p["_meta"]["pages"] = [seg.page_offset + 1, seg.page_offset + seg.pages]
+                    killed.append(p)
+                return killed
+
+        if len(chunks) == 1:
+            parts = [run(chunks[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=len(chunks)) as ex:
+                parts = list(ex.map(run, chunks))
+        results = [r for part in parts for r in part]
+    for minimal in results:
+        if "cuit" in minimal:
+            minimal["cuit"] = _clean_cuit(minimal["cuit"])
+    return results
+
+async def _watch_disconnect(request: Request, cancel: threading.Event) -> None:
+    """Si el cliente corta la conexión, se cancela el trabajo pendiente."""
+    while not cancel.is_set():
+        if await request.is_disconnected():
+            cancel.set(); return
+        await asyncio.sleep(0.5)
 
 # ----------------------------
 # Endpoints
 # ----------------------------
 @app.post("/extract", response_model=None)
 async def extract_invoice(
+    request: Request,
     file: Annotated[UploadFile, File(...)],
     vendor: Annotated[Vendor, Form(...)],
-    fmt: Annotated[OutFmt, Query(alias="format")] = OutFmt.json  # ?format=json|kv|ini
+    fmt: Annotated[OutFmt, Query(alias="format")] = OutFmt.json,  # ?format=json|kv|ini
+    items: Annotated[bool, Query()] = False,  # ?items=true -> detalle de renglones (sólo JSON)
+    timeout: Annotated[Optional[float], Query()] = None,  # segundos; pasado el plazo -> resultado parcial
+    split: Annotated[bool, Query()] = False,  # ?split=true -> una entrada por factura del PDF (como batch)
+    x_request_timeout: Annotated[Optional[str], Header()] = None,
+    x_tenant: Annotated[Optional[str], Header()] = None,
+    x_api_key: Annotated[Optional[str], Header()] = None,
+    x_priority: Annotated[Optional[str], Header()] = None,  # "bulk" -> no compite con las cajas
+    x_callback_url: Annotated[Optional[str], Header()] = None,  # destino del OCR diferido
 ) -> Response:
-    filename = (file.filename or "").lower()
-    if not filename.endswith(".pdf"):
-        raise HTTPException(status_code=400, detail="Solo se aceptan archivos PDF por el momento.")
-
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        content = await file.read()
-        if not content:
-            raise HTTPException(status_code=400, detail="Archivo vacío.")
+    deadline_ts = _deadline_ts(timeout, x_request_timeout)
+    tenant = _tenant(request, x_tenant, x_api_key)
+    content = await file.read()
+    if not content:
+        raise HTTPException(status_code=400, detail="Archivo vacío.")
+    # PDF o imagen (JPEG / PNG / TIFF multipágina, directo a OCR): se decide por los bytes
+    kind = sniff_bytes(content[:SNIFF_BYTES])
+    if kind is None:
+        raise HTTPException(status_code=400, detail=UNSUPPORTED)
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix=SUFFIXES[kind]) as tmp:
         tmp.write(content)
         tmp.flush()
         tmp_path = tmp.name
 
+    cancel = threading.Event()
+    watcher = asyncio.create_task(_watch_disconnect(request, cancel))
     try:
-        # El extractor ya devuelve el payload minimal normalizado
-        minimal = extract_from_pdf(tmp_path, vendor_hint=vendor.value, cfg_path="vendors.yaml")
+        if split:
+            # PDF con varias facturas / copias: lista (json) o registros separados (kv / ini), como batch
+            results = await run_in_threadpool(_extract_invoices, tmp_path, vendor.value,
+                                              items and fmt == OutFmt.json, deadline_ts, cancel, tenant)
+            return Response(content=b"".join(output_writers.iter_batch(results, fmt.value)),
+                            media_type=_BATCH_MEDIA[fmt])
+
+        # El extractor ya devuelve el payload minimal normalizado (con el CUIT limpio)
+        minimal = await run_in_threadpool(_extract, tmp_path, vendor.value, items and fmt == OutFmt.json,
+                                          deadline_ts, cancel, tenant, _lane(x_priority), x_callback_url)
 
-        # Limpieza del CUIT antes de devolver
-        if "cuit" in minimal:
-            minimal["cuit"] = _clean_cuit(minimal["cuit"])
-        
         if fmt == OutFmt.json:
-            return JSONResponse(minimal)
+            return FastJSONResponse(minimal)
 
         if fmt == OutFmt.kv:
             body = _to_kv(minimal)
@@ -184,14 +305,244 @@ async def extract_invoice(
             return PlainTextResponse(content=body, media_type="text/ini; charset=utf-8")
 
         # Fallback a JSON
-        return JSONResponse(minimal)
+        return FastJSONResponse(minimal)
 
     finally:
+        watcher.cancel()
         try:
             os.remove(tmp_path)
         except Exception:
             pass
 
+_BATCH_MEDIA = {
+    OutFmt.json: "application/json",
+    OutFmt.kv: "text/plain; charset=utf-8",
+    OutFmt.ini: "text/ini; charset=utf-8",
+}
+
+@app.post("/extract/batch", response_model=None)
+async def extract_batch(
+    request: Request,
+    files: Annotated[List[UploadFile], File(...)],
+    vendor: Annotated[Vendor, Form(...)],
+    fmt: Annotated[OutFmt, Query(alias="format")] = OutFmt.json,
+    stream: Annotated[bool, Query()] = False,
+    timeout: Annotated[Optional[float], Query()] = None,
+    x_request_timeout: Annotated[Optional[str], Header()] = None,
+    x_tenant: Annotated[Optional[str], Header()] = None,
+    x_api_key: Annotated[Optional[str], Header()] = None,
+    ocr_batch: Annotated[bool, Query()] = False,
+) -> Response:
+    """
+    Varias facturas en un request. json -> array; kv / ini -> registros separados por línea en blanco.
+    Con ?stream=true cada resultado se envía apenas está listo.
+    El plazo es del request entero: vencido, las facturas que faltan salen parciales.
+    Carril bulk: varios archivos a la vez, con la parte que el planificador le dé a este cliente.
+    Con ?ocr_batch=true los escaneos van en grupos de OCR_BATCH_SIZE a jobs.batch_ocr_job
+    (cabecera y totales de todo el grupo en pocas llamadas a Tesseract, ver ocr_batch).
+    """
+    deadline_ts = _deadline_ts(timeout, x_request_timeout)
+    tenant = _tenant(request, x_tenant, x_api_key)
+    for f in files:
+        if Uploads.sniff(f) is None:
+            raise HTTPException(status_code=400, detail=f"{f.filename}: {UNSUPPORTED}")
+    cancel = threading.Event()
+
+    def one(f: UploadFile) -> Dict[str, Any]:
+        tmp_path = Uploads.save_temp_document(f)
+        try:
+            return _extract(tmp_path, vendor.value, False, deadline_ts, cancel, tenant, BULK)
+        finally:
+            Uploads.cleanup_temp_file(tmp_path)
+
+    def results() -> Iterator[Dict[str, Any]]:
+        # ventana de `width` archivos en curso; los resultados salen en el orden de los archivos
+        width = max(1, min(len(files), settings.BATCH_CONCURRENCY or SCHED.bulk_slots))
+        with ThreadPoolExecutor(max_workers=width) as ex:
+            pending = deque()
+            for f in files:
+                pending.append(ex.submit(one, f))
+                if len(pending) >= width:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def batched_results() -> Iterator[Dict[str, Any]]:
+        # hay que ver todos los archivos para agrupar los escaneos: se guardan antes de empezar
+        paths = [Uploads.save_temp_document(f) for f in files]
+        try:
+            degraded = GOVERNOR is not None and GOVERNOR.degraded()  # sin OCR: cada uno por _extract
+            scans = [] if degraded else [i for i, p in enumerate(paths) if needs_ocr(p)]
+            size = max(1, settings.OCR_BATCH_SIZE)
+            groups = [scans[k:k + size] for k in range(0, len(scans), size)]
+            width = max(1, min(len(paths), settings.BATCH_CONCURRENCY or SCHED.bulk_slots))
+            with ThreadPoolExecutor(max_workers=width) as ex:
+                owner: Dict[int, Any] = {}
+                for g in groups:
+                    fut = ex.submit(_extract_ocr_batch, [paths[i] for i in g], vendor.value,
+                                    deadline_ts, cancel, tenant)
+                    owner.update((i, (fut, pos)) for pos, i in enumerate(g))
+                for i, p in enumerate(paths):
+                    if i not in owner:
+                        owner[i] = (ex.submit(_extract, p, vendor.value, False, deadline_ts, cancel, tenant, BULK), None)
+                for i in range(len(paths)):  # en el orden de los archivos
+                    fut, pos = owner[i]
+                    yield fut.result() if pos is None else fut.result()[pos]
+        finally:
+            for p in paths:
+                Uploads.cleanup_temp_file(p)
+
+    async def body():
+        watcher = asyncio.create_task(_watch_disconnect(request, cancel))
+        try:
+            rows = batched_results() if ocr_batch else results()
+            async for chunk in iterate_in_threadpool(output_writers.iter_batch(rows, fmt.value)):
+                yield chunk
+        finally:
+            # Fin normal o respuesta abandonada: no queda trabajo corriendo para este request
+            watcher.cancel(); cancel.set()
+
+    if stream:
+        return StreamingResponse(body(), media_type=_BATCH_MEDIA[fmt])
+    return Response(content=b"".join([c async for c in body()]), media_type=_BATCH_MEDIA[fmt])
+
+@app.get("/extract/deferred/{job_id}", response_model=None)
+async def deferred_result(
+    job_id: str,
+    fmt: Annotated[OutFmt, Query(alias="format")] = OutFmt.json,
+) -> Response:
+    """Resultado del OCR diferido (_meta.ocr_pending): 202 mientras está pendiente."""
+    entry = await run_in_threadpool(DEFERRED.store.get, job_id) if DEFERRED is not None else None
+    if entry is None:
+        raise HTTPException(status_code=404, detail="OCR diferido desconocido.")
+    if entry["status"] in ("pending", "running"):
+        return FastJSONResponse({"id": job_id, "status": entry["status"]}, status_code=202)
+    if entry["status"] == "error":
+        return FastJSONResponse({"id": job_id, "status": "error", **entry["result"]}, status_code=500)
+    minimal = entry["result"]
+    if fmt == OutFmt.kv:
+        return PlainTextResponse(content=_to_kv(minimal), media_type="text/plain; charset=utf-8")
+    if fmt == OutFmt.ini:
+        return PlainTextResponse(content=_to_ini(minimal), media_type="text/ini; charset=utf-8")
+    return FastJSONResponse(minimal)
+
+# ----------------------------
+# Resultados guardados (results_store): conciliación sin volver a extraer
+# ----------------------------
+# X-Admin-Token: /results (todas las facturas de todos los clientes) y /admin
+def _require_admin(x_admin_token: Annotated[Optional[str], Header()] = None) -> None:
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Token de administración inválido.")
+
+_ISO_DATE = r"^\d{4}-\d{2}-\d{2}$"
+
+class ExportFmt(str, Enum):
+    csv = "csv"
+    jsonl = "jsonl"
+
+_EXPORT_MEDIA = {ExportFmt.csv: "text/csv; charset=utf-8", ExportFmt.jsonl: "application/x-ndjson"}
+
+def _results_store() -> ResultsStore:
+    store = jobs.results_store()
+    if store is None:
+        raise HTTPException(status_code=404, detail="Almacén de resultados deshabilitado (EXTRACTOR_RESULTS=1 para activarlo).")
+    return store
+
+def _result_filters(
+    cuit: Annotated[Optional[str], Query()] = None,
+    desde: Annotated[Optional[str], Query(pattern=_ISO_DATE)] = None,  # fecha de emisión, inclusive
+    hasta: Annotated[Optional[str], Query(pattern=_ISO_DATE)] = None,
+    numero: Annotated[Optional[str], Query()] = None,
+    vendor: Annotated[Optional[str], Query()] = None,
+    tipo: Annotated[Optional[str], Query()] = None,
+) -> Dict[str, Any]:
+    return {"cuit": cuit, "desde": desde, "hasta": hasta, "numero": numero, "vendor": vendor, "tipo": tipo}
+
+@app.get("/results", dependencies=[Depends(_require_admin)])
+async def list_results(
+    filters: Annotated[Dict[str, Any], Depends(_result_filters)],
+    limit: Annotated[int, Query(ge=1, le=PAGE_MAX)] = 100,
+    cursor: Annotated[Optional[str], Query()] = None,
+) -> Response:
+    """Resultados por fecha de emisión; `next` es el cursor de la página siguiente (null = última)."""
+    store = _results_store()
+    try:
+        parse_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido.")
+    items, nxt = await run_in_threadpool(store.query, limit=limit, cursor=cursor, **filters)
+    return FastJSONResponse({"items": items, "next": nxt})
+
+@app.get("/results/export", response_model=None, dependencies=[Depends(_require_admin)])
+async def export_results(
+    filters: Annotated[Dict[str, Any], Depends(_result_filters)],
+    fmt: Annotated[ExportFmt, Query(alias="format")] = ExportFmt.csv,
+) -> Response:
+    """Todos los resultados del filtro en CSV (IVA, percepciones y retenciones en columnas) o JSONL, en streaming."""
+    rows = _results_store().iter_query(**filters)
+    body = output_writers.iter_csv(rows, FIXED_TAX_FIELDS) if fmt == ExportFmt.csv else output_writers.iter_jsonl(rows)
+    return StreamingResponse(body, media_type=_EXPORT_MEDIA[fmt],
+                             headers={"Content-Disposition": f'attachment; filename="resultados.{fmt.value}"'})
+
+@app.get("/results/{entry_id}", dependencies=[Depends(_require_admin)])
+async def get_result(entry_id: int) -> Response:
+    entry = await run_in_threadpool(_results_store().get, entry_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Resultado desconocido.")
+    return FastJSONResponse(entry)
+
+# ----------------------------
+# Diagnóstico (sólo con X-Admin-Token)
+# ----------------------------
+class ProfFmt(str, Enum):
+    collapsed = "collapsed"    # una pila por línea + cantidad (flamegraph.pl / speedscope)
+    speedscope = "speedscope"  # JSON de speedscope.app
+
+def _profile(seconds: float, interval: float):
+    if POOL is None:
+        return profiler.sample(seconds, interval)
+    req_id = profiler.request_profile(settings.PROFILE_DIR, seconds, interval)
+    return profiler.collect(settings.PROFILE_DIR, req_id, seconds, expect=POOL.size)
+
+@app.post("/admin/profile", response_model=None, dependencies=[Depends(_require_admin)])
+async def admin_profile(
+    seconds: Annotated[float, Query(gt=0, le=120)] = 10,
+    interval_ms: Annotated[float, Query(ge=1, le=100)] = 5,
+    fmt: Annotated[ProfFmt, Query(alias="format")] = ProfFmt.collapsed,
+) -> Response:
+    """Muestrea las pilas de los workers (o del servidor sin pool) durante `seconds`."""
+    counts = await run_in_threadpool(_profile, seconds, interval_ms / 1000)
+    if fmt == ProfFmt.speedscope:
+        return FastJSONResponse(profiler.speedscope(counts, f"workers {seconds:g}s", interval_ms / 1000))
+    return PlainTextResponse(content=profiler.collapsed(counts))
+
+@app.get("/admin/queues", dependencies=[Depends(_require_admin)])
+async def admin_queues() -> dict:
+    """/metrics/queues con el detalle por cliente (X-Tenant o IP): en cola por carril, corriendo, espera p50 / p95."""
+    return SCHED.snapshot()
+
+@app.get("/admin/slow", dependencies=[Depends(_require_admin)])
+async def admin_slow(
+    vendor: Annotated[Optional[str], Query()] = None,  # clave del REGISTRY ("FALLBACK" = sin handler)
+    source: Annotated[Optional[str], Query()] = None,  # text | ocr | qr | embedded | split
+    limit: Annotated[int, Query(ge=1, le=1000)] = 50,
+) -> List[Dict[str, Any]]:
+    """Extracciones que pasaron EXTRACTOR_SLOW_MS: hash del PDF, ms por etapa, proveedor y fuente."""
+    log = jobs.slow_log()
+    return await run_in_threadpool(log.list, vendor, source, limit) if log is not None else []
+
+@app.get("/admin/slow/{entry_id}/profile", response_model=None, dependencies=[Depends(_require_admin)])
+async def admin_slow_profile(entry_id: int) -> Response:
+    """cProfile de una extracción lenta (formato pstats: snakeviz, python -m pstats)."""
+    log = jobs.slow_log()
+    data = await run_in_threadpool(log.profile, entry_id) if log is not None else None
+    if not data:
+        raise HTTPException(status_code=404, detail="Sin perfil para esa entrada.")
+    return Response(content=data, media_type="application/octet-stream",
+                    headers={"Content-Disposition": f'attachment; filename="slow-{entry_id}.prof"'})
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("server:app", host="0.0.0.0", port=8000, reload=True)
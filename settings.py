@@ -0,0 +1,87 @@
+# settings.py
+# Configuración por variables de entorno (Render / local). Todo tiene un default usable.
+import os
+
+
+def _flag(name: str, default: str) -> bool:
+    return os.environ.get(name, default).strip().lower() not in ("0", "false", "no", "")
+
+
+DATA_DIR = os.environ.get("EXTRACTOR_DATA_DIR", "data")
+
+# Índice de facturas duplicadas (SQLite)
+DEDUP_ENABLED = _flag("EXTRACTOR_DEDUP", "1")
+DEDUP_DB = os.environ.get("EXTRACTOR_DEDUP_DB", os.path.join(DATA_DIR, "dedup.sqlite3"))
+
+# Caché del texto extraído / OCR (SQLite, por hash del PDF + versión del backend)
+TEXT_CACHE_ENABLED = _flag("EXTRACTOR_TEXT_CACHE", "1")
+TEXT_CACHE_DB = os.environ.get("EXTRACTOR_TEXT_CACHE_DB", os.path.join(DATA_DIR, "text_cache.sqlite3"))
+
+# Disposición aprendida por formato de factura (SQLite, acotada a LAYOUT_CACHE_MAX formatos)
+LAYOUT_CACHE_ENABLED = _flag("EXTRACTOR_LAYOUT_CACHE", "1")
+LAYOUT_CACHE_DB = os.environ.get("EXTRACTOR_LAYOUT_CACHE_DB", os.path.join(DATA_DIR, "layouts.sqlite3"))
+LAYOUT_CACHE_MAX = int(os.environ.get("EXTRACTOR_LAYOUT_CACHE_MAX", "5000"))
+
+# Resultados de todas las extracciones (SQLite, results_store.py): /results y /results/export,
+# sólo con X-Admin-Token (ver ADMIN_TOKEN). Apagado salvo EXTRACTOR_RESULTS=1.
+RESULTS_ENABLED = _flag("EXTRACTOR_RESULTS", "0")
+RESULTS_DB = os.environ.get("EXTRACTOR_RESULTS_DB", os.path.join(DATA_DIR, "results.sqlite3"))
+
+# Plazo por request (segundos): default del servidor y máximo que puede pedir el cliente
+# (?timeout= o header X-Request-Timeout). Pasado el plazo + gracia, el worker se mata.
+DEADLINE_S = float(os.environ.get("EXTRACTOR_DEADLINE_S", "25"))
+DEADLINE_MAX_S = float(os.environ.get("EXTRACTOR_DEADLINE_MAX_S", "120"))
+KILL_GRACE_S = float(os.environ.get("EXTRACTOR_KILL_GRACE_S", "3"))
+
+# Diario del modo carpeta vigilada (watch_folder.py): PDFs ya procesados
+WATCH_JOURNAL_DB = os.environ.get("EXTRACTOR_WATCH_JOURNAL_DB", os.path.join(DATA_DIR, "watch_journal.sqlite3"))
+
+# Procesos de extracción (0 = en el proceso del servidor, sin poder matar un OCR colgado)
+WORKERS = int(os.environ.get("EXTRACTOR_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Memoria de los workers (memory_guard.py): se recicla el worker (entre trabajos, sin cortar
+# ninguno) pasados MAX_REQUESTS trabajos o con el RSS por encima de MAX_RSS_MB (0 = nunca).
+# FITZ_STORE_MB acota el store global de PyMuPDF; OCR_PAGES_IN_FLIGHT, páginas renderizadas a la vez.
+WORKER_MAX_REQUESTS = int(os.environ.get("EXTRACTOR_WORKER_MAX_REQUESTS", "1000"))
+WORKER_MAX_RSS_MB = float(os.environ.get("EXTRACTOR_WORKER_MAX_RSS_MB", "350"))
+FITZ_STORE_MB = float(os.environ.get("EXTRACTOR_FITZ_STORE_MB", "64"))
+OCR_PAGES_IN_FLIGHT = int(os.environ.get("EXTRACTOR_OCR_PAGES_IN_FLIGHT", "2"))
+
+# Planificador (scheduler.py): reparto justo entre clientes (X-Tenant / X-API-Key).
+# Pesos "caja=4,erp=1" (default 1), slots reservados al carril interactivo (con WORKERS=1 no hay
+# nada que reservar: hacen falta al menos 2) y tope de trabajos con OCR.
+TENANT_WEIGHTS = os.environ.get("EXTRACTOR_TENANT_WEIGHTS", "")
+INTERACTIVE_RESERVED = int(os.environ.get("EXTRACTOR_INTERACTIVE_RESERVED", "1"))
+OCR_SLOTS = int(os.environ.get("EXTRACTOR_OCR_SLOTS", "0"))  # 0 = sin tope aparte
+# Un cliente sin pedidos en cola ni corriendo se olvida (métricas y etiqueta) pasados estos segundos
+TENANT_IDLE_S = float(os.environ.get("EXTRACTOR_TENANT_IDLE_S", "600"))
+BATCH_CONCURRENCY = int(os.environ.get("EXTRACTOR_BATCH_CONCURRENCY", "0"))  # 0 = un archivo por worker
+# /extract/batch?ocr_batch=true: escaneos por job de OCR por lotes (ocr_batch.py)
+OCR_BATCH_SIZE = int(os.environ.get("EXTRACTOR_OCR_BATCH_SIZE", "8"))
+
+# Modo degradado (overload.py): con la cola o la CPU altas, los escaneos salen sin OCR y el OCR
+# queda diferido (deferred_ocr.py). Entra con cola >= HIGH o CPU >= CPU_HIGH (load average por
+# CPU; 0 = no mirar CPU); sale con cola <= LOW y CPU <= CPU_LOW durante HOLD_S segundos.
+# Apagado salvo EXTRACTOR_DEGRADE=1: una respuesta sin OCR cambia lo que recibe el cliente.
+DEGRADE_ENABLED = _flag("EXTRACTOR_DEGRADE", "0")
+DEGRADE_QUEUE_HIGH = int(os.environ.get("EXTRACTOR_DEGRADE_QUEUE_HIGH", "8"))
+DEGRADE_QUEUE_LOW = int(os.environ.get("EXTRACTOR_DEGRADE_QUEUE_LOW", "2"))
+DEGRADE_CPU_HIGH = float(os.environ.get("EXTRACTOR_DEGRADE_CPU_HIGH", "0.95"))
+DEGRADE_CPU_LOW = float(os.environ.get("EXTRACTOR_DEGRADE_CPU_LOW", "0.7"))
+DEGRADE_HOLD_S = float(os.environ.get("EXTRACTOR_DEGRADE_HOLD_S", "10"))
+DEFERRED_DB = os.environ.get("EXTRACTOR_DEFERRED_DB", os.path.join(DATA_DIR, "deferred.sqlite3"))
+DEFERRED_DIR = os.environ.get("EXTRACTOR_DEFERRED_DIR", os.path.join(DATA_DIR, "deferred"))
+DEFERRED_KEEP_H = float(os.environ.get("EXTRACTOR_DEFERRED_KEEP_H", "72"))  # terminados se borran pasadas estas horas
+# Prefijos de URL aceptados en X-Callback-Url, separados por coma (vacío = sin callbacks)
+CALLBACK_ALLOW = [p.strip() for p in os.environ.get("EXTRACTOR_CALLBACK_ALLOW", "").split(",") if p.strip()]
+
+# Diagnóstico (profiler.py). Endpoints /admin/* sólo con header X-Admin-Token = ADMIN_TOKEN
+# (vacío = deshabilitados). Las extracciones de más de SLOW_MS quedan en un anillo SQLite de
+# SLOW_LOG_MAX entradas con hash y tiempos por etapa; con SLOW_PROFILE, además el cProfile de una
+# fracción SLOW_PROFILE_RATE de las extracciones (una a la vez por proceso).
+ADMIN_TOKEN = os.environ.get("EXTRACTOR_ADMIN_TOKEN", "")
+PROFILE_DIR = os.environ.get("EXTRACTOR_PROFILE_DIR", os.path.join(DATA_DIR, "profile"))
+SLOW_MS = float(os.environ.get("EXTRACTOR_SLOW_MS", "5000"))  # 0 = no guardar
+SLOW_PROFILE = _flag("EXTRACTOR_SLOW_PROFILE", "0")
+SLOW_PROFILE_RATE = float(os.environ.get("EXTRACTOR_SLOW_PROFILE_RATE", "0.05"))
+SLOW_LOG_DB = os.environ.get("EXTRACTOR_SLOW_LOG_DB", os.path.join(DATA_DIR, "slow.sqlite3"))
+SLOW_LOG_MAX = int(os.environ.get("EXTRACTOR_SLOW_LOG_MAX", "200"))
@@ -0,0 +1,90 @@
+# text_cache.py
+# Caché local (SQLite) del texto extraído, separada del resultado: líneas normalizadas,
+# confianza OCR, páginas y campos del QR, por hash del contenido del PDF + versión del backend
+# (extraction_core.backend_version). Un cambio en handlers / NORMALIZATION_RULES / vendors.yaml
+# vuelve a correr sólo cabecera, handler y normalización; PyMuPDF / Tesseract no se tocan.
+# El payload va como JSON comprimido con zlib (unos pocos KB por factura).
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Iterator, Optional, Tuple
+
+from extraction_core import LineIndex
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS texts (
+    hash     TEXT NOT NULL,
+    backend  TEXT NOT NULL,
+    source   TEXT NOT NULL,
+    payload  BLOB NOT NULL,
+    created  REAL NOT NULL,
+    PRIMARY KEY (hash, backend)
+)
+"""
+
+
+def file_hash(path: str) -> str:
+    """sha256 del contenido (no del nombre): el mismo PDF subido dos veces es el mismo registro."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def pack_lines(lines: LineIndex) -> bytes:
+    # Las líneas ya vienen normalizadas (sin saltos), así que se guardan unidas por "\n"
+    data = {"s": lines.source, "l": "\n".join(lines), "c": lines.conf,
+            "p": lines.page_starts, "q": lines.qr}
+    return zlib.compress(json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6)
+
+
+def unpack_lines(blob: bytes) -> LineIndex:
+    data = json.loads(zlib.decompress(blob).decode("utf-8"))
+    lines = data["l"].split("\n") if data["l"] else []
+    return LineIndex(lines, source=data["s"], conf=data["c"], page_starts=data["p"], qr=data["q"])
+
+
+class TextCache:
+    def __init__(self, path: str):
+        d = os.path.dirname(path)
+        if d: os.makedirs(d, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(_SCHEMA)
+        self._db.commit()
+
+    def get(self, digest: str, backend: str) -> Optional[LineIndex]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT payload FROM texts WHERE hash = ? AND backend = ?", (digest, backend)
+            ).fetchone()
+        return unpack_lines(row[0]) if row else None
+
+    def put(self, digest: str, backend: str, lines: LineIndex) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO texts (hash, backend, source, payload, created) VALUES (?, ?, ?, ?, ?)",
+                (digest, backend, lines.source, pack_lines(lines), time.time()))
+
+    def entries(self, backend: Optional[str] = None) -> Iterator[Tuple[str, LineIndex]]:
+        """(hash, líneas) de todo lo guardado; para re-correr reglas sobre el archivo histórico."""
+        sql = "SELECT hash, payload FROM texts"
+        args: tuple = ()
+        if backend:
+            sql += " WHERE backend = ?"; args = (backend,)
+        with self._lock:
+            rows = self._db.execute(sql, args).fetchall()
+        for digest, blob in rows:
+            yield digest, unpack_lines(blob)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,179 @@
+# totals_solver.py
+# Reparación de totales que no cierran (total != subtotal + IVA + percepciones) sin volver a
+# extraer. Casi siempre los importes correctos ya están en las líneas y el handler los asignó mal:
+# GUERRINI toma "los primeros cuatro números" después de SUBTOTAL (una bonificación o un neto
+# no gravado corre todo un lugar), PIRELLI suma cualquier línea con "IVA" cerca de un importe.
+# - candidates(): importes del bloque de totales (desde el último SUBTOTAL / NETO o el primer
+#   TOTAL de la cola) en centavos, con sus repeticiones, a lo sumo MAX_CANDIDATES.
+# - solve(): busca subtotal S, IVA (una o dos alícuotas de IVA_RATES_CANON sobre S), hasta
+#   MAX_PERC percepciones y total T con S + IVA + P = T, todo en centavos enteros. Se poda por
+#   alícuota (el IVA esperado sobre S se busca entre los candidatos, no se prueba cada par), por
+#   T > S + IVA y por P <= S; las percepciones se buscan por suma (uno, par precalculado, terna)
+#   con bisect sobre los importes y las sumas de pares ordenados.
+#   Entre las soluciones gana la que conserva más campos de lo que leyó el handler, después la de
+#   menos percepciones y menos alícuotas y el total más grande; si empatan dos asignaciones
+#   distintas (en cualquier importe o alícuota, no sólo el subtotal) no se repara (no adivinamos).
+#   A lo sumo MAX_STEPS pasos por factura.
+from bisect import bisect_left
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from extractor_utils import parse_number_smart
+from patterns import NUM_ANY, RE_SUBTOTAL_WORD, RE_TOTAL_WORD
+
+TAIL = 150             # como _fallback_labels: el bloque de totales está al final
+WINDOW = 60            # líneas desde el rótulo (la ventana de GUERRINI)
+MAX_CANDIDATES = 24
+MAX_PERC = 3
+TOL_CENTS = 5          # mismo margen que _validate_and_repair (0,05)
+IVA_TOL_CENTS = 10     # IVA calculado por renglón: redondeos que se acumulan
+MAX_STEPS = 20_000
+
+_LABELS = ("SUBTOTAL", "SUB TOTAL", "NETO")
+_FIELDS = ("subtotal", "iva", "percepciones_total", "total")
+
+
+def _cents(v: Optional[float]) -> Optional[int]:
+    return None if v is None else int(round(v * 100))
+
+
+def candidates(lines: Sequence[str]) -> Dict[int, int]:
+    """
+    Importes positivos del bloque de totales en centavos -> veces que aparecen (dos percepciones
+    de la misma alícuota sobre el mismo neto dan el mismo importe). En orden de aparición.
+    """
+    n = len(lines); tail = max(0, n - TAIL); start = None
+    for i in range(n - 1, tail - 1, -1):
+        up = lines[i].upper()
+        if RE_SUBTOTAL_WORD.search(up) or any(k in up for k in _LABELS):
+            start = i; break
+    if start is None:
+        start = next((i for i in range(tail, n) if RE_TOTAL_WORD.search(lines[i])), None)
+    if start is None: return {}
+    out: Dict[int, int] = {}; found = 0
+    for line in lines[start:start + WINDOW]:
+        for m in NUM_ANY.finditer(line):
+            c = _cents(parse_number_smart(m.group(0)))
+            if c and c > 0:
+                out[c] = out.get(c, 0) + 1; found += 1
+                if found >= MAX_CANDIDATES: return out
+    return out
+
+
+class _Amounts:
+    """Candidatos con repeticiones: búsqueda con tolerancia (bisect) de un importe y de pares."""
+    __slots__ = ("counts", "keys", "pairs", "sums")
+
+    def __init__(self, counts: Dict[int, int]):
+        self.counts = counts
+        self.keys = sorted(counts)
+        self.pairs: Dict[int, List[Tuple[int, int]]] = {}
+        for k, a in enumerate(self.keys):
+            for b in self.keys[k if counts[a] > 1 else k + 1:]:
+                self.pairs.setdefault(a + b, []).append((a, b))
+        self.sums = sorted(self.pairs)
+
+    def near(self, x: int, tol: int) -> Optional[int]:
+        """El importe a no más de tol de x más cercano."""
+        keys = self.keys; k = bisect_left(keys, x - tol); best = None
+        while k < len(keys) and keys[k] <= x + tol:
+            if best is None or abs(keys[k] - x) < abs(best - x): best = keys[k]
+            k += 1
+        return best
+
+    def pairs_near(self, x: int, tol: int) -> Iterator[Tuple[int, int]]:
+        sums = self.sums; k = bisect_left(sums, x - tol)
+        while k < len(sums) and sums[k] <= x + tol:
+            yield from self.pairs[sums[k]]
+            k += 1
+
+    def fits(self, used: Counter, *take: int) -> bool:
+        """¿Quedan sin usar todos los importes de `take` (con repeticiones)?"""
+        counts = self.counts
+        if len(take) == 1: return used[take[0]] < counts[take[0]]
+        return all(used[v] + k <= counts[v] for v, k in Counter(take).items())
+
+
+def _iva_options(s: int, am: _Amounts, rates: Sequence[int],
+                 allow_none: bool) -> List[Tuple[Tuple[int, ...], Tuple[int, ...]]]:
+    """(importes de IVA, alícuotas en centésimos de punto) compatibles con el subtotal s."""
+    used = Counter((s,)); opts = []
+    for r in rates:
+        i = am.near(s * r // 10000, IVA_TOL_CENTS)
+        if i is not None and am.fits(used, i): opts.append(((i,), (r,)))
+    top = s * max(rates, default=0) // 10000 + IVA_TOL_CENTS
+    for i1 in am.keys:  # dos alícuotas: las bases suman s
+        if i1 >= top: break
+        for r1 in rates:
+            b1 = i1 * 10000 // r1
+            if b1 >= s: continue
+            for r2 in rates:
+                if r2 >= r1: continue  # cada par una vez
+                i2 = am.near((s - b1) * r2 // 10000, IVA_TOL_CENTS)
+                if i2 is not None and am.fits(used, i1, i2): opts.append(((i1, i2), (r1, r2)))
+    if allow_none: opts.append(((), ()))
+    return opts
+
+
+def _subset(r: int, am: _Amounts, used: Counter) -> Optional[Tuple[int, ...]]:
+    """Hasta MAX_PERC importes no usados que suman r (± TOL_CENTS); el de menos importes."""
+    if abs(r) <= TOL_CENTS: return ()
+    c = am.near(r, TOL_CENTS)
+    if c is not None and am.fits(used, c): return (c,)
+    if MAX_PERC < 2: return None
+    for a, b in am.pairs_near(r, TOL_CENTS):
+        if am.fits(used, a, b): return (a, b)
+    if MAX_PERC < 3: return None
+    for a in am.keys:
+        if a >= r: break
+        if not am.fits(used, a): continue
+        for b, c in am.pairs_near(r - a, TOL_CENTS):
+            if a <= b and am.fits(used, a, b, c): return (a, b, c)
+    return None
+
+
+def solve(lines: Sequence[str], out: Dict[str, Any], rates: Sequence[float],
+          fixed_total: Optional[float] = None, trace: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Asignación de los importes del bloque de totales que cierra contablemente con alguna de las
+    alícuotas `rates` (%), o None.
+    Devuelve {"subtotal", "iva": [(alícuota, monto)], "percepciones": [montos], "total",
+    "candidatos"} en pesos. Con fixed_total (el del QR AFIP) el total no se toca.
+    Con `trace`, trace["pasos"] y trace["candidatos"] aunque no haya solución.
+    """
+    counts = candidates(lines)
+    found = sum(counts.values())
+    if found < 2: return None
+    am = _Amounts(counts)
+    bps = [int(round(r * 100)) for r in rates]
+    orig = [_cents(out.get(f)) for f in _FIELDS]
+    fixed = _cents(fixed_total)
+    totals = am.keys[::-1] if fixed is None else [fixed]
+    allow_none = not out.get("iva")  # sin IVA leído (Factura C / exento) se admite IVA 0
+
+    best = None; tied = False; steps = 0
+    for s in counts:
+        if steps > MAX_STEPS: break
+        for ivas, rs in _iva_options(s, am, bps, allow_none):
+            base = s + sum(ivas); used = Counter((s, *ivas))
+            for t in totals:
+                steps += 1
+                if steps > MAX_STEPS: break
+                if t < base - TOL_CENTS: break  # totales ordenados de mayor a menor
+                if t - base > s or (fixed is None and not am.fits(used, t)): continue
+                percs = _subset(t - base, am, used + Counter((t,)) if fixed is None else used)
+                if percs is None: continue
+                kept = sum(o is not None and abs(o - v) <= TOL_CENTS
+                           for o, v in zip(orig, (s, sum(ivas), sum(percs), t)))
+                key = (-kept, len(percs), len(ivas), -t)
+                sol = (s, ivas, rs, percs, t)
+                if best is None or key < best[0]:
+                    best = (key, sol); tied = False
+                elif key == best[0] and sol != best[1]:
+                    tied = True  # p. ej. IVA 10,5% + percepción o IVA 21% + otra percepción
+    if trace is not None: trace.update(pasos=steps, candidatos=found)
+    if best is None or tied: return None
+    s, ivas, rs, percs, t = best[1]
+    return {"subtotal": s / 100, "iva": [(r / 100, i / 100) for r, i in zip(rs, ivas)],
+            "percepciones": [p / 100 for p in percs], "total": t / 100,
+            "candidatos": found}
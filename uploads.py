@@ -2,11 +2,47 @@
 import os
 import tempfile
 import time
+from typing import Optional
 from fastapi import UploadFile, HTTPException
 
+from extraction_core import SNIFF_BYTES, sniff_bytes
+
+SUFFIXES = {"pdf": ".pdf", "jpeg": ".jpg", "png": ".png", "tiff": ".tif"}
+UNSUPPORTED = "Formato no soportado: se aceptan PDF, JPEG, PNG o TIFF."
+
 class Uploads:
     """Servicio para manejar archivos temporales subidos."""
 
+    @staticmethod
+    def sniff(file: UploadFile) -> Optional[str]:
+        """Formato del archivo subido por sus primeros bytes ("pdf", "jpeg", "png", "tiff" o None)."""
+        file.file.seek(0)
+        head = file.file.read(SNIFF_BYTES)
+        file.file.seek(0)
+        return sniff_bytes(head)
+
+    @staticmethod
+    def save_temp_document(file: UploadFile) -> str:
+        """
+        Como save_temp_pdf pero acepta también JPEG / PNG / TIFF; el formato sale de los bytes,
+        no de la extensión (una foto llamada factura.pdf es una foto).
+        """
+        fmt = Uploads.sniff(file)
+        if fmt is None:
+            raise HTTPException(status_code=400, detail=UNSUPPORTED)
+        try:
+            with tempfile.NamedTemporaryFile(delete=False, suffix=SUFFIXES[fmt]) as tmp:
+                while True:
+                    chunk = file.file.read(1024 * 1024)  # 1 MB
+                    if not chunk:
+                        break
+                    tmp.write(chunk)
+                return tmp.name
+        except Exception as e:
+            raise HTTPException(
+                status_code=500, detail=f"Error guardando archivo temporal: {str(e)}"
+            )
+
     @staticmethod
     def save_temp_pdf(file: UploadFile) -> str:
         """
@@ -0,0 +1,203 @@
+# vendor_index.py
+# Índice de detección de proveedor armado desde vendors.yaml.
+# - Nombres: autómata Aho-Corasick sobre tokens normalizados (sin acentos, mayúsculas),
+#   una sola pasada por la cabecera sin importar cuántos proveedores haya.
+# - CUITs: hash por dígitos (30677018816 == 30-67701881-6), sólo CUITs con dígito verificador válido.
+# - Score: combina ambos tipos de hit; gana el proveedor con mayor puntaje.
+# - Con pocos nombres / CUITs (el caso normal: un puñado de proveedores) el autómata y la regex de
+#   CUIT cuestan más que buscar cada uno con str.find sobre la cabecera; hasta FIND_MAX se busca
+#   así (mismo resultado: se verifica que sea la misma secuencia de tokens / el mismo CUIT).
+import re
+import unicodedata
+from collections import deque
+from itertools import islice
+from typing import Dict, List, Optional, Tuple, Iterable
+
+from extractor_utils import RE_CUIT, cuit_digits, cuit_is_valid
+
+HEADER_LINES = 120
+SCORE_NAME = 1.0   # por cada nombre distinto encontrado
+SCORE_CUIT = 2.0   # por cada CUIT de la cabecera que pertenece al proveedor
+FIND_MAX = 64      # hasta cuántos nombres (y CUITs) se buscan con str.find en vez del autómata
+
+_RE_TOKEN = re.compile(r'[A-Z0-9]+')
+_TOKEN_CHARS = frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789')
+
+
+def _nfkd_ascii(s: str) -> str:
+    # NFKD separa los acentos; al pasar a ASCII se descartan (Á -> A, Ñ -> N)
+    return unicodedata.normalize('NFKD', s).encode('ascii', 'ignore').decode('ascii')
+
+
+# Latín-1 carácter por carácter con bytes.translate (en C, mayúsculas incluidas): lo mismo que
+# upper() + NFKD para los acentos del castellano. Lo que no es Latín-1 o no se resuelve con un
+# byte (½ -> 1/2, ß -> SS, ª -> a) queda marcado con \x00 y va por el camino largo.
+def _fold(c: int) -> bytes:
+    f = _nfkd_ascii(chr(c).upper())
+    return f.encode('ascii') if len(f) <= 1 and f == f.upper() else b'\x00'
+
+_FOLD = {c: _fold(c) for c in range(0x80, 0x100)}
+_FOLD_TABLE = bytes(_FOLD[c][0] if _FOLD.get(c) else ord(chr(c).upper()) if c < 0x80 else c for c in range(256))
+_FOLD_DELETE = bytes(c for c, f in _FOLD.items() if not f)
+
+
+def normalize_text(s: str) -> str:
+    if s.isascii(): return s.upper()
+    try:
+        b = s.encode('latin-1').translate(_FOLD_TABLE, _FOLD_DELETE)
+    except UnicodeEncodeError:
+        b = b'\x00'
+    if b'\x00' in b: return _nfkd_ascii(s.upper())
+    return b.decode('ascii')
+
+
+def tokenize(s: str) -> List[str]:
+    return _RE_TOKEN.findall(normalize_text(s))
+
+
+class AhoCorasick:
+    """Autómata sobre secuencias de tokens. Devuelve los ids de patrón encontrados."""
+
+    def __init__(self, patterns: Iterable[Tuple[int, List[str]]]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[Tuple[int, ...]] = [()]
+        for pid, toks in patterns:
+            if not toks: continue
+            s = 0
+            for t in toks:
+                nxt = self.goto[s].get(t)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[s][t] = nxt
+                    self.goto.append({}); self.fail.append(0); self.out.append(())
+                s = nxt
+            self.out[s] = self.out[s] + (pid,)
+        # BFS para links de falla
+        q = deque(self.goto[0].values())
+        while q:
+            s = q.popleft()
+            for t, nxt in self.goto[s].items():
+                q.append(nxt)
+                f = self.fail[s]
+                while f and t not in self.goto[f]:
+                    f = self.fail[f]
+                cand = self.goto[f].get(t, 0)
+                self.fail[nxt] = cand if cand != nxt else 0
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def search(self, tokens: Iterable[str]) -> Dict[int, int]:
+        """{pattern_id: posición (token) del primer hit}"""
+        goto, fail, out = self.goto, self.fail, self.out
+        root = goto[0]
+        hits: Dict[int, int] = {}
+        s = 0
+        for pos, t in enumerate(tokens):
+            while s and t not in goto[s]:
+                s = fail[s]
+            s = goto[s].get(t, 0) if s else root.get(t, 0)
+            if out[s]:
+                for pid in out[s]:
+                    if pid not in hits: hits[pid] = pos
+        return hits
+
+
+class VendorIndex:
+    def __init__(self, names: Dict[str, list], cuits: Dict[str, str]):
+        self.vendors: List[str] = []
+        self._order: Dict[str, int] = {}
+        self._pattern_vendor: List[str] = []
+        seen = set()
+        patterns: List[Tuple[int, List[str]]] = []
+        self._patterns = patterns
+        for vid, keys in names.items():
+            vid = vid.upper()
+            if vid not in self._order:
+                self._order[vid] = len(self.vendors); self.vendors.append(vid)
+            for k in keys:
+                toks = tokenize(k)
+                if not toks or (vid, tuple(toks)) in seen: continue
+                seen.add((vid, tuple(toks)))
+                patterns.append((len(self._pattern_vendor), toks))
+                self._pattern_vendor.append(vid)
+        self.automaton = AhoCorasick(patterns)
+        self.cuit_map: Dict[str, str] = {}
+        for cuit, vid in cuits.items():
+            d = cuit_digits(cuit)
+            if cuit_is_valid(d):
+                self.cuit_map[d] = vid.upper()
+                if vid.upper() not in self._order:
+                    self._order[vid.upper()] = len(self.vendors); self.vendors.append(vid.upper())
+
+    @classmethod
+    def from_config(cls, cfg: Dict) -> "VendorIndex":
+        det = cfg.get("detect", {})
+        return cls(det.get("names", {}), det.get("cuits", {}))
+
+    def match_cuit(self, cuit: Optional[str]) -> Optional[str]:
+        d = cuit_digits(cuit)
+        if not cuit_is_valid(d): return None
+        return self.cuit_map.get(d)
+
+    def _name_hits(self, text: str) -> Iterable[int]:
+        """Ids de patrón presentes en el texto normalizado (secuencia de tokens completa)."""
+        if len(self._patterns) > FIND_MAX:
+            return self.automaton.search(_RE_TOKEN.findall(text))
+        return [pid for pid, toks in self._patterns if _find_tokens(text, toks)]
+
+    def _cuit_hits(self, text: str) -> List[str]:
+        """CUITs del mapa (dígitos, ya validados al armar el índice) que aparecen en el texto."""
+        if len(self.cuit_map) <= FIND_MAX:
+            return [d for d in self.cuit_map if _find_cuit(text, d)]
+        found = {cuit_digits(m.group(0)) for m in RE_CUIT.finditer(text)}
+        return [d for d in found if d in self.cuit_map]
+
+    def scores(self, lines: List[str]) -> Dict[str, float]:
+        # '\n' entre líneas: separa tokens igual que un espacio y un CUIT no queda partido en dos
+        text = normalize_text('\n'.join(lines[:HEADER_LINES]))
+        out: Dict[str, float] = {}
+        for pid in self._name_hits(text):
+            vid = self._pattern_vendor[pid]
+            out[vid] = out.get(vid, 0.0) + SCORE_NAME
+        if self.cuit_map:
+            for d in self._cuit_hits(text):
+                vid = self.cuit_map[d]
+                out[vid] = out.get(vid, 0.0) + SCORE_CUIT
+        return out
+
+    def detect(self, lines: List[str]) -> Optional[str]:
+        sc = self.scores(lines)
+        if not sc: return None
+        # Empate: gana el que aparece primero en vendors.yaml
+        return max(sc, key=lambda v: (sc[v], -self._order[v]))
+
+
+def _find_tokens(text: str, toks: List[str]) -> bool:
+    """¿Aparecen los tokens `toks` seguidos en `text` (ya normalizado)? str.find del primero y se verifica."""
+    first = toks[0]; n = len(toks); i = text.find(first)
+    while i != -1:
+        if i == 0 or text[i - 1] not in _TOKEN_CHARS:
+            if [m.group(0) for m in islice(_RE_TOKEN.finditer(text, i), n)] == toks:
+                return True
+        i = text.find(first, i + 1)
+    return False
+
+
+def _find_cuit(text: str, d: str) -> bool:
+    """¿Aparece el CUIT `d` (11 dígitos) como lo reconoce RE_CUIT (con o sin guiones / espacios)?"""
+    mid = d[2:10]; i = text.find(mid); n = len(text)
+    while i != -1:
+        j = i + 8
+        start = i - 2 if text[max(0, i - 2):i] == d[:2] else (
+            i - 3 if i >= 3 and text[i - 1] in "- " and text[i - 3:i - 1] == d[:2] else -1)
+        end = j + 1 if text[j:j + 1] == d[10] else (
+            j + 2 if j + 1 < n and text[j] in "- " and text[j + 1] == d[10] else -1)
+        if start >= 0 and end >= 0 and not _word(text, start - 1) and not _word(text, end):
+            return True
+        i = text.find(mid, i + 1)
+    return False
+
+
+def _word(text: str, i: int) -> bool:
+    """¿Hay un carácter de palabra (\\w) en i? Fuera del texto, no: lo mismo que \\b de RE_CUIT."""
+    return 0 <= i < len(text) and (text[i].isalnum() or text[i] == "_")
@@ -2,15 +2,28 @@
 # Permite aplicar un registro central de "Proveedores" 
 # y sus funciones de extraccion especificas.
 # Aca se suma nuevos vendedores, sin modificar el core
-from typing import Dict, Callable, Any, List
+from typing import Dict, Callable, Any, List, Optional
 
 VendorHandler = Callable[[List[str], dict], None]
 
 REGISTRY: Dict[str, VendorHandler] = {}
 
+# Parsers de datos estructurados embebidos en el PDF (adjuntos XML/JSON, XMP).
+# Reciben (nombre del adjunto, bytes) y devuelven el OUT interno completo, o None si no es su formato.
+EmbeddedParser = Callable[[str, bytes], Optional[Dict[str, Any]]]
+
+EMBEDDED_PARSERS: Dict[str, EmbeddedParser] = {}
+
 def register(vendor_id: str):
     
     def deco(fn: VendorHandler):
         REGISTRY[vendor_id.upper()] = fn
         return fn   
-    return deco
\ No newline at end of file
+    return deco
+
+def register_embedded(schema_id: str):
+
+    def deco(fn: EmbeddedParser):
+        EMBEDDED_PARSERS[schema_id.lower()] = fn
+        return fn
+    return deco
@@ -0,0 +1,356 @@
+# watch_folder.py
+# Modo demonio: vigila carpetas compartidas donde las sucursales dejan los PDFs de proveedores
+# y escribe el resultado al lado de cada PDF (o en una bandeja de salida) sin pasar por HTTP.
+#   python watch_folder.py \\\\srv\\facturas D:\\entrada --outbox D:\\salida --format kv,json
+# - Detección: inotify (inotify_simple, opcional) + una recorrida completa cada RESCAN_S, porque
+#   en unidades de red (SMB / NFS) las escrituras de otra máquina no generan eventos; sin
+#   inotify, recorrida cada POLL_S.
+# - Un PDF se procesa cuando tamaño y mtime no cambian durante STABLE_S (copias a medio escribir).
+# - Extracción en el pool de procesos del servidor (worker_pool + jobs.extract_job).
+# - Salida .json / .kv / .ini (mismas plantillas que /extract), escrita en un .tmp y renombrada.
+# - Diario SQLite de lo procesado (ruta, tamaño, mtime, hash, resultado): al reiniciar no se
+#   rehace nada; el mismo contenido con otro nombre tampoco (se escribe su salida del resultado guardado).
+# - Errores transitorios (OSError: archivo bloqueado por SMB, permisos; tiempo agotado) se
+#   reintentan con espera creciente hasta RETRY_MAX veces; sólo lo que no se puede leer queda
+#   como error definitivo.
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import jobs
+import output_writers
+import settings
+from extraction_core import _optional
+from extractor_utils import cuit_digits
+from extractor_v6 import partial_payload
+from text_cache import file_hash
+from worker_pool import WorkerPool, WorkerCancelled, WorkerTimeout
+
+log = logging.getLogger("watch_folder")
+
+FORMATS = ("json", "kv", "ini")
+# PDFs y escaneos / fotos sueltos; la extensión sólo filtra la carpeta (al lado quedan los .kv / .json),
+# el formato real lo decide el extractor por los bytes
+INPUT_EXT = (".pdf", ".jpg", ".jpeg", ".png", ".tif", ".tiff")
+STABLE_S = 2.0     # sin cambios de tamaño / mtime durante esto -> el archivo terminó de copiarse
+POLL_S = 2.0       # recorrida sin inotify
+RESCAN_S = 60.0    # recorrida completa aunque haya inotify (unidades de red)
+RETRY_MAX = 4      # intentos ante errores transitorios antes de darlo por hecho
+RETRY_BASE_S = 30.0  # espera antes del 2do intento; se duplica en cada uno
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS processed (
+    path      TEXT NOT NULL,
+    size      INTEGER NOT NULL,
+    mtime_ns  INTEGER NOT NULL,
+    hash      TEXT NOT NULL,
+    status    TEXT NOT NULL,
+    outputs   TEXT,
+    error     TEXT,
+    done_at   REAL NOT NULL,
+    result    TEXT,
+    PRIMARY KEY (path, size, mtime_ns)
+)
+"""
+
+FileId = Tuple[str, int, int]  # (ruta absoluta, tamaño, mtime_ns)
+
+
+class WatchJournal:
+    """Diario de PDFs procesados. Un archivo cuenta como hecho por (ruta, tamaño, mtime) o por hash."""
+
+    def __init__(self, path: str):
+        d = os.path.dirname(path)
+        if d: os.makedirs(d, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(_SCHEMA)
+        cols = {r[1] for r in self._db.execute("PRAGMA table_info(processed)")}
+        if "result" not in cols:  # diarios anteriores sin el resultado
+            self._db.execute("ALTER TABLE processed ADD COLUMN result TEXT")
+        self._db.execute("CREATE INDEX IF NOT EXISTS processed_hash ON processed (hash)")
+        self._db.commit()
+
+    def seen(self) -> Set[FileId]:
+        with self._lock:
+            return {tuple(r) for r in self._db.execute("SELECT path, size, mtime_ns FROM processed")}
+
+    def result_for(self, digest: str) -> Optional[Dict[str, Any]]:
+        """Resultado guardado del mismo contenido (None si no hay o es de un diario anterior)."""
+        with self._lock:
+            row = self._db.execute("SELECT result FROM processed WHERE hash = ? AND result IS NOT NULL "
+                                   "ORDER BY done_at DESC LIMIT 1", (digest,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def record(self, fid: FileId, digest: str, status: str, outputs: Sequence[str] = (),
+               error: Optional[str] = None, result: Optional[Dict[str, Any]] = None) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO processed (path, size, mtime_ns, hash, status, outputs, error, done_at, result) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (fid[0], fid[1], fid[2], digest, status, "\n".join(outputs), error, time.time(),
+                 json.dumps(result, ensure_ascii=False) if result is not None else None))
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    """Escribe en path.tmp y renombra: quien lee la carpeta nunca ve un archivo a medias."""
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def render_outputs(minimal: Dict[str, Any], formats: Iterable[str]) -> Dict[str, bytes]:
+    """{extensión: bytes} con las mismas plantillas que /extract (CUIT sólo dígitos)."""
+    if minimal.get("cuit"):
+        minimal["cuit"] = cuit_digits(minimal["cuit"])
+    return {fmt: output_writers.render(minimal, fmt) for fmt in formats}
+
+
+class FolderWatcher:
+    def __init__(self, dirs: Sequence[str], outbox: Optional[str] = None, formats: Sequence[str] = ("kv",),
+                 vendor: Optional[str] = None, journal: Optional[WatchJournal] = None,
+                 pool: Optional[WorkerPool] = None, deadline_s: float = settings.DEADLINE_MAX_S):
+        self.dirs = [os.path.abspath(d) for d in dirs]
+        self.outbox = os.path.abspath(outbox) if outbox else None
+        self.formats = list(formats)
+        self.vendor = vendor
+        self.journal = journal or WatchJournal(settings.WATCH_JOURNAL_DB)
+        self.pool = pool
+        self.deadline_s = deadline_s
+        self._done: Set[FileId] = self.journal.seen()
+        self._pending: Dict[str, Tuple[int, int, float]] = {}  # ruta -> (tamaño, mtime_ns, desde cuándo igual)
+        self._busy: Set[str] = set()
+        self._retry: Dict[str, Tuple[int, float]] = {}  # ruta -> (intentos fallidos, no antes de)
+        self._prefix = _outbox_prefixes(self.dirs) if self.outbox else {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=pool.size if pool else 1)
+        if self.outbox: os.makedirs(self.outbox, exist_ok=True)
+
+    # ---- detección ----
+    def candidates(self) -> Iterable[str]:
+        for d in self.dirs:
+            try:
+                entries = list(os.scandir(d))
+            except OSError as e:
+                log.warning("no se puede leer %s: %s", d, e); continue
+            for e in entries:
+                if e.is_file() and e.name.lower().endswith(INPUT_EXT) and not e.name.startswith((".", "~")):
+                    yield e.path
+
+    def offer(self, path: str, now: Optional[float] = None) -> None:
+        """Registra un PDF visto (evento o recorrida); se procesa cuando queda quieto STABLE_S."""
+        now = time.monotonic() if now is None else now
+        try:
+            st = os.stat(path)
+        except OSError:
+            self._pending.pop(path, None); return
+        fid = (path, st.st_size, st.st_mtime_ns)
+        if fid in self._done or path in self._busy: return
+        retry = self._retry.get(path)
+        if retry and now < retry[1]: return
+        prev = self._pending.get(path)
+        if prev is None or prev[:2] != fid[1:]:
+            self._pending[path] = (st.st_size, st.st_mtime_ns, now)
+
+    def ready(self, now: Optional[float] = None) -> List[str]:
+        """PDFs quietos hace STABLE_S (se vuelve a mirar el tamaño: si cambió, el reloj arranca de nuevo)."""
+        now = time.monotonic() if now is None else now
+        out = []
+        for p in list(self._pending):
+            self.offer(p, now)
+            ent = self._pending.get(p)
+            if ent and ent[0] > 0 and now - ent[2] >= STABLE_S:
+                out.append(p)
+        return out
+
+    # ---- proceso ----
+    def submit(self, path: str) -> None:
+        size, mtime_ns, _ = self._pending.pop(path)
+        with self._lock:
+            self._busy.add(path)
+        self._executor.submit(self._process, (path, size, mtime_ns))
+
+    def _outputs_for(self, path: str) -> Dict[str, str]:
+        base = self._prefix.get(os.path.dirname(path), "") + os.path.splitext(os.path.basename(path))[0]
+        folder = self.outbox or os.path.dirname(path)
+        return {fmt: os.path.join(folder, f"{base}.{fmt}") for fmt in self.formats}
+
+    def _write(self, path: str, minimal: Dict[str, Any]) -> List[str]:
+        targets = self._outputs_for(path)
+        for fmt, data in render_outputs(minimal, self.formats).items():
+            write_atomic(targets[fmt], data)
+        return list(targets.values())
+
+    def _again(self, fid: FileId, why: str) -> bool:
+        """Agenda otro intento tras un error transitorio; False si ya se agotaron."""
+        path = fid[0]
+        tries = self._retry.get(path, (0, 0.0))[0] + 1
+        if tries >= RETRY_MAX:
+            self._retry.pop(path, None)
+            return False
+        wait = RETRY_BASE_S * 2 ** (tries - 1)
+        self._retry[path] = (tries, time.monotonic() + wait)
+        log.warning("%s: %s; reintento %d/%d en %.0f s", path, why, tries + 1, RETRY_MAX, wait)
+        return True
+
+    def _extract(self, path: str) -> Dict[str, Any]:
+        deadline_ts = time.time() + self.deadline_s
+        if self.pool is None:
+            return jobs.extract_job(path, self.vendor, False, deadline_ts)
+        try:
+            return self.pool.run(jobs.extract_job, path, self.vendor, False, deadline_ts,
+                                 timeout=self.deadline_s + settings.KILL_GRACE_S)
+        except (WorkerTimeout, WorkerCancelled):
+            return partial_payload("timeout")
+
+    def _process(self, fid: FileId) -> None:
+        path = fid[0]; digest = ""
+        try:
+            digest = file_hash(path)
+            prev = self.journal.result_for(digest)
+            if prev is not None:
+                # mismo contenido ya procesado (otro nombre o re-copiado): no se extrae de nuevo,
+                # pero el nombre nuevo tiene su salida
+                outputs = self._write(path, prev)
+                self.journal.record(fid, digest, "duplicate", outputs, result=prev)
+                log.info("%s: ya procesado (mismo contenido) -> %s", path, ", ".join(outputs))
+            else:
+                minimal = self._extract(path)
+                if minimal.get("_meta", {}).get("partial") and self._again(fid, "tiempo agotado"):
+                    return
+                status = "partial" if minimal.get("_meta", {}).get("partial") else "ok"
+                outputs = self._write(path, minimal)
+                self.journal.record(fid, digest, status, outputs, result=minimal if status == "ok" else None)
+                log.info("%s: %s -> %s", path, status, ", ".join(outputs))
+        except OSError as e:
+            # bloqueado por otra máquina, permisos, red caída: se vuelve a intentar
+            if self._again(fid, f"{type(e).__name__}: {e}"):
+                return
+            self._fail(fid, digest, e)
+        except Exception as e:
+            # PDF ilegible: reintentar en loop no sirve de nada
+            log.exception("%s: error", path)
+            self._fail(fid, digest, e)
+        finally:
+            with self._lock:
+                self._busy.discard(path)
+        with self._lock:
+            self._done.add(fid)
+        self._retry.pop(path, None)
+
+    def _fail(self, fid: FileId, digest: str, e: BaseException) -> None:
+        """Error definitivo: queda en el diario y no se reintenta hasta que el archivo cambie."""
+        try: self.journal.record(fid, digest, "error", error=f"{type(e).__name__}: {e}")
+        except Exception: pass
+
+    # ---- ciclo ----
+    def scan(self) -> None:
+        for p in self.candidates():
+            self.offer(p)
+
+    def step(self) -> int:
+        """Despacha lo que está listo; devuelve cuántos archivos salieron a procesar."""
+        now = time.monotonic()
+        for p, (_, at) in list(self._retry.items()):  # sin esperar a la próxima recorrida
+            if at <= now and p not in self._pending: self.offer(p, now)
+        batch = self.ready()
+        for p in batch:
+            self.submit(p)
+        return len(batch)
+
+    def run(self, stop: Optional[threading.Event] = None) -> None:
+        stop = stop or threading.Event()
+        ino = _inotify(self.dirs)
+        log.info("vigilando %s (%s)", ", ".join(self.dirs), "inotify" if ino else "recorrida")
+        last_scan = 0.0
+        while not stop.is_set():
+            now = time.monotonic()
+            if ino is None or now - last_scan >= RESCAN_S:
+                self.scan(); last_scan = now
+            if ino is not None:
+                for path in _inotify_read(ino, POLL_S):
+                    if path.lower().endswith(INPUT_EXT): self.offer(path)
+            self.step()
+            if ino is None:  # con inotify la espera es el read()
+                stop.wait(POLL_S)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self.journal.close()
+
+
+def _outbox_prefixes(dirs: Sequence[str]) -> Dict[str, str]:
+    """
+    Con varias carpetas y una sola bandeja de salida, prefijo por carpeta ("entrada_factura.kv")
+    para que dos PDFs con el mismo nombre no se pisen; nombres de carpeta repetidos llevan número.
+    """
+    if len(dirs) < 2: return {}
+    out: Dict[str, str] = {}; used: Set[str] = set()
+    for d in dirs:
+        name = os.path.basename(d.rstrip("\\/")) or "raiz"; tag = name; k = 2
+        while tag in used:
+            tag = f"{name}{k}"; k += 1
+        used.add(tag); out[d] = tag + "_"
+    return out
+
+
+def _inotify(dirs: Sequence[str]):
+    """(INotify, {wd: carpeta}) o None si no hay inotify_simple / no es Linux."""
+    mod = _optional("inotify_simple")
+    if mod is None: return None
+    try:
+        ino = mod.INotify()
+        mask = mod.flags.CLOSE_WRITE | mod.flags.MOVED_TO
+        return ino, {ino.add_watch(d, mask): d for d in dirs}
+    except OSError:
+        return None
+
+
+def _inotify_read(ino, timeout_s: float) -> List[str]:
+    handle, wds = ino
+    return [os.path.join(wds[ev.wd], ev.name) for ev in handle.read(timeout=int(timeout_s * 1000))
+            if ev.wd in wds and ev.name]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Extrae los PDFs que aparecen en carpetas vigiladas.")
+    ap.add_argument("dirs", nargs="+", help="carpetas a vigilar")
+    ap.add_argument("--outbox", help="carpeta de salida (default: al lado de cada PDF)")
+    ap.add_argument("--format", default="kv", help="json,kv,ini (separados por coma)")
+    ap.add_argument("--vendor", help="proveedor fijo (default: detección automática)")
+    ap.add_argument("--workers", type=int, default=settings.WORKERS)
+    args = ap.parse_args(argv)
+    formats = [f.strip() for f in args.format.split(",") if f.strip()]
+    bad = [f for f in formats if f not in FORMATS]
+    if bad: ap.error(f"formato desconocido: {', '.join(bad)}")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    pool = WorkerPool(args.workers, initializer=jobs.init_worker, max_requests=settings.WORKER_MAX_REQUESTS,
+                      max_rss_mb=settings.WORKER_MAX_RSS_MB) if args.workers > 0 else None
+    if pool: pool.warm()
+    watcher = FolderWatcher(args.dirs, args.outbox, formats, args.vendor, pool=pool)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+        if pool: pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
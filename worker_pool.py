@@ -0,0 +1,169 @@
+# worker_pool.py
+# Pool de procesos para la extracción: cada worker es un ProcessPoolExecutor de un solo proceso,
+# así un worker colgado (Tesseract / pdftoppm que no respeta el plazo) se mata y se reemplaza
+# sin tirar abajo a los demás. El plazo cooperativo (deadline.py) corta antes; esto es la red.
+# Memoria (memory_guard): cada trabajo informa su pico de RSS; un worker que llegó a max_requests
+# trabajos o quedó por encima de max_rss_mb se recicla entre trabajos (nunca con uno en curso):
+# sale del pool, se cierra, arranca otro proceso y recién entonces vuelve.
+import concurrent.futures as cf
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque
+import multiprocessing
+import queue
+import threading
+import time
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from memory_guard import metered
+
+POLL_S = 0.2  # cada cuánto se mira si el cliente se fue mientras se espera el resultado
+PEAK_WINDOW = 1000  # últimos trabajos para los percentiles de memoria
+
+
+class WorkerTimeout(Exception):
+    """El trabajo pasó el plazo duro; el worker se mató."""
+
+
+class WorkerCancelled(Exception):
+    """Se canceló el trabajo (cliente desconectado); el worker se mató."""
+
+
+class _Worker:
+    def __init__(self, ctx, initializer: Optional[Callable] = None):
+        self._ctx = ctx; self._initializer = initializer
+        self.executor = cf.ProcessPoolExecutor(max_workers=1, mp_context=ctx, initializer=initializer)
+        self.jobs = 0
+        self.rss_mb: Optional[float] = None
+
+    def recycle(self) -> None:
+        """Cierra el proceso (ocioso: no se le quita nada) y deja otro ya arrancado."""
+        self.executor.shutdown(wait=True)
+        self.executor = cf.ProcessPoolExecutor(max_workers=1, mp_context=self._ctx, initializer=self._initializer)
+        self.jobs = 0; self.rss_mb = None
+        self.executor.submit(int).result()
+
+    def kill(self) -> None:
+        # ProcessPoolExecutor no expone los procesos; terminate() es lo único que corta un OCR colgado
+        for proc in list((getattr(self.executor, "_processes", None) or {}).values()):
+            try: proc.terminate()
+            except Exception: pass
+        try: self.executor.shutdown(wait=False, cancel_futures=True)
+        except Exception: pass
+        self.executor = cf.ProcessPoolExecutor(max_workers=1, mp_context=self._ctx, initializer=self._initializer)
+        self.jobs = 0; self.rss_mb = None
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class WorkerPool:
+    def __init__(self, size: int, initializer: Optional[Callable] = None, start_method: str = "spawn",
+                 max_requests: int = 0, max_rss_mb: float = 0.0):
+        """max_requests / max_rss_mb: reciclar el worker pasado ese número de trabajos / ese RSS (0 = nunca)."""
+        ctx = multiprocessing.get_context(start_method)
+        self.size = size
+        self.max_requests = max_requests
+        self.max_rss_mb = max_rss_mb
+        self._workers: List[_Worker] = [_Worker(ctx, initializer) for _ in range(size)]
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        for w in self._workers: self._idle.put(w)
+        self.killed = 0
+        self.recycled = 0
+        self._peaks: Dict[str, Deque[float]] = {}
+        self._peak_max: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def warm(self) -> None:
+        """Arranca los procesos (e importa el extractor vía initializer) antes del primer request."""
+        for w in self._workers: w.executor.submit(int)
+
+    def busy(self) -> int:
+        return self.size - self._idle.qsize()
+
+    def run(self, fn: Callable, *args: Any, timeout: Optional[float] = None,
+            cancel: Optional[threading.Event] = None) -> Any:
+        """
+        Corre fn(*args) en un worker libre y espera el resultado.
+        timeout: plazo duro en segundos (incluye la espera por un worker libre) -> WorkerTimeout.
+        cancel: si se setea mientras se espera -> WorkerCancelled.
+        """
+        end = time.monotonic() + timeout if timeout is not None else None
+        worker = self._acquire(end, cancel)
+        recycle = False
+        try:
+            fut = worker.executor.submit(metered, fn, *args)
+            while True:
+                wait = POLL_S if end is None else max(0.0, min(POLL_S, end - time.monotonic()))
+                try:
+                    result, peak, rss = fut.result(timeout=wait)
+                except cf.TimeoutError:
+                    pass
+                except BrokenProcessPool:
+                    self._kill(worker); raise
+                else:
+                    recycle = self._account(worker, getattr(fn, "__name__", "job"), peak, rss)
+                    return result
+                if cancel is not None and cancel.is_set():
+                    self._kill(worker); raise WorkerCancelled()
+                if end is not None and time.monotonic() >= end:
+                    self._kill(worker); raise WorkerTimeout()
+        finally:
+            if recycle:  # fuera del camino de la respuesta; el worker vuelve ya reciclado
+                threading.Thread(target=self._recycle, args=(worker,), name="worker-recycle", daemon=True).start()
+            else:
+                self._idle.put(worker)
+
+    def _account(self, worker: _Worker, name: str, peak: Optional[float], rss: Optional[float]) -> bool:
+        """Registra el pico del trabajo; True si hay que reciclar el worker."""
+        worker.jobs += 1; worker.rss_mb = rss
+        if peak is not None:
+            with self._lock:
+                self._peaks.setdefault(name, deque(maxlen=PEAK_WINDOW)).append(peak)
+                self._peak_max[name] = max(peak, self._peak_max.get(name, 0.0))
+        return ((self.max_requests > 0 and worker.jobs >= self.max_requests)
+                or (self.max_rss_mb > 0 and rss is not None and rss >= self.max_rss_mb))
+
+    def _recycle(self, worker: _Worker) -> None:
+        try:
+            worker.recycle()
+        except Exception:
+            pass  # si no arrancó, el próximo trabajo da BrokenProcessPool y se reemplaza
+        with self._lock:
+            self.recycled += 1
+        self._idle.put(worker)
+
+    def memory(self) -> Dict[str, Any]:
+        """RSS de cada worker (al terminar su último trabajo), reciclados y pico por trabajo (MB)."""
+        with self._lock:
+            peaks = {name: _summary(list(d), self._peak_max[name]) for name, d in self._peaks.items()}
+            recycled = self.recycled
+        return {
+            "workers": [{"jobs": w.jobs, "rss_mb": w.rss_mb} for w in self._workers],
+            "recycled": recycled, "killed": self.killed,
+            "max_requests": self.max_requests, "max_rss_mb": self.max_rss_mb,
+            "peak_mb": peaks,
+        }
+
+    def _acquire(self, end: Optional[float], cancel: Optional[threading.Event]) -> _Worker:
+        while True:
+            wait = POLL_S if end is None else max(0.0, min(POLL_S, end - time.monotonic()))
+            try:
+                return self._idle.get(timeout=wait)
+            except queue.Empty:
+                pass
+            if cancel is not None and cancel.is_set(): raise WorkerCancelled()
+            if end is not None and time.monotonic() >= end: raise WorkerTimeout()
+
+    def _kill(self, worker: _Worker) -> None:
+        worker.kill()
+        with self._lock:
+            self.killed += 1
+
+    def shutdown(self) -> None:
+        for w in self._workers: w.shutdown()
+
+
+def _summary(values: List[float], top: float) -> Dict[str, Any]:
+    s = sorted(values)
+    q = lambda p: s[min(len(s) - 1, int(p * len(s)))]
+    return {"n": len(s), "p50": q(0.50), "p95": q(0.95), "max": top}